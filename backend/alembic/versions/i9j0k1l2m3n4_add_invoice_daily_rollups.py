@@ -0,0 +1,63 @@
+"""Add invoice_daily_rollups table for reports
+
+Revision ID: i9j0k1l2m3n4
+Revises: h8i9j0k1l2m3
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i9j0k1l2m3n4'
+down_revision: Union[str, None] = 'h8i9j0k1l2m3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'invoice_daily_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('merchant_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('net_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('vat_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('gross_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('due_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('due_gross', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['merchant_id'], ['merchants.id'], ondelete='CASCADE'),
+        sa.UniqueConstraint('merchant_id', 'day', 'status', name='uq_invoice_daily_rollup'),
+    )
+
+    # Backfill from existing documents (drafts are not part of the rollup)
+    op.execute("""
+        INSERT INTO invoice_daily_rollups
+            (merchant_id, day, status, invoice_count, net_total, vat_total, gross_total, due_count, due_gross)
+        SELECT merchant_id, day, status,
+               SUM(c), SUM(n), SUM(v), SUM(g), SUM(dc), SUM(dg)
+        FROM (
+            SELECT merchant_id, issue_date AS day, status::text AS status,
+                   1 AS c, subtotal_net AS n, vat_total AS v, total_gross AS g, 0 AS dc, 0 AS dg
+            FROM invoices WHERE status <> 'draft'
+            UNION ALL
+            SELECT merchant_id, due_date, status::text,
+                   0, 0, 0, 0, 1, total_gross
+            FROM invoices WHERE status <> 'draft' AND due_date IS NOT NULL
+            UNION ALL
+            SELECT merchant_id, issue_date, 'credited',
+                   1, subtotal_net, vat_total, total_gross, 0, 0
+            FROM credit_notes WHERE status = 'issued'
+        ) x
+        GROUP BY merchant_id, day, status
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('invoice_daily_rollups')
@@ -0,0 +1,46 @@
+"""Add email_outbox table
+
+Revision ID: j0k1l2m3n4o5
+Revises: i9j0k1l2m3n4
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'j0k1l2m3n4o5'
+down_revision: Union[str, None] = 'i9j0k1l2m3n4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('state', sa.String(16), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('to_email', sa.String(320), nullable=False),
+        sa.Column('to_domain', sa.String(255), nullable=False, server_default=''),
+        sa.Column('from_email', sa.String(320), nullable=False),
+        sa.Column('subject', sa.String(512), nullable=False, server_default=''),
+        sa.Column('message', sa.LargeBinary(), nullable=False),
+        sa.Column('ref_type', sa.String(32), nullable=True),
+        sa.Column('ref_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_email_outbox_state_next_attempt', 'email_outbox', ['state', 'next_attempt_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_state_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,48 @@
+"""Unique (merchant_id, code) on products for upserting CSV imports
+
+Revision ID: k1l2m3n4o5p6
+Revises: j0k1l2m3n4o5
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k1l2m3n4o5p6'
+down_revision: Union[str, None] = 'j0k1l2m3n4o5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # blank codes mean "no code" (NULLs never conflict in a unique index)
+    op.execute("UPDATE products SET code = NULL WHERE btrim(code) = ''")
+
+    # existing duplicates: the newest product keeps the code, older ones lose it
+    op.execute(
+        """
+        UPDATE products p
+        SET code = NULL
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY merchant_id, code ORDER BY id DESC) AS rn
+            FROM products
+            WHERE code IS NOT NULL
+        ) d
+        WHERE p.id = d.id AND d.rn > 1
+        """
+    )
+
+    op.create_index(
+        'uq_products_merchant_code',
+        'products',
+        ['merchant_id', 'code'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_products_merchant_code', table_name='products')
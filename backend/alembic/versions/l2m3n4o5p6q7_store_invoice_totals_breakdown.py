@@ -0,0 +1,83 @@
+"""Store VAT breakdown, pre-discount subtotal, discount and total due on documents
+
+Revision ID: l2m3n4o5p6q7
+Revises: k1l2m3n4o5p6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l2m3n4o5p6q7'
+down_revision: Union[str, None] = 'k1l2m3n4o5p6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# breakdown key as in app.core.money.rate_key: 21.00 -> "21", 5.50 -> "5.5"
+_RATE_KEY = "rtrim(rtrim(to_char(vat_rate, 'FM999990.00'), '0'), '.')"
+
+
+def _breakdown_sql(items_table: str, fk: str) -> str:
+    return f"""
+        SELECT {fk} AS doc_id,
+               json_object_agg(rate, json_build_object('base', base, 'vat', vat)) AS breakdown
+        FROM (
+            SELECT {fk}, {_RATE_KEY} AS rate, sum(line_net) AS base, sum(line_vat) AS vat
+            FROM {items_table}
+            GROUP BY {fk}, {_RATE_KEY}
+        ) per_rate
+        GROUP BY {fk}
+    """
+
+
+def upgrade() -> None:
+    op.add_column('invoices', sa.Column('subtotal_net_before', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.add_column('invoices', sa.Column('discount_amount', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.add_column('invoices', sa.Column('total_due', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.add_column('invoices', sa.Column('vat_breakdown', sa.JSON(), nullable=False, server_default='{}'))
+    op.add_column('credit_notes', sa.Column('vat_breakdown', sa.JSON(), nullable=False, server_default='{}'))
+
+    # backfill (same rules as app.core.money: line amounts rounded to the cent, half away from zero)
+    op.execute(
+        """
+        UPDATE invoices i
+        SET subtotal_net_before = CASE WHEN i.discount_percent > 0 THEN coalesce(b.before, 0) ELSE i.subtotal_net END,
+            discount_amount = CASE WHEN i.discount_percent > 0
+                                   THEN greatest(0, coalesce(b.before, 0) - i.subtotal_net) ELSE 0 END,
+            total_due = greatest(0, i.total_gross - i.advance_paid)
+        FROM (
+            SELECT inv.id, sum(round(it.unit_price * it.quantity, 2)) AS before
+            FROM invoices inv
+            LEFT JOIN invoice_items it ON it.invoice_id = inv.id
+            GROUP BY inv.id
+        ) b
+        WHERE b.id = i.id
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE invoices i SET vat_breakdown = b.breakdown
+        FROM ({_breakdown_sql('invoice_items', 'invoice_id')}) b
+        WHERE b.doc_id = i.id
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE credit_notes c SET vat_breakdown = b.breakdown
+        FROM ({_breakdown_sql('credit_note_items', 'credit_note_id')}) b
+        WHERE b.doc_id = c.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('credit_notes', 'vat_breakdown')
+    op.drop_column('invoices', 'vat_breakdown')
+    op.drop_column('invoices', 'total_due')
+    op.drop_column('invoices', 'discount_amount')
+    op.drop_column('invoices', 'subtotal_net_before')
@@ -0,0 +1,57 @@
+"""Keep last_issued_date on invoice_sequences; (merchant_id, status, issue_date DESC, id DESC) indexes
+
+Revision ID: m3n4o5p6q7r8
+Revises: l2m3n4o5p6q7
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm3n4o5p6q7r8'
+down_revision: Union[str, None] = 'l2m3n4o5p6q7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('invoice_sequences', sa.Column('last_issued_date', sa.Date(), nullable=True))
+
+    # latest issue date of every numbered (non-draft) document per sequence row
+    for table, doc_type in (('invoices', 'invoice'), ('credit_notes', 'credit_note')):
+        op.execute(
+            f"""
+            UPDATE invoice_sequences s SET last_issued_date = d.last_date
+            FROM (
+                SELECT merchant_id, year, max(issue_date) AS last_date
+                FROM {table}
+                WHERE status <> 'draft'
+                GROUP BY merchant_id, year
+            ) d
+            WHERE s.merchant_id = d.merchant_id AND s.year = d.year AND s.doc_type = '{doc_type}'
+            """
+        )
+
+    # status-filtered lists newest first (leading columns replace the (merchant_id, status) indexes)
+    op.create_index(
+        'ix_invoices_merchant_status_issue_date', 'invoices',
+        ['merchant_id', 'status', sa.text('issue_date DESC'), sa.text('id DESC')],
+    )
+    op.drop_index('ix_invoices_merchant_status', table_name='invoices')
+    op.create_index(
+        'ix_credit_notes_merchant_status_issue_date', 'credit_notes',
+        ['merchant_id', 'status', sa.text('issue_date DESC'), sa.text('id DESC')],
+    )
+    op.drop_index('ix_credit_notes_merchant_status', table_name='credit_notes')
+
+
+def downgrade() -> None:
+    op.create_index('ix_credit_notes_merchant_status', 'credit_notes', ['merchant_id', 'status'], unique=False)
+    op.drop_index('ix_credit_notes_merchant_status_issue_date', table_name='credit_notes')
+    op.create_index('ix_invoices_merchant_status', 'invoices', ['merchant_id', 'status'], unique=False)
+    op.drop_index('ix_invoices_merchant_status_issue_date', table_name='invoices')
+    op.drop_column('invoice_sequences', 'last_issued_date')
@@ -0,0 +1,49 @@
+"""Client / product search: pg_trgm GIN indexes and (merchant_id, lower(name) COLLATE "C", id) indexes
+
+Revision ID: n4o5p6q7r8s9
+Revises: m3n4o5p6q7r8
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n4o5p6q7r8s9'
+down_revision: Union[str, None] = 'm3n4o5p6q7r8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> columns searched with LIKE '%term%'
+_TRGM = {
+    'clients': ('name', 'email', 'tax_id'),
+    'products': ('name', 'code'),
+}
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table, columns in _TRGM.items():
+        # list order + name prefix search (LIKE 'abc%' needs the "C" collation to use the btree)
+        op.create_index(
+            f'ix_{table}_merchant_name_key', table,
+            ['merchant_id', sa.text('(lower(name) COLLATE "C")'), 'id'],
+        )
+        for col in columns:
+            op.create_index(
+                f'ix_{table}_{col}_trgm', table,
+                [sa.text(f'lower({col}) gin_trgm_ops')],
+                postgresql_using='gin',
+            )
+
+
+def downgrade() -> None:
+    for table, columns in _TRGM.items():
+        for col in columns:
+            op.drop_index(f'ix_{table}_{col}_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_merchant_name_key', table_name=table)
+    # the extension is left installed (other objects may use it)
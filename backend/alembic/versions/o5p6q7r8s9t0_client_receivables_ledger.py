@@ -0,0 +1,95 @@
+"""Client receivables ledger (client_receivables) with aging buckets
+
+Revision ID: o5p6q7r8s9t0
+Revises: n4o5p6q7r8s9
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'o5p6q7r8s9t0'
+down_revision: Union[str, None] = 'n4o5p6q7r8s9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_MONEY = sa.Numeric(14, 2)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'client_receivables',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('merchant_id', sa.Integer(), sa.ForeignKey('merchants.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('client_id', sa.Integer(), sa.ForeignKey('clients.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('invoiced_total', _MONEY, nullable=False, server_default='0'),
+        sa.Column('credited_total', _MONEY, nullable=False, server_default='0'),
+        sa.Column('open_balance', _MONEY, nullable=False, server_default='0'),
+        sa.Column('aging_0_30', _MONEY, nullable=False, server_default='0'),
+        sa.Column('aging_31_60', _MONEY, nullable=False, server_default='0'),
+        sa.Column('aging_61_90', _MONEY, nullable=False, server_default='0'),
+        sa.Column('aging_90_plus', _MONEY, nullable=False, server_default='0'),
+        sa.Column('last_invoice_date', sa.Date(), nullable=True),
+        sa.Column('aged_on', sa.Date(), nullable=True),
+        sa.UniqueConstraint('merchant_id', 'client_id', name='uq_client_receivable'),
+    )
+    op.create_index('ix_client_receivables_client_id', 'client_receivables', ['client_id'])
+
+    # backfill from history; open amounts = total due of issued invoices + their credit notes (negative)
+    op.execute(
+        """
+        INSERT INTO client_receivables (
+            merchant_id, client_id, invoice_count, invoiced_total, credited_total, open_balance,
+            aging_0_30, aging_31_60, aging_61_90, aging_90_plus, last_invoice_date, aged_on
+        )
+        SELECT c.merchant_id, c.id,
+               coalesce(i.invoice_count, 0), coalesce(i.invoiced_total, 0), coalesce(cn.credited, 0),
+               coalesce(o.open_balance, 0),
+               coalesce(o.a0, 0), coalesce(o.a31, 0), coalesce(o.a61, 0), coalesce(o.a91, 0),
+               i.last_invoice_date, CURRENT_DATE
+        FROM clients c
+        LEFT JOIN (
+            SELECT client_id, count(*) AS invoice_count, sum(total_gross) AS invoiced_total,
+                   max(issue_date) AS last_invoice_date
+            FROM invoices
+            WHERE status IN ('issued', 'paid') AND client_id IS NOT NULL
+            GROUP BY client_id
+        ) i ON i.client_id = c.id
+        LEFT JOIN (
+            SELECT client_id, -sum(total_gross) AS credited
+            FROM credit_notes
+            WHERE status = 'issued' AND client_id IS NOT NULL
+            GROUP BY client_id
+        ) cn ON cn.client_id = c.id
+        LEFT JOIN (
+            SELECT client_id,
+                   sum(amount) AS open_balance,
+                   sum(amount) FILTER (WHERE age <= 30) AS a0,
+                   sum(amount) FILTER (WHERE age BETWEEN 31 AND 60) AS a31,
+                   sum(amount) FILTER (WHERE age BETWEEN 61 AND 90) AS a61,
+                   sum(amount) FILTER (WHERE age > 90) AS a91
+            FROM (
+                SELECT inv.client_id,
+                       CURRENT_DATE - coalesce(inv.due_date, inv.issue_date) AS age,
+                       inv.total_due + coalesce((
+                           SELECT sum(x.total_gross) FROM credit_notes x
+                           WHERE x.invoice_id = inv.id AND x.status = 'issued'
+                       ), 0) AS amount
+                FROM invoices inv
+                WHERE inv.status = 'issued' AND inv.client_id IS NOT NULL
+            ) open_items
+            GROUP BY client_id
+        ) o ON o.client_id = c.id
+        WHERE i.client_id IS NOT NULL OR cn.client_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_client_receivables_client_id', table_name='client_receivables')
+    op.drop_table('client_receivables')
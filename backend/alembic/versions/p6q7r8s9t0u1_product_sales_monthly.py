@@ -0,0 +1,84 @@
+"""invoice_items.product_id and the product_sales_monthly aggregate
+
+Revision ID: p6q7r8s9t0u1
+Revises: o5p6q7r8s9t0
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'p6q7r8s9t0u1'
+down_revision: Union[str, None] = 'o5p6q7r8s9t0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_MONEY = sa.Numeric(14, 2)
+
+
+def upgrade() -> None:
+    op.add_column(
+        'invoice_items',
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='SET NULL'), nullable=True),
+    )
+    op.create_index('ix_invoice_items_product_id', 'invoice_items', ['product_id'])
+
+    # existing lines: item_code -> the merchant's product with that code (codes are unique per merchant)
+    op.execute(
+        """
+        UPDATE invoice_items it SET product_id = p.id
+        FROM invoices i, products p
+        WHERE i.id = it.invoice_id
+          AND p.merchant_id = i.merchant_id
+          AND p.code = it.item_code
+          AND it.item_code <> ''
+        """
+    )
+
+    op.create_table(
+        'product_sales_monthly',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('merchant_id', sa.Integer(), sa.ForeignKey('merchants.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('line_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('quantity', _MONEY, nullable=False, server_default='0'),
+        sa.Column('net_total', _MONEY, nullable=False, server_default='0'),
+        sa.Column('vat_total', _MONEY, nullable=False, server_default='0'),
+        sa.UniqueConstraint('merchant_id', 'month', 'product_id', name='uq_product_sales_monthly'),
+    )
+    op.create_index('ix_product_sales_monthly_product_id', 'product_sales_monthly', ['product_id'])
+
+    # issued / paid invoice lines, minus issued credit note lines (matched by the credited invoice's line codes)
+    op.execute(
+        """
+        INSERT INTO product_sales_monthly (merchant_id, product_id, month, line_count, quantity, net_total, vat_total)
+        SELECT merchant_id, product_id, month, sum(line_count), sum(quantity), sum(net_total), sum(vat_total)
+        FROM (
+            SELECT i.merchant_id, it.product_id, date_trunc('month', i.issue_date)::date AS month,
+                   1 AS line_count, it.quantity, it.line_net AS net_total, it.line_vat AS vat_total
+            FROM invoice_items it
+            JOIN invoices i ON i.id = it.invoice_id
+            WHERE it.product_id IS NOT NULL AND i.status IN ('issued', 'paid')
+            UNION ALL
+            SELECT cn.merchant_id, p.id, date_trunc('month', cn.issue_date)::date,
+                   -1, -ci.quantity, ci.line_net, ci.line_vat
+            FROM credit_note_items ci
+            JOIN credit_notes cn ON cn.id = ci.credit_note_id
+            JOIN products p ON p.merchant_id = cn.merchant_id AND p.code = ci.item_code
+            WHERE cn.status = 'issued' AND ci.item_code <> ''
+        ) lines
+        GROUP BY merchant_id, product_id, month
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_sales_monthly_product_id', table_name='product_sales_monthly')
+    op.drop_table('product_sales_monthly')
+    op.drop_index('ix_invoice_items_product_id', table_name='invoice_items')
+    op.drop_column('invoice_items', 'product_id')
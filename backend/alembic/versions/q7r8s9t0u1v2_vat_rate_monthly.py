@@ -0,0 +1,62 @@
+"""Monthly per-rate VAT aggregate (vat_rate_monthly) for the VAT return
+
+Revision ID: q7r8s9t0u1v2
+Revises: p6q7r8s9t0u1
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'q7r8s9t0u1v2'
+down_revision: Union[str, None] = 'p6q7r8s9t0u1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_MONEY = sa.Numeric(14, 2)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'vat_rate_monthly',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('merchant_id', sa.Integer(), sa.ForeignKey('merchants.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('rate_bp', sa.Integer(), nullable=False),
+        sa.Column('invoice_base', _MONEY, nullable=False, server_default='0'),
+        sa.Column('invoice_vat', _MONEY, nullable=False, server_default='0'),
+        sa.Column('credit_base', _MONEY, nullable=False, server_default='0'),
+        sa.Column('credit_vat', _MONEY, nullable=False, server_default='0'),
+        sa.UniqueConstraint('merchant_id', 'month', 'rate_bp', name='uq_vat_rate_monthly'),
+    )
+
+    # backfill from the stored breakdowns: {"21": {"base": .., "vat": ..}, "5.5": {...}}
+    op.execute(
+        """
+        INSERT INTO vat_rate_monthly (merchant_id, month, rate_bp, invoice_base, invoice_vat, credit_base, credit_vat)
+        SELECT merchant_id, month, rate_bp, sum(invoice_base), sum(invoice_vat), sum(credit_base), sum(credit_vat)
+        FROM (
+            SELECT i.merchant_id, date_trunc('month', i.issue_date)::date AS month,
+                   round(b.key::numeric * 100)::int AS rate_bp,
+                   (b.value ->> 'base')::numeric AS invoice_base, (b.value ->> 'vat')::numeric AS invoice_vat,
+                   0 AS credit_base, 0 AS credit_vat
+            FROM invoices i, json_each(i.vat_breakdown) b
+            WHERE i.status IN ('issued', 'paid')
+            UNION ALL
+            SELECT cn.merchant_id, date_trunc('month', cn.issue_date)::date,
+                   round(b.key::numeric * 100)::int,
+                   0, 0, (b.value ->> 'base')::numeric, (b.value ->> 'vat')::numeric
+            FROM credit_notes cn, json_each(cn.vat_breakdown) b
+            WHERE cn.status = 'issued'
+        ) lines
+        GROUP BY merchant_id, month, rate_bp
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('vat_rate_monthly')
@@ -15,6 +15,9 @@ from app.api.routes.preferences import router as preferences_router
 from app.api.routes.reports import router as reports_router
 from app.api.routes.suppliers import router as suppliers_router
 from app.api.routes.subscriptions import router as subscriptions_router
+from app.api.routes.exports import router as exports_router
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes.admin_profiling import router as admin_profiling_router
 
 api_router = APIRouter()
 
@@ -32,4 +35,7 @@ api_router.include_router(help_router)
 api_router.include_router(preferences_router)
 api_router.include_router(reports_router, prefix="/reports", tags=["reports"])
 api_router.include_router(suppliers_router)
-api_router.include_router(subscriptions_router)
\ No newline at end of file
+api_router.include_router(subscriptions_router)
+api_router.include_router(exports_router)
+api_router.include_router(metrics_router)
+api_router.include_router(admin_profiling_router)
\ No newline at end of file
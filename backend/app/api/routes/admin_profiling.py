@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
+
+from app.api.routes.deps import require_role
+from app.core.config import settings
+from app.core.profiling import profiler
+from app.models.user import User, UserRole
+
+router = APIRouter(prefix="/admin/profiling", tags=["Admin Profiling"])
+
+require_platform_admin = require_role(UserRole.platform_admin)
+
+
+def _enabled() -> None:
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+class ProfileIn(BaseModel):
+    route: str = Field(min_length=1, max_length=300)  # route template, e.g. /invoices/{invoice_id}/pdf
+    method: str = Field(default="GET", max_length=10)
+    requests: int = Field(default=5, ge=1, le=100)
+    interval_ms: float = Field(default=5, ge=1, le=100)
+    max_seconds: int = Field(default=600, ge=10, le=3600)
+
+
+def _session_or_404(session_id: str):
+    session = profiler.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session
+
+
+@router.post("/sessions", dependencies=[Depends(_enabled)])
+def start_session(payload: ProfileIn, request: Request, _: User = Depends(require_platform_admin)):
+    """Profile the next `requests` requests to a route (this worker process only)."""
+    method = payload.method.upper()
+    route = next(
+        (
+            r for r in request.app.routes
+            if isinstance(r, APIRoute) and r.path == payload.route and method in r.methods
+        ),
+        None,
+    )
+    if route is None:
+        raise HTTPException(status_code=404, detail="Route not found")
+
+    try:
+        session = profiler.start(
+            route=route.path,
+            method=method,
+            endpoint=route.endpoint,
+            requests=payload.requests,
+            interval_ms=payload.interval_ms,
+            max_seconds=payload.max_seconds,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.summary()
+
+
+@router.get("/sessions/{session_id}", dependencies=[Depends(_enabled)])
+def get_session(session_id: str, _: User = Depends(require_platform_admin)):
+    return _session_or_404(session_id).summary()
+
+
+@router.get("/sessions/{session_id}/flamegraph", dependencies=[Depends(_enabled)])
+def get_flamegraph(session_id: str, _: User = Depends(require_platform_admin)):
+    """Folded stacks (`frame;frame;frame count`) for flamegraph.pl / speedscope / inferno."""
+    session = _session_or_404(session_id)
+    return PlainTextResponse(
+        session.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{session.id}.folded"'},
+    )
+
+
+@router.delete("/sessions/{session_id}", dependencies=[Depends(_enabled)])
+def stop_session(session_id: str, _: User = Depends(require_platform_admin)):
+    _session_or_404(session_id)
+    profiler.stop()
+    return {"ok": True}
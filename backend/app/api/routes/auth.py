@@ -2,7 +2,7 @@ from sqlalchemy.exc import IntegrityError
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
-from app.api.routes.deps import get_current_user
+from app.api.routes.deps import get_current_user, invalidate_principal
 from app.core.countries import COUNTRY_RULES
 from app.core.countries import CountryCode
 from app.models.legal_acceptance import LegalAcceptance, LegalDocType
@@ -211,9 +211,8 @@ def signup_merchant(payload: MerchantSignupIn, request: Request, db: Session = D
     db.add(merchant)
     
     _record_current_acceptances(db, user.id, request)
-    db.commit()
-    
-    # ✅ Send welcome email (async-friendly, non-blocking)
+
+    # ✅ Welcome email is queued in the same transaction (delivered by the email worker)
     try:
         # Determine language from country
         lang_map = {"BE": "fr", "NL": "nl", "FR": "fr", "RO": "ro"}
@@ -224,11 +223,15 @@ def signup_merchant(payload: MerchantSignupIn, request: Request, db: Session = D
             first_name=user.first_name,
             company_name=payload.company_name,
             language=language,
+            db=db,
         )
     except Exception as e:
         # Don't fail signup if email fails
         import logging
-        logging.error(f"Failed to send welcome email: {e}")
+        logging.error(f"Failed to queue welcome email: {e}")
+
+    db.commit()
+    invalidate_principal(user.email)  # new merchant link
     
     return {"ok": True}
 
@@ -256,6 +259,13 @@ def legal_accept(
 
 
 
+def _access_token_for(db: Session, user: User) -> str:
+    merchant_id = None
+    if user.role == UserRole.merchant_admin:
+        merchant_id = db.query(Merchant.id).filter(Merchant.owner_user_id == user.id).scalar()
+    return create_access_token(sub=user.email, role=user.role.value, uid=user.id, mid=merchant_id)
+
+
 @router.post("/login", response_model=AuthOut)
 def login(payload: LoginIn, response: Response, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email).first()
@@ -264,7 +274,7 @@ def login(payload: LoginIn, response: Response, db: Session = Depends(get_db)):
     if not user.is_active:
         raise HTTPException(403, "Inactive user")
 
-    access = create_access_token(sub=user.email, role=user.role.value)
+    access = _access_token_for(db, user)
 
     # refresh token stored hashed in DB
     refresh = create_refresh_token()
@@ -316,7 +326,7 @@ def refresh(request: Request, response: Response, db: Session = Depends(get_db))
     ))
     db.commit()
 
-    new_access = create_access_token(sub=user.email, role=user.role.value)
+    new_access = _access_token_for(db, user)
 
     _set_access_cookie(response, new_access)
     _set_refresh_cookie(response, new_refresh)
@@ -433,6 +443,7 @@ def delete_account(
     user.is_active = False
     db.add(user)
     db.commit()
+    invalidate_principal(user.email)
     
     return {"ok": True, "message": "Account marked for deletion"}
 
@@ -472,19 +483,20 @@ def forgot_password(req: ForgotPasswordRequest, db: Session = Depends(get_db)):
             expires_at=datetime.utcnow() + timedelta(hours=1),
             revoked=False,
         ))
-        db.commit()
         
-        # Send reset email
+        # Queue reset email (committed together with the token)
         try:
             send_forgot_password_email(
                 to_email=user.email,
                 first_name=user.first_name or "User",
                 reset_token=reset_token,
                 language=req.language,
+                db=db,
             )
         except Exception as e:
             import logging
-            logging.error(f"Failed to send password reset email: {e}")
+            logging.error(f"Failed to queue password reset email: {e}")
+        db.commit()
     
     # Always return success
     return {"ok": True, "message": "If the email exists, a reset link has been sent"}
@@ -1,15 +1,13 @@
 """Calendar events API routes."""
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, extract
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, extract
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime
 
-from app.api.routes.deps import get_current_user, require_role, get_db
-from app.models.user import User, UserRole
+from app.api.routes.deps import get_current_merchant_id, get_db
 from app.models.calendar_event import CalendarEvent
-from app.models.merchant import Merchant
 from app.models.client import Client
 from app.models.invoice import Invoice
 from app.schemas.calendar import CalendarEventCreate, CalendarEventOut, CalendarEventUpdate
@@ -17,19 +15,48 @@ from app.schemas.calendar import CalendarEventCreate, CalendarEventOut, Calendar
 router = APIRouter(prefix="/calendar", tags=["calendar"])
 
 
-def _get_merchant_id(db: Session, user: User) -> int:
-    """Get merchant ID for current user."""
-    merchant = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not merchant:
-        raise HTTPException(status_code=404, detail="Merchant not found for user")
-    return merchant.id
+def _with_related(query):
+    # client name + invoice no in the same SELECT instead of two lazy loads per event
+    return query.options(
+        joinedload(CalendarEvent.client).load_only(Client.name),
+        joinedload(CalendarEvent.invoice).load_only(Invoice.invoice_no),
+    )
+
+
+def _get_event(db: Session, merchant_id: int, event_id: int) -> Optional[CalendarEvent]:
+    return _with_related(db.query(CalendarEvent)).filter(
+        CalendarEvent.id == event_id,
+        CalendarEvent.merchant_id == merchant_id
+    ).first()
+
+
+def _event_out(event: CalendarEvent) -> CalendarEventOut:
+    return CalendarEventOut(
+        **{
+            "id": event.id,
+            "title": event.title,
+            "description": event.description,
+            "event_type": event.event_type.value,
+            "start_datetime": event.start_datetime,
+            "end_datetime": event.end_datetime,
+            "all_day": event.all_day,
+            "completed": event.completed,
+            "merchant_id": event.merchant_id,
+            "client_id": event.client_id,
+            "invoice_id": event.invoice_id,
+            "created_at": event.created_at,
+            "updated_at": event.updated_at,
+            "client_name": event.client.name if event.client else None,
+            "invoice_no": event.invoice.invoice_no if event.invoice else None,
+        }
+    )
 
 
 @router.get("/", response_model=List[CalendarEventOut])
 def get_calendar_events(
     *,
     db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.merchant_admin)),
+    merchant_id: int = Depends(get_current_merchant_id),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     year: Optional[int] = None,
@@ -38,9 +65,8 @@ def get_calendar_events(
     completed: Optional[bool] = None,
 ):
     """Get calendar events for merchant with optional filters."""
-    merchant_id = _get_merchant_id(db, user)
     
-    query = db.query(CalendarEvent).filter(CalendarEvent.merchant_id == merchant_id)
+    query = _with_related(db.query(CalendarEvent)).filter(CalendarEvent.merchant_id == merchant_id)
     
     # Filter by year/month
     if year and month:
@@ -66,40 +92,18 @@ def get_calendar_events(
     
     events = query.offset(skip).limit(limit).all()
     
-    # Enrich with related data
-    result = []
-    for event in events:
-        event_dict = {
-            "id": event.id,
-            "title": event.title,
-            "description": event.description,
-            "event_type": event.event_type.value,
-            "start_datetime": event.start_datetime,
-            "end_datetime": event.end_datetime,
-            "all_day": event.all_day,
-            "completed": event.completed,
-            "merchant_id": event.merchant_id,
-            "client_id": event.client_id,
-            "invoice_id": event.invoice_id,
-            "created_at": event.created_at,
-            "updated_at": event.updated_at,
-            "client_name": event.client.name if event.client else None,
-            "invoice_no": event.invoice.invoice_no if event.invoice else None,
-        }
-        result.append(CalendarEventOut(**event_dict))
-    
-    return result
+    # client name / invoice no come from the eager loads (no query per event)
+    return [_event_out(event) for event in events]
 
 
 @router.post("/", response_model=CalendarEventOut, status_code=201)
 def create_calendar_event(
     *,
     db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.merchant_admin)),
+    merchant_id: int = Depends(get_current_merchant_id),
     event_in: CalendarEventCreate,
 ):
     """Create new calendar event."""
-    merchant_id = _get_merchant_id(db, user)
     
     # Validate dates
     if event_in.end_datetime and event_in.end_datetime < event_in.start_datetime:
@@ -131,83 +135,39 @@ def create_calendar_event(
     
     db.add(event)
     db.commit()
-    db.refresh(event)
-    
-    return CalendarEventOut(
-        **{
-            "id": event.id,
-            "title": event.title,
-            "description": event.description,
-            "event_type": event.event_type.value,
-            "start_datetime": event.start_datetime,
-            "end_datetime": event.end_datetime,
-            "all_day": event.all_day,
-            "completed": event.completed,
-            "merchant_id": event.merchant_id,
-            "client_id": event.client_id,
-            "invoice_id": event.invoice_id,
-            "created_at": event.created_at,
-            "updated_at": event.updated_at,
-            "client_name": event.client.name if event.client else None,
-            "invoice_no": event.invoice.invoice_no if event.invoice else None,
-        }
-    )
+    # reload with client / invoice joined (instead of refresh + two lazy loads)
+    event = _get_event(db, merchant_id, event.id)
+    return _event_out(event)
 
 
 @router.get("/{event_id}", response_model=CalendarEventOut)
 def get_calendar_event(
     *,
     db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.merchant_admin)),
+    merchant_id: int = Depends(get_current_merchant_id),
     event_id: int,
 ):
     """Get specific calendar event."""
-    merchant_id = _get_merchant_id(db, user)
     
-    event = db.query(CalendarEvent).filter(
-        CalendarEvent.id == event_id,
-        CalendarEvent.merchant_id == merchant_id
-    ).first()
+    event = _get_event(db, merchant_id, event_id)
     
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    return CalendarEventOut(
-        **{
-            "id": event.id,
-            "title": event.title,
-            "description": event.description,
-            "event_type": event.event_type.value,
-            "start_datetime": event.start_datetime,
-            "end_datetime": event.end_datetime,
-            "all_day": event.all_day,
-            "completed": event.completed,
-            "merchant_id": event.merchant_id,
-            "client_id": event.client_id,
-            "invoice_id": event.invoice_id,
-            "created_at": event.created_at,
-            "updated_at": event.updated_at,
-            "client_name": event.client.name if event.client else None,
-            "invoice_no": event.invoice.invoice_no if event.invoice else None,
-        }
-    )
+    return _event_out(event)
 
 
 @router.put("/{event_id}", response_model=CalendarEventOut)
 def update_calendar_event(
     *,
     db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.merchant_admin)),
+    merchant_id: int = Depends(get_current_merchant_id),
     event_id: int,
     event_in: CalendarEventUpdate,
 ):
     """Update calendar event."""
-    merchant_id = _get_merchant_id(db, user)
     
-    event = db.query(CalendarEvent).filter(
-        CalendarEvent.id == event_id,
-        CalendarEvent.merchant_id == merchant_id
-    ).first()
+    event = _get_event(db, merchant_id, event_id)
     
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -227,38 +187,19 @@ def update_calendar_event(
     event.updated_at = datetime.utcnow()
     
     db.commit()
-    db.refresh(event)
-    
-    return CalendarEventOut(
-        **{
-            "id": event.id,
-            "title": event.title,
-            "description": event.description,
-            "event_type": event.event_type.value,
-            "start_datetime": event.start_datetime,
-            "end_datetime": event.end_datetime,
-            "all_day": event.all_day,
-            "completed": event.completed,
-            "merchant_id": event.merchant_id,
-            "client_id": event.client_id,
-            "invoice_id": event.invoice_id,
-            "created_at": event.created_at,
-            "updated_at": event.updated_at,
-            "client_name": event.client.name if event.client else None,
-            "invoice_no": event.invoice.invoice_no if event.invoice else None,
-        }
-    )
+    # reload with client / invoice joined (instead of refresh + two lazy loads)
+    event = _get_event(db, merchant_id, event.id)
+    return _event_out(event)
 
 
 @router.delete("/{event_id}", status_code=204)
 def delete_calendar_event(
     *,
     db: Session = Depends(get_db),
-    user: User = Depends(require_role(UserRole.merchant_admin)),
+    merchant_id: int = Depends(get_current_merchant_id),
     event_id: int,
 ):
     """Delete calendar event."""
-    merchant_id = _get_merchant_id(db, user)
     
     event = db.query(CalendarEvent).filter(
         CalendarEvent.id == event_id,
@@ -1,42 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import search
 from app.db.session import get_db
-from app.api.routes.deps import get_current_user
+from app.api.routes.deps import get_current_merchant, get_current_merchant_id
 from app.models.client import Client
 from app.models.merchant import Merchant
-from app.schemas.clients import ClientCreate, ClientOut
+from app.schemas.clients import ClientCreate, ClientLookupOut, ClientOut
 from app.models.user import User
 from app.schemas.clients import ClientUpdate
 
 router = APIRouter(prefix="/clients", tags=["Clients"])
 
 
-def get_current_merchant(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
-) -> Merchant:
-    merchant = db.query(Merchant).filter(
-        Merchant.owner_user_id == user.id
-    ).first()
-
-    if not merchant:
-        raise HTTPException(status_code=403, detail="Merchant not found")
-
-    return merchant
+_SEARCHED = (Client.name, Client.email, Client.tax_id)
 
 
 @router.get("/", response_model=List[ClientOut])
 def list_clients(
+    response: Response,
+    q: str | None = Query(None, description="Name prefix, or part of name / email / tax id (3+ chars)"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(200, ge=1, le=500),
     db: Session = Depends(get_db),
-    merchant: Merchant = Depends(get_current_merchant),
+    merchant_id: int = Depends(get_current_merchant_id),
 ):
-    return (
-        db.query(Client)
-        .filter(Client.merchant_id == merchant.id)
-        .all()
-    )
+    """
+    By name, keyset-paginated on (lower(name), id). The body stays a plain list;
+    the next page cursor is in the X-Next-Cursor header (absent on the last page).
+    """
+    # ✅ only the listed columns, no Client objects
+    stmt = select(
+        Client.id, Client.name, Client.email, Client.tax_id, Client.address, Client.peppol_id,
+        search.name_key(Client.name).label("sort_key"),
+    ).where(Client.merchant_id == merchant_id)
+    term = search.normalize_term(q)
+    if term:
+        stmt = stmt.where(search.search_filter(Client.name, _SEARCHED, term))
+
+    rows, next_cursor = search.page(db, stmt, Client.name, Client.id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+
+@router.get("/lookup", response_model=List[ClientLookupOut])
+def lookup_clients(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(search.LOOKUP_LIMIT, ge=1, le=25),
+    db: Session = Depends(get_db),
+    merchant_id: int = Depends(get_current_merchant_id),
+):
+    """Typeahead for the invoice editor: name-prefix matches first, then name / email / tax id contains."""
+    term = search.normalize_term(q)
+    if not term:
+        return []
+    stmt = select(Client.id, Client.name, Client.email, Client.tax_id).where(Client.merchant_id == merchant_id)
+    return search.lookup(db, stmt, Client.name, Client.id, _SEARCHED, term, limit)
 
 
 @router.post("/", response_model=ClientOut)
@@ -1,16 +1,12 @@
 from datetime import datetime, timezone, date
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.db.session import get_db
-from app.api.routes.deps import get_current_user
-from app.models.user import User, UserRole
-from app.models.merchant import Merchant
-from app.models.client import Client
+from app.api.routes.deps import get_principal, current_merchant, Principal
 from app.models.invoice import Invoice, InvoiceStatus
 from app.models.invoice_item import InvoiceItem
-from app.models.invoice_sequence import InvoiceSequence
 
 from app.models.credit_note import CreditNote, CreditNoteStatus
 from app.models.credit_note_item import CreditNoteItem
@@ -21,7 +17,12 @@ from app.schemas.credit_notes import (
 )
 
 from app.core.credit_note_pdf import build_credit_note_pdf
+from app.core.pdf_cache import pdf_cache, credit_note_cache_key, is_cacheable, etag_for, etag_matches
 from app.core.usage_tracking import check_and_increment_usage, get_subscription_for_merchant
+from app.core.report_rollups import record_credit_note_issued
+from app.core import editor_context, numbering, product_sales, receivables, vat_return
+from app.core.numbering import format_number, peek_next_number
+from app.core.money import breakdown_from_lines, breakdown_out, cents, to_decimal
 
 
 router = APIRouter(prefix="/credit-notes", tags=["credit-notes"])
@@ -34,15 +35,6 @@ def normalize_lang(v: str | None) -> str:
     return v if v in ("FR", "EN", "NL") else "FR"
 
 
-def _current_merchant(db: Session, user: User) -> Merchant:
-    if user.role != UserRole.merchant_admin:
-        raise HTTPException(403, "Only merchants can access credit notes")
-    m = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not m:
-        raise HTTPException(403, "Merchant not found for this user")
-    return m
-
-
 def _structured_reference_from_id(doc_id: int) -> str:
     raw10 = f"{doc_id:010d}"
     n = int(raw10)
@@ -52,37 +44,17 @@ def _structured_reference_from_id(doc_id: int) -> str:
     return f"+++{raw10[:3]}/{raw10[3:7]}/{raw10[7:]}{mod:02d}+++"
 
 
-def _issue_cn_number(db: Session, merchant_id: int, year: int) -> tuple[int, str]:
-    seq = (
-        db.query(InvoiceSequence)
-        .filter(
-            InvoiceSequence.merchant_id == merchant_id,
-            InvoiceSequence.year == year,
-            InvoiceSequence.doc_type == "credit_note",
-        )
-        .with_for_update()
-        .first()
-    )
-    if not seq:
-        seq = InvoiceSequence(merchant_id=merchant_id, year=year, doc_type="credit_note", next_number=1)
-        db.add(seq)
-        db.flush()
-
-    n = int(seq.next_number)
-    seq.next_number = n + 1
-
-    # ✅ anual: 000001
-    cn_no = f"{n:06d}"
-    return n, cn_no
+def _chronology_error(last_date: date) -> HTTPException:
+    return HTTPException(400, f"Issue date cannot be before last issued credit note date ({last_date.isoformat()})")
 
 
 @router.get("/eligible-invoices", response_model=list[EligibleInvoiceOut])
 def eligible_invoices(
     client_id: int = Query(...),
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
-    m = _current_merchant(db, user)
+    m = current_merchant(db, principal)
 
     rows = (
         db.query(Invoice)
@@ -111,10 +83,10 @@ def eligible_invoices(
 @router.get("/source-invoice/{invoice_id}", response_model=SourceInvoiceOut)
 def source_invoice(
     invoice_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
-    m = _current_merchant(db, user)
+    m = current_merchant(db, principal)
 
     inv = db.query(Invoice).filter(
         Invoice.id == invoice_id,
@@ -159,57 +131,34 @@ def source_invoice(
 @router.get("/meta")
 def credit_notes_meta(
     issue_date: date = Query(...),
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
-    m = _current_merchant(db, user)
+    m = current_merchant(db, principal)
 
-    last = (
-        db.query(CreditNote)
-        .filter(CreditNote.merchant_id == m.id, CreditNote.status == CreditNoteStatus.issued)
-        .order_by(CreditNote.issue_date.desc(), CreditNote.id.desc())
-        .first()
-    )
-    last_date = last.issue_date if last else None
-
-    year = issue_date.year
-    seq = (
-        db.query(InvoiceSequence)
-        .filter(
-            InvoiceSequence.merchant_id == m.id,
-            InvoiceSequence.year == year,
-            InvoiceSequence.doc_type == "credit_note",
-        )
-        .first()
-    )
-    next_n = int(seq.next_number) if seq else 1
-    next_no = f"{next_n:06d}"
+    last_date = numbering.last_issued_date(db, m.id, numbering.CREDIT_NOTE)
+    next_no = format_number(peek_next_number(db, m.id, issue_date.year, numbering.CREDIT_NOTE))
 
     return {"last_issued_date": last_date, "next_credit_note_no": next_no}
 
 
 @router.get("", response_model=list[CreditNoteListOut])
-def list_credit_notes(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
+def list_credit_notes(principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
 
+    # one query: the columns the list needs + the source invoice number (outer join)
     rows = (
-        db.query(CreditNote)
+        db.query(
+            CreditNote.id, CreditNote.credit_note_no, CreditNote.status, CreditNote.issue_date,
+            CreditNote.client_name, CreditNote.total_gross, Invoice.invoice_no,
+        )
+        .outerjoin(Invoice, Invoice.id == CreditNote.invoice_id)
         .filter(CreditNote.merchant_id == m.id)
         .order_by(CreditNote.issue_date.desc(), CreditNote.id.desc())
         .limit(200)
         .all()
     )
 
-    # join invoice_no
-    inv_map = {r.invoice_id: r2.invoice_no for r, r2 in []}  # placeholder
-
-    invoice_ids = list({r.invoice_id for r in rows})
-    if invoice_ids:
-        invs = db.query(Invoice).filter(Invoice.id.in_(invoice_ids)).all()
-        inv_map = {i.id: i.invoice_no for i in invs}
-    else:
-        inv_map = {}
-
     return [
         CreditNoteListOut(
             id=r.id,
@@ -217,7 +166,7 @@ def list_credit_notes(user: User = Depends(get_current_user), db: Session = Depe
             status=r.status.value,
             issue_date=r.issue_date,
             client_name=r.client_name,
-            invoice_no=inv_map.get(r.invoice_id, ""),
+            invoice_no=r.invoice_no or "",
             total_gross=float(r.total_gross),
         )
         for r in rows
@@ -225,18 +174,18 @@ def list_credit_notes(user: User = Depends(get_current_user), db: Session = Depe
 
 
 @router.post("", response_model=CreditNoteOut)
-def create_credit_note(payload: CreditNoteCreateIn, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
+def create_credit_note(payload: CreditNoteCreateIn, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
 
     if (payload.currency or "EUR").upper() != "EUR":
         raise HTTPException(400, "Only EUR is supported")
 
-    # ✅ invoice to credit
+    # ✅ invoice to credit (locked: a concurrent void waits for this credit note)
     inv = db.query(Invoice).filter(
         Invoice.id == payload.invoice_id,
         Invoice.merchant_id == m.id,
         Invoice.status == InvoiceStatus.issued,
-    ).first()
+    ).with_for_update().first()
     if not inv:
         raise HTTPException(404, "Invoice not found")
 
@@ -249,14 +198,9 @@ def create_credit_note(payload: CreditNoteCreateIn, user: User = Depends(get_cur
         raise HTTPException(400, "Credit note date cannot be before invoice issue date")
 
     # ✅ order rule for CN: cannot be before last issued CN date
-    last = (
-        db.query(CreditNote)
-        .filter(CreditNote.merchant_id == m.id, CreditNote.status == CreditNoteStatus.issued)
-        .order_by(CreditNote.issue_date.desc(), CreditNote.id.desc())
-        .first()
-    )
-    if last and payload.issue_date < last.issue_date:
-        raise HTTPException(400, f"Issue date cannot be before last issued credit note date ({last.issue_date.isoformat()})")
+    last_date = numbering.last_issued_date(db, m.id, numbering.CREDIT_NOTE)
+    if last_date and payload.issue_date < last_date:
+        raise _chronology_error(last_date)
 
     language = normalize_lang(payload.language or inv.language)
     template = (payload.template or "classic").strip().lower()
@@ -266,6 +210,9 @@ def create_credit_note(payload: CreditNoteCreateIn, user: User = Depends(get_cur
         comm_mode = "simple"
     comm_ref = (payload.communication_reference or "").strip()
 
+    # may insert the trial subscription row inside this transaction (committed with the document)
+    subscription = get_subscription_for_merchant(db, m) if payload.issue_now else None
+
     cn = CreditNote(
         merchant_id=m.id,
         invoice_id=inv.id,
@@ -310,48 +257,64 @@ def create_credit_note(payload: CreditNoteCreateIn, user: User = Depends(get_cur
     # ✅ copy invoice items but NEGATIVE amounts
     inv_items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).all()
 
-    subtotal_net = 0.0
-    vat_total = 0.0
-    total_gross = 0.0
+    subtotal_net = 0
+    vat_total = 0
+    total_gross = 0
+    lines = []
 
     for it in inv_items:
-        net = -float(it.line_net)
-        vat = -float(it.line_vat)
-        gross = -float(it.line_gross)
+        # same amounts as the invoice lines, negated (integer cents, no float drift)
+        net = -cents(it.line_net)
+        vat = -cents(it.line_vat)
+        gross = -cents(it.line_gross)
 
         subtotal_net += net
         vat_total += vat
         total_gross += gross
+        lines.append((it.vat_rate, to_decimal(net), to_decimal(vat)))
 
         db.add(CreditNoteItem(
             credit_note_id=cn.id,
             item_code=it.item_code,
             description=it.description,
-            unit_price=float(it.unit_price),
-            quantity=float(it.quantity),
-            vat_rate=float(it.vat_rate),
-            line_net=net,
-            line_vat=vat,
-            line_gross=gross,
+            unit_price=it.unit_price,
+            quantity=it.quantity,
+            vat_rate=it.vat_rate,
+            line_net=to_decimal(net),
+            line_vat=to_decimal(vat),
+            line_gross=to_decimal(gross),
         ))
 
-    cn.subtotal_net = subtotal_net
-    cn.vat_total = vat_total
-    cn.total_gross = total_gross
+    cn.subtotal_net = to_decimal(subtotal_net)
+    cn.vat_total = to_decimal(vat_total)
+    cn.total_gross = to_decimal(total_gross)
+    cn.vat_breakdown = breakdown_out(breakdown_from_lines(lines))
 
     if payload.issue_now:
-        n, cn_no = _issue_cn_number(db, m.id, cn.year)
-        cn.number = n
-        cn.credit_note_no = cn_no
         cn.status = CreditNoteStatus.issued
         cn.issued_at = datetime.now(timezone.utc)
-        
+    db.flush()
+
+    if payload.issue_now:
+        # ✅ hot rows last: aggregate rows and the sequence row stay locked only until the commit below (anual: 000001)
+        record_credit_note_issued(db, cn)
+        receivables.record_credit_note_issued(db, cn, inv)
+        product_sales.record_credit_note_issued(db, cn, inv_items)
+        vat_return.record_credit_note_issued(db, cn)
+        try:
+            cn.number = numbering.allocate_numbers(db, m.id, cn.year, numbering.CREDIT_NOTE, issue_date=cn.issue_date)
+        except numbering.ChronologyError as e:
+            # a later-dated credit note was issued concurrently
+            raise _chronology_error(e.last_issued_date)
+        cn.credit_note_no = format_number(cn.number)
+
         # ✅ Track usage when credit note is issued
-        subscription = get_subscription_for_merchant(db, m)
         if subscription:
             is_over_limit, usage_warning = check_and_increment_usage(db, subscription, document_count=1)
 
     db.commit()
+    if payload.issue_now:
+        editor_context.invalidate(m.id)  # usage
     db.refresh(cn)
 
     return CreditNoteOut(
@@ -375,17 +338,33 @@ def create_credit_note(payload: CreditNoteCreateIn, user: User = Depends(get_cur
 
 
 @router.get("/{credit_note_id}/pdf")
-def download_credit_note_pdf(credit_note_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
-    cn = db.query(CreditNote).filter(CreditNote.id == credit_note_id, CreditNote.merchant_id == m.id).first()
+def download_credit_note_pdf(credit_note_id: int, request: Request, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    cn = (
+        db.query(CreditNote)
+        .options(selectinload(CreditNote.items))
+        .filter(CreditNote.id == credit_note_id, CreditNote.merchant_id == m.id)
+        .first()
+    )
     if not cn:
         raise HTTPException(404, "Credit note not found")
 
-    pdf = build_credit_note_pdf(cn, merchant_logo_url=m.logo_url)
     filename = (cn.credit_note_no or f"credit-note-{cn.id}") + ".pdf"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if is_cacheable(cn):
+        # ✅ issued credit notes are immutable -> content-addressed cache + conditional GET
+        key = credit_note_cache_key(cn, m.logo_url)
+        headers["ETag"] = etag_for(key)
+        headers["Cache-Control"] = "private, no-cache"
+        if etag_matches(request.headers.get("if-none-match"), key):
+            return Response(status_code=304, headers=headers)
+        pdf = pdf_cache.get_or_render(key, lambda: build_credit_note_pdf(cn, merchant_logo_url=m.logo_url))
+    else:
+        pdf = build_credit_note_pdf(cn, merchant_logo_url=m.logo_url)
 
     return Response(
         content=pdf,
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers=headers,
     )
@@ -1,7 +1,14 @@
+from dataclasses import dataclass
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.db.session import get_db
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.profiling import set_request_merchant
 from app.core.security import decode_access_token
 from app.models.user import User, UserRole
 from app.models.merchant import Merchant
@@ -9,11 +16,63 @@ from app.models.merchant import Merchant
 bearer = HTTPBearer(auto_error=False)
 ACCESS_COOKIE = "acont_access"
 
-def get_current_user(
+
+@dataclass(frozen=True)
+class Principal:
+    """Who is calling: resolved from the access token, cached per token subject."""
+    user_id: int
+    email: str
+    role: UserRole
+    merchant_id: Optional[int]
+
+
+# ✅ sub (email) -> Principal; short TTL bounds staleness across worker processes
+_MAX_AUTH_CACHE_TTL = 60.0  # seconds; the only bound for changes made outside this process
+_principals = TTLCache(
+    ttl_seconds=min(settings.AUTH_CACHE_TTL_SECONDS, _MAX_AUTH_CACHE_TTL),
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+)
+
+
+def invalidate_principal(email: Optional[str]) -> None:
+    """
+    Call after committing a change to a user's active flag, role or merchant link
+    (signup, account deletion). Other worker processes and out-of-process changes
+    (scripts/seed_platform_admin.py, manual SQL) only see it once the TTL expires.
+    """
+    if email:
+        _principals.pop(email)
+
+
+def _load_principal(db: Session, payload: dict) -> Optional[Principal]:
+    uid, mid = payload.get("uid"), payload.get("mid")
+
+    if uid is not None and "mid" in payload:
+        # token carries the ids -> only check the user is still active (PK lookup, no join)
+        row = db.execute(
+            select(User.email, User.role, User.is_active).where(User.id == uid)
+        ).first()
+        if not row or not row.is_active or row.email != payload["sub"]:
+            return None
+        return Principal(user_id=uid, email=row.email, role=row.role, merchant_id=mid)
+
+    # older tokens: user + merchant in one joined query
+    row = db.execute(
+        select(User.id, User.email, User.role, User.is_active, Merchant.id.label("merchant_id"))
+        .outerjoin(Merchant, Merchant.owner_user_id == User.id)
+        .where(User.email == payload["sub"])
+        .limit(1)
+    ).first()
+    if not row or not row.is_active:
+        return None
+    return Principal(user_id=row.id, email=row.email, role=row.role, merchant_id=row.merchant_id)
+
+
+def get_principal(
     request: Request,
     creds: HTTPAuthorizationCredentials | None = Depends(bearer),
     db: Session = Depends(get_db),
-) -> User:
+) -> Principal:
     token = None
 
     if creds and creds.credentials:
@@ -29,19 +88,52 @@ def get_current_user(
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.query(User).filter(User.email == payload["sub"]).first()
+    principal = _principals.get(payload["sub"])
+    if principal is None:
+        principal = _load_principal(db, payload)
+        if principal is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        _principals.set(payload["sub"], principal)
+    set_request_merchant(principal.merchant_id)  # context for the slow-query log
+    return principal
+
+
+def get_current_user(
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+) -> User:
+    user = db.get(User, principal.user_id)
     if not user or not user.is_active:
+        invalidate_principal(principal.email)
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
+
+def get_current_merchant_id(principal: Principal = Depends(get_principal)) -> int:
+    """Merchant id of the caller, straight from the principal (no query)."""
+    if principal.role != UserRole.merchant_admin:
+        raise HTTPException(status_code=403, detail="Only merchants can access this resource")
+    if principal.merchant_id is None:
+        raise HTTPException(status_code=403, detail="Merchant not found for this user")
+    return principal.merchant_id
+
+
+def current_merchant(db: Session, principal: Principal) -> Merchant:
+    """The caller's Merchant row (primary-key lookup)."""
+    merchant_id = get_current_merchant_id(principal)
+    m = db.get(Merchant, merchant_id)
+    if not m:
+        invalidate_principal(principal.email)
+        raise HTTPException(status_code=403, detail="Merchant not found for this user")
+    return m
+
+
 def get_current_merchant(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ) -> Merchant:
-    merchant = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not merchant:
-        raise HTTPException(status_code=404, detail="Merchant not found")
-    return merchant
+    return current_merchant(db, principal)
+
 
 def require_role(*roles: UserRole):
     def _dep(user: User = Depends(get_current_user)) -> User:
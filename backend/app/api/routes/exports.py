@@ -0,0 +1,120 @@
+from datetime import date
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.api.routes.deps import get_principal, current_merchant, Principal
+from app.models.invoice import InvoiceStatus
+from app.core.config import settings
+from app.core.jobs import Job, get_job, start_job
+from app.core.pdf_export import ExportFilters, document_refs, iter_zip, render_documents, write_export_zip
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+EXPORT_JOB = "pdf_export"
+
+
+def _filters(
+    start_date: date | None = Query(None),
+    end_date: date | None = Query(None),
+    status: str | None = Query(None, description="Invoice status (default: all except draft)"),
+    client_id: int | None = Query(None),
+    include_credit_notes: bool = Query(True),
+) -> ExportFilters:
+    if status and status not in InvoiceStatus.__members__:
+        raise HTTPException(400, f"Invalid status: {status}")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(400, "start_date must be before end_date")
+    return ExportFilters(start_date, end_date, status, client_id, include_credit_notes)
+
+
+def _zip_name(f: ExportFilters) -> str:
+    parts = ["documents"]
+    if f.start_date:
+        parts.append(f.start_date.isoformat())
+    if f.end_date:
+        parts.append(f.end_date.isoformat())
+    return "_".join(parts) + ".zip"
+
+
+@router.get("/pdf.zip")
+def export_pdfs_zip(
+    f: ExportFilters = Depends(_filters),
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    All matching invoices (+ issued credit notes) as one ZIP, streamed while rendering.
+    """
+    m = current_merchant(db, principal)
+    refs = document_refs(db, m.id, f)
+    if not refs:
+        raise HTTPException(404, "No documents match the filters")
+
+    # ✅ generator opens its own session (the request one is closed once streaming starts)
+    stream = iter_zip(render_documents(m.id, m.logo_url, refs))
+    return StreamingResponse(
+        stream,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{_zip_name(f)}"',
+            "X-Document-Count": str(len(refs)),
+        },
+    )
+
+
+@router.post("/pdf-jobs")
+def start_pdf_export_job(
+    f: ExportFilters = Depends(_filters),
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Background variant for very large exports: poll GET /exports/pdf-jobs/{id},
+    then download the ZIP when status is "done".
+    """
+    m = current_merchant(db, principal)
+    refs = document_refs(db, m.id, f)
+    if not refs:
+        raise HTTPException(404, "No documents match the filters")
+
+    merchant_id, logo_url = m.id, m.logo_url
+
+    def run(job: Job) -> str:
+        path = Path(settings.EXPORT_DIR) / f"{job.id}.zip"
+        write_export_zip(path, merchant_id, logo_url, refs, on_progress=job.progress)
+        return str(path)
+
+    def remove_file(job: Job) -> None:
+        if job.result:
+            Path(job.result).unlink(missing_ok=True)
+
+    job = start_job(EXPORT_JOB, m.id, run, total=len(refs), on_expire=remove_file)
+    return job.to_dict()
+
+
+@router.get("/pdf-jobs/{job_id}")
+def pdf_export_job_status(job_id: str, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    job = get_job(job_id, m.id, EXPORT_JOB)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+    return job.to_dict()
+
+
+@router.get("/pdf-jobs/{job_id}/download")
+def download_pdf_export_job(job_id: str, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    job = get_job(job_id, m.id, EXPORT_JOB)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+    if job.status != "done":
+        raise HTTPException(409, f"Export job is {job.status}")
+
+    path = Path(job.result)
+    if not path.exists():
+        raise HTTPException(410, "Export file expired")
+    return FileResponse(path, media_type="application/zip", filename=f"documents_{job.id[:8]}.zip")
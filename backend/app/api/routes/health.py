@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel
 from datetime import datetime
-from app.db.session import get_db
+import time
+from app.db.session import get_async_db
+from app.core import metrics
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
@@ -20,7 +22,7 @@ class HealthStatus(BaseModel):
     version: str = "0.1.0"
 
 @router.get("/", response_model=HealthStatus, summary="Health check")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """
     Check API health status
     
@@ -36,7 +38,7 @@ async def health_check(db: Session = Depends(get_db)):
     db_start = time.time()
     try:
         # Simple query to test DB connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_time = (time.time() - db_start) * 1000  # Convert to milliseconds
         db_status = DatabaseStatus(
             status="connected",
@@ -75,7 +77,7 @@ async def live_check():
     }
 
 @router.get("/ready", response_model=HealthStatus, summary="Readiness check")
-async def ready_check(db: Session = Depends(get_db)):
+async def ready_check(db: AsyncSession = Depends(get_async_db)):
     """
     Readiness probe - checks if server is ready to accept traffic
     
@@ -89,7 +91,7 @@ async def ready_check(db: Session = Depends(get_db)):
     - Detailed status of all dependencies
     """
     try:
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         return HealthStatus(
             status="healthy",
             timestamp=datetime.now(),
@@ -113,7 +115,7 @@ async def ready_check(db: Session = Depends(get_db)):
         )
 
 @router.get("/status", summary="Detailed status")
-async def detailed_status(db: Session = Depends(get_db)):
+async def detailed_status(db: AsyncSession = Depends(get_async_db)):
     """
     Get detailed system status
     
@@ -124,7 +126,7 @@ async def detailed_status(db: Session = Depends(get_db)):
     - Service availability
     """
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_ok = True
         db_message = "Connected"
     except Exception as e:
@@ -135,7 +137,9 @@ async def detailed_status(db: Session = Depends(get_db)):
         "api": {
             "name": "ACONT API",
             "version": "0.1.0",
-            "status": "running"
+            "status": "running",
+            "uptime_seconds": int(time.time() - metrics.START_TIME),
+            "requests_in_flight": int(metrics.http_in_flight.value()),
         },
         "timestamp": datetime.now().isoformat(),
         "database": {
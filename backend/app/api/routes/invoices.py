@@ -1,59 +1,54 @@
 from __future__ import annotations
 
+import base64
+import time
 from datetime import datetime, timezone, date
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.orm import Session, selectinload
 
 from app.db.session import get_db
-from app.api.routes.deps import get_current_user
-from app.models.user import User, UserRole
+from app.api.routes.deps import get_principal, get_current_merchant_id, current_merchant, Principal
 from app.models.merchant import Merchant
 from app.models.client import Client
 from app.models.product import Product
 from app.models.invoice import Invoice, InvoiceStatus
 from app.models.invoice_item import InvoiceItem
-from app.models.invoice_sequence import InvoiceSequence
-from app.models.subscription import Subscription, SubscriptionStatus
-from app.schemas.invoices import InvoiceCreateIn, InvoiceListOut, InvoiceOut
+from app.models.credit_note import CreditNote, CreditNoteStatus
+from app.models.subscription import Subscription
+from app.models.preferences import InvoiceTemplate, TaxRate
+from app.schemas.invoices import InvoiceBatchIn, InvoiceCreateIn, InvoiceListOut, InvoiceOut
 from app.core.invoice_pdf import build_invoice_pdf
+from app.core.pdf_cache import pdf_cache, invoice_cache_key, is_cacheable, etag_for, etag_matches
 from app.core.usage_tracking import check_and_increment_usage, get_usage_status, get_subscription_for_merchant, should_warn_user
-from app.core.email import send_invoice_email
+from app.core.config import settings
+from app.core.email import send_invoice_email, build_message, enqueue_message, is_email_configured, render_template
+from app.core.email_queue import EmailQueueWorker
+from app.core.pdf_export import render_in_pool, snapshot
+from app.core import editor_context, numbering, product_sales, receivables, vat_return
+from app.core.numbering import format_number, peek_next_number
+from app.core.money import basis_points, cents, compute_totals, hundredths, to_decimal
+from app.core.report_rollups import apply_rollup_deltas, invoice_deltas, record_invoice_issued, record_invoice_status_change
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
 
-@router.get("/usage-check")
-def check_invoice_usage(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """
-    Check current usage status before creating an invoice.
-    Returns warning info if user is approaching or over their limit.
-    """
-    m = _current_merchant(db, user)
-    subscription = get_subscription_for_merchant(db, m)
-    
-    if not subscription:
-        return {
-            "can_create": True,
-            "warning": None,
-        }
-    
+# Messages for different warning levels (will be translated on frontend)
+_USAGE_WARNING_MESSAGES = {
+    "approaching": "You are approaching your monthly invoice limit. Additional invoices will be charged at €{extra_price}/invoice.",
+    "at_limit": "You have reached your monthly invoice limit. Additional invoices will be charged at €{extra_price}/invoice.",
+    "over_limit": "You have exceeded your monthly limit. {extra_count} extra invoices this month will be charged €{extra_cost:.2f} on your next bill.",
+}
+
+
+def _usage_check(subscription: Subscription) -> dict:
     usage_status = get_usage_status(subscription)
     should_warn, warn_level = should_warn_user(subscription)
     
-    # Messages for different warning levels (will be translated on frontend)
-    warning_messages = {
-        "approaching": "You are approaching your monthly invoice limit. Additional invoices will be charged at €{extra_price}/invoice.",
-        "at_limit": "You have reached your monthly invoice limit. Additional invoices will be charged at €{extra_price}/invoice.",
-        "over_limit": "You have exceeded your monthly limit. {extra_count} extra invoices this month will be charged €{extra_cost:.2f} on your next bill.",
-    }
-    
     warning_message = None
-    if should_warn and warn_level in warning_messages:
-        warning_message = warning_messages[warn_level].format(
+    if should_warn and warn_level in _USAGE_WARNING_MESSAGES:
+        warning_message = _USAGE_WARNING_MESSAGES[warn_level].format(
             extra_price=usage_status.extra_unit_price,
             extra_count=usage_status.extra_count,
             extra_cost=usage_status.extra_cost,
@@ -69,6 +64,27 @@ def check_invoice_usage(
     }
 
 
+@router.get("/usage-check")
+def check_invoice_usage(
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Check current usage status before creating an invoice.
+    Returns warning info if user is approaching or over their limit.
+    """
+    m = current_merchant(db, principal)
+    subscription = get_subscription_for_merchant(db, m)
+    db.commit()  # keeps a newly created trial
+    
+    if not subscription:
+        return {
+            "can_create": True,
+            "warning": None,
+        }
+    return _usage_check(subscription)
+
+
 def normalize_lang(v: str | None) -> str:
     if not v:
         return "FR"
@@ -76,15 +92,6 @@ def normalize_lang(v: str | None) -> str:
     return v if v in ("FR", "EN", "NL") else "FR"
 
 
-def _current_merchant(db: Session, user: User) -> Merchant:
-    if user.role != UserRole.merchant_admin:
-        raise HTTPException(403, "Only merchants can access invoices")
-    m = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not m:
-        raise HTTPException(403, "Merchant not found for this user")
-    return m
-
-
 def _structured_reference_from_id(inv_id: int) -> str:
     # 10 digits + mod97 => +++xxx/xxxx/xxxxxmm+++
     raw10 = f"{inv_id:010d}"
@@ -95,114 +102,132 @@ def _structured_reference_from_id(inv_id: int) -> str:
     return f"+++{raw10[:3]}/{raw10[3:7]}/{raw10[7:]}{mod:02d}+++"
 
 
-def _compute_totals_and_breakdown_from_items(items: list[dict], discount_percent: float, advance_paid: float):
-    disc = max(0.0, float(discount_percent or 0.0)) / 100.0
-
-    subtotal_net_before = 0.0
-    subtotal_net = 0.0
-    vat_total = 0.0
-    total_gross = 0.0
-
-    breakdown: dict[str, dict[str, float]] = {}
-    computed_items: list[tuple[float, float, float]] = []
+@router.get("/meta")
+def invoices_meta(
+    issue_date: date = Query(...),
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    m = current_merchant(db, principal)
 
-    for it in items:
-        qty = float(it.get("quantity") or 0)
-        price = float(it.get("unit_price") or 0)
-        rate = float(it.get("vat_rate") or 0)
+    last_date = _last_issued_date(db, m.id)
+    next_invoice_no = format_number(peek_next_number(db, m.id, issue_date.year, numbering.INVOICE))
 
-        net_before = qty * price
-        net = net_before * (1.0 - disc)
-        vat = net * (rate / 100.0)
-        gross = net + vat
+    return {"last_issued_date": last_date, "next_invoice_no": next_invoice_no}
 
-        subtotal_net_before += net_before
-        subtotal_net += net
-        vat_total += vat
-        total_gross += gross
 
-        k = f"{rate:.2f}".rstrip("0").rstrip(".")
-        if k not in breakdown:
-            breakdown[k] = {"base": 0.0, "vat": 0.0}
-        breakdown[k]["base"] += net
-        breakdown[k]["vat"] += vat
+def _build_editor_context(db: Session, m: Merchant, year: int) -> dict:
+    subscription = get_subscription_for_merchant(db, m)
+    tax_rates = db.execute(
+        select(TaxRate.id, TaxRate.percentage, TaxRate.is_default)
+        .where(TaxRate.merchant_id == m.id)
+        .order_by(TaxRate.percentage)
+    ).all()
+    template_style = db.execute(
+        select(InvoiceTemplate.template_style).where(InvoiceTemplate.merchant_id == m.id)
+    ).scalar()
+
+    context = {
+        "usage": _usage_check(subscription) if subscription else None,
+        "last_issued_date": _last_issued_date(db, m.id),
+        "year": year,
+        "next_invoice_no": format_number(peek_next_number(db, m.id, year, numbering.INVOICE)),
+        "tax_rates": [
+            {"id": r.id, "percentage": float(r.percentage), "is_default": bool(r.is_default)}
+            for r in tax_rates
+        ],
+        "default_template": template_style or "classic",
+    }
+    db.commit()  # keeps a newly created trial
+    return context
 
-        computed_items.append((net, vat, gross))
 
-    discount_amount = subtotal_net_before - subtotal_net
-    total_due = max(0.0, total_gross - float(advance_paid or 0.0))
+@router.get("/editor-context")
+def invoice_editor_context(
+    year: int | None = Query(None, ge=2000, le=2100, description="Year of the issue date (default: current year)"),
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    What the new-invoice page needs in one call: usage-check + meta, tax rates and the
+    default template. Cached per merchant (app.core.editor_context) -> no query on a hit.
+    """
+    merchant_id = get_current_merchant_id(principal)
+    year = year or datetime.now(timezone.utc).year
 
-    return subtotal_net, vat_total, total_gross, discount_amount, total_due, breakdown, computed_items
+    context = editor_context.get(merchant_id, year)
+    if context is None:
+        gen = editor_context.generation(merchant_id)
+        context = _build_editor_context(db, current_merchant(db, principal), year)
+        editor_context.put(merchant_id, year, context, gen)
+    return context
 
 
-def _issue_number(db: Session, merchant_id: int, year: int) -> tuple[int, str]:
-    # Row lock -> no duplicates
-    seq = (
-        db.query(InvoiceSequence)
-        .filter(
-            InvoiceSequence.merchant_id == merchant_id,
-            InvoiceSequence.year == year,
-            InvoiceSequence.doc_type == "invoice",
-        )
-        .with_for_update()
-        .first()
-    )
-    if not seq:
-        seq = InvoiceSequence(merchant_id=merchant_id, year=year, doc_type="invoice", next_number=1)
-        db.add(seq)
-        db.flush()
+def _encode_cursor(issue_date: date, inv_id: int) -> str:
+    raw = f"{issue_date.isoformat()}|{inv_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    n = int(seq.next_number)
-    seq.next_number = n + 1
 
-    # ✅ cerință: 000001, 000002...
-    invoice_no = f"{n:06d}"
-    return n, invoice_no
+def _decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        d, inv_id = raw.split("|", 1)
+        return date.fromisoformat(d), int(inv_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid cursor")
 
 
-@router.get("/meta")
-def invoices_meta(
-    issue_date: date = Query(...),
-    user: User = Depends(get_current_user),
+@router.get("", response_model=list[InvoiceListOut])
+def list_invoices(
+    response: Response,
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(200, ge=1, le=500),
+    status: InvoiceStatus | None = Query(None),
+    client_id: int | None = Query(None),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    min_total: float | None = Query(None),
+    max_total: float | None = Query(None),
+    q: str | None = Query(None, description="Client name contains"),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
-    m = _current_merchant(db, user)
-
-    last = (
-        db.query(Invoice)
-        .filter(Invoice.merchant_id == m.id, Invoice.status == InvoiceStatus.issued)
-        .order_by(Invoice.issue_date.desc(), Invoice.id.desc())
-        .first()
-    )
-    last_date = last.issue_date if last else None
-
-    year = issue_date.year
-    seq = (
-        db.query(InvoiceSequence)
-        .filter(
-            InvoiceSequence.merchant_id == m.id,
-            InvoiceSequence.year == year,
-            InvoiceSequence.doc_type == "invoice",
-        )
-        .first()
-    )
-    next_n = int(seq.next_number) if seq else 1
-    next_invoice_no = f"{next_n:06d}"
-
-    return {"last_issued_date": last_date, "next_invoice_no": next_invoice_no}
+    """
+    Newest first, keyset-paginated on (issue_date, id): every page costs the same.
+    The body stays a plain list; the next page cursor is in the X-Next-Cursor header
+    (absent on the last page).
+    """
+    m = current_merchant(db, principal)
 
+    # ✅ only the listed columns, no Invoice objects
+    qry = db.query(
+        Invoice.id, Invoice.invoice_no, Invoice.status, Invoice.issue_date, Invoice.due_date,
+        Invoice.client_name, Invoice.client_email, Invoice.total_gross, Invoice.advance_paid, Invoice.notes,
+    ).filter(Invoice.merchant_id == m.id)
 
-@router.get("", response_model=list[InvoiceListOut])
-def list_invoices(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
-
-    rows = (
-        db.query(Invoice)
-        .filter(Invoice.merchant_id == m.id)
-        .order_by(Invoice.issue_date.desc(), Invoice.id.desc())
-        .limit(200)
-        .all()
-    )
+    if status:
+        qry = qry.filter(Invoice.status == status)
+    if client_id:
+        qry = qry.filter(Invoice.client_id == client_id)
+    if date_from:
+        qry = qry.filter(Invoice.issue_date >= date_from)
+    if date_to:
+        qry = qry.filter(Invoice.issue_date <= date_to)
+    if min_total is not None:
+        qry = qry.filter(Invoice.total_gross >= min_total)
+    if max_total is not None:
+        qry = qry.filter(Invoice.total_gross <= max_total)
+    if q and q.strip():
+        qry = qry.filter(Invoice.client_name.ilike(f"%{q.strip()}%"))
+    if cursor:
+        c_date, c_id = _decode_cursor(cursor)
+        qry = qry.filter(tuple_(Invoice.issue_date, Invoice.id) < tuple_(c_date, c_id))
+
+    rows = qry.order_by(Invoice.issue_date.desc(), Invoice.id.desc()).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].issue_date, rows[-1].id)
 
     return [
         InvoiceListOut(
@@ -221,31 +246,57 @@ def list_invoices(user: User = Depends(get_current_user), db: Session = Depends(
     ]
 
 
-@router.post("", response_model=InvoiceOut)
-def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
+def _load_clients(db: Session, merchant_id: int, payloads: list[InvoiceCreateIn]) -> dict[int, Client]:
+    ids = {p.client_id for p in payloads if p.client_id}
+    if not ids:
+        return {}
+    rows = db.query(Client).filter(Client.merchant_id == merchant_id, Client.id.in_(ids)).all()
+    return {c.id: c for c in rows}
+
+
+def _load_products(db: Session, merchant_id: int, payloads: list[InvoiceCreateIn]) -> dict[int, Product]:
+    ids = {it.product_id for p in payloads for it in (p.items or []) if it.product_id}
+    if not ids:
+        return {}
+    rows = db.query(Product).filter(Product.merchant_id == merchant_id, Product.id.in_(ids)).all()
+    return {p.id: p for p in rows}
 
+
+def _last_issued_date(db: Session, merchant_id: int) -> date | None:
+    # kept on the sequence rows during issuance (app.core.numbering)
+    return numbering.last_issued_date(db, merchant_id, numbering.INVOICE)
+
+
+def _chronology_error(last_issue_date: date) -> HTTPException:
+    return HTTPException(
+        400,
+        f"Issue date cannot be before last issued invoice date ({last_issue_date.isoformat()})",
+    )
+
+
+def _prepare_invoice(
+    payload: InvoiceCreateIn,
+    merchant_id: int,
+    clients: dict[int, Client],
+    products: dict[int, Product],
+    last_issue_date: date | None,
+    today: date,
+) -> dict:
+    """
+    Validate one payload and compute everything needed to insert it (no queries:
+    clients / products are prefetched). Raises HTTPException on invalid input.
+    """
     # ✅ EUR only
     if (payload.currency or "EUR").upper() != "EUR":
         raise HTTPException(400, "Only EUR is supported")
 
     # ✅ date rules
-    today = datetime.now(timezone.utc).date()
     if payload.issue_date > today:
         raise HTTPException(400, "Issue date cannot be in the future")
 
     # ✅ ordine cronologică (nu poți emite cu dată mai veche decât ultima emisă)
-    last = (
-        db.query(Invoice)
-        .filter(Invoice.merchant_id == m.id, Invoice.status == InvoiceStatus.issued)
-        .order_by(Invoice.issue_date.desc(), Invoice.id.desc())
-        .first()
-    )
-    if last and payload.issue_date < last.issue_date:
-        raise HTTPException(
-            400,
-            f"Issue date cannot be before last issued invoice date ({last.issue_date.isoformat()})",
-        )
+    if last_issue_date and payload.issue_date < last_issue_date:
+        raise _chronology_error(last_issue_date)
 
     if payload.due_date and payload.due_date < payload.issue_date:
         raise HTTPException(400, "Due date cannot be before issue date")
@@ -261,7 +312,7 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
 
     client_id = getattr(payload, "client_id", None)
     if client_id:
-        c = db.query(Client).filter(Client.id == client_id, Client.merchant_id == m.id).first()
+        c = clients.get(client_id)
         if not c:
             raise HTTPException(404, "Client not found")
         if not client_name:
@@ -285,16 +336,14 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
 
         item_code = (getattr(it, "item_code", None) or "").strip()
         desc = (getattr(it, "description", None) or "").strip()
-        qty = float(getattr(it, "quantity", 0) or 0)
-
-        unit_price_in = getattr(it, "unit_price", None)
-        vat_rate_in = getattr(it, "vat_rate", None)
+        qty = getattr(it, "quantity", 0) or 0
 
-        unit_price = float(unit_price_in) if unit_price_in is not None else None
-        vat_rate = float(vat_rate_in) if vat_rate_in is not None else None
+        # amounts stay as given (float / Decimal); the money engine converts them to cents
+        unit_price = getattr(it, "unit_price", None)
+        vat_rate = getattr(it, "vat_rate", None)
 
         if product_id:
-            p = db.query(Product).filter(Product.id == product_id, Product.merchant_id == m.id).first()
+            p = products.get(product_id)
             if not p:
                 raise HTTPException(404, "Product not found")
 
@@ -303,26 +352,25 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
             if not desc:
                 desc = (getattr(p, "name", "") or "").strip()
             if unit_price is None:
-                unit_price = float(getattr(p, "unit_price", 0) or 0)
+                unit_price = getattr(p, "unit_price", 0) or 0
             if vat_rate is None:
-                vat_rate = float(getattr(p, "vat_rate", 0) or 0)
+                vat_rate = getattr(p, "vat_rate", 0) or 0
 
         normalized_items.append(
             {
+                "product_id": product_id or None,
                 "item_code": item_code,
                 "description": desc,
-                "unit_price": float(unit_price or 0.0),
+                "unit_price": unit_price or 0,
                 "quantity": qty,
-                "vat_rate": float(vat_rate or 0.0),
+                "vat_rate": vat_rate or 0,
             }
         )
 
-    subtotal_net, vat_total, total_gross, discount_amount, total_due, breakdown, computed_items = (
-        _compute_totals_and_breakdown_from_items(
-            normalized_items,
-            discount_percent=float(payload.discount_percent or 0.0),
-            advance_paid=float(payload.advance_paid or 0.0),
-        )
+    totals = compute_totals(
+        ((it["unit_price"], it["quantity"], it["vat_rate"]) for it in normalized_items),
+        discount_percent=payload.discount_percent,
+        advance_paid=payload.advance_paid,
     )
 
     comm_mode = (getattr(payload, "communication_mode", None) or "simple").strip().lower()
@@ -330,8 +378,25 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
         comm_mode = "simple"
     comm_ref = (getattr(payload, "communication_reference", None) or "").strip()
 
-    inv = Invoice(
-        merchant_id=m.id,
+    # items (folosim normalized_items, nu umblăm la payload)
+    items = []
+    for it, line in zip(normalized_items, totals.lines):
+        items.append(
+            {
+                "product_id": it["product_id"],
+                "item_code": (it.get("item_code") or "")[:64],
+                "description": (it.get("description") or "")[:512],
+                "unit_price": to_decimal(cents(it.get("unit_price"))),
+                "quantity": to_decimal(hundredths(it.get("quantity"))),
+                "vat_rate": to_decimal(basis_points(it.get("vat_rate"))),
+                "line_net": to_decimal(line.net),
+                "line_vat": to_decimal(line.vat),
+                "line_gross": to_decimal(line.gross),
+            }
+        )
+
+    values = dict(
+        merchant_id=merchant_id,
         client_id=client_id,
 
         status=InvoiceStatus.draft,
@@ -360,62 +425,94 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
         sent_via_email=False,
         sent_via_peppol=False,
 
-        discount_percent=float(payload.discount_percent or 0),
-        advance_paid=float(payload.advance_paid or 0),
+        discount_percent=to_decimal(basis_points(payload.discount_percent)),
+        advance_paid=to_decimal(totals.advance_paid),
 
-        subtotal_net=subtotal_net,
-        vat_total=vat_total,
-        total_gross=total_gross,
+        subtotal_net=to_decimal(totals.subtotal_net),
+        vat_total=to_decimal(totals.vat_total),
+        total_gross=to_decimal(totals.total_gross),
+
+        subtotal_net_before=to_decimal(totals.subtotal_net_before),
+        discount_amount=to_decimal(totals.discount_amount),
+        total_due=to_decimal(totals.total_due),
+        vat_breakdown=totals.breakdown_out(),
 
         notes=(payload.notes or "")[:1024],
     )
+
+    return {
+        "values": values,
+        "items": items,
+        "comm_ref": comm_ref,
+    }
+
+
+def _communication_reference(values: dict, comm_ref: str, inv_id: int) -> str:
+    # ✅ structured reference auto-generate if missing
+    if values["communication_mode"] != "structured":
+        return ""
+    return comm_ref or _structured_reference_from_id(inv_id)
+
+
+def _record_issued(db: Session, inv: Invoice, items: list[dict]) -> None:
+    """Aggregate upserts of one newly issued invoice; each locks a per-merchant row until commit."""
+    record_invoice_issued(db, inv)
+    receivables.record_invoice_issued(db, inv)
+    product_sales.record_invoice_issued(db, inv, items)
+    vat_return.record_invoice_issued(db, inv)
+
+
+@router.post("", response_model=InvoiceOut)
+def create_invoice(payload: InvoiceCreateIn, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+
+    prepared = _prepare_invoice(
+        payload,
+        m.id,
+        clients=_load_clients(db, m.id, [payload]),
+        products=_load_products(db, m.id, [payload]),
+        last_issue_date=_last_issued_date(db, m.id),
+        today=datetime.now(timezone.utc).date(),
+    )
+    # may insert the trial subscription row inside this transaction (committed with the document)
+    subscription = get_subscription_for_merchant(db, m) if payload.issue_now else None
+
+    inv = Invoice(**prepared["values"])
     db.add(inv)
     db.flush()
 
-    # ✅ structured reference auto-generate if missing
-    if comm_mode == "structured":
-        if not comm_ref:
-            comm_ref = _structured_reference_from_id(inv.id)
-        inv.communication_reference = comm_ref
-    else:
-        inv.communication_reference = ""
+    inv.communication_reference = _communication_reference(prepared["values"], prepared["comm_ref"], inv.id)
 
-    # items (folosim normalized_items, nu umblăm la payload)
-    for idx, it in enumerate(normalized_items):
-        net, vat, gross = computed_items[idx]
-        db.add(
-            InvoiceItem(
-                invoice_id=inv.id,
-                item_code=(it.get("item_code") or "")[:64],
-                description=(it.get("description") or "")[:512],
-                unit_price=float(it.get("unit_price") or 0),
-                quantity=float(it.get("quantity") or 0),
-                vat_rate=float(it.get("vat_rate") or 0),
-                line_net=net,
-                line_vat=vat,
-                line_gross=gross,
-            )
-        )
+    for it in prepared["items"]:
+        db.add(InvoiceItem(invoice_id=inv.id, **it))
 
     if payload.issue_now:
-        n, inv_no = _issue_number(db, m.id, inv.year)
-        inv.number = n
-        inv.invoice_no = inv_no
         inv.status = InvoiceStatus.issued
         inv.issued_at = datetime.now(timezone.utc)
-        
+    db.flush()
+
+    if payload.issue_now:
+        # ✅ hot rows last: aggregate rows and the sequence row stay locked only until the commit below
+        _record_issued(db, inv, prepared["items"])
+        try:
+            inv.number = numbering.allocate_numbers(db, m.id, inv.year, numbering.INVOICE, issue_date=inv.issue_date)
+        except numbering.ChronologyError as e:
+            # a later-dated invoice was issued concurrently
+            raise _chronology_error(e.last_issued_date)
+        inv.invoice_no = format_number(inv.number)
+
         # ✅ Track usage when invoice is issued
-        subscription = get_subscription_for_merchant(db, m)
         if subscription:
             is_over_limit, usage_warning = check_and_increment_usage(db, subscription, document_count=1)
 
     db.commit()
+    if payload.issue_now:
+        editor_context.invalidate(m.id)
     db.refresh(inv)
     
     # ✅ Return usage warning in response if applicable
     usage_info = None
     if payload.issue_now:
-        subscription = get_subscription_for_merchant(db, m)
         if subscription:
             should_warn, warn_level = should_warn_user(subscription)
             if should_warn:
@@ -442,10 +539,10 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
         notes=inv.notes,
 
         discount_percent=float(inv.discount_percent),
-        discount_amount=float(discount_amount),
-        total_due=float(total_due),
+        discount_amount=float(inv.discount_amount),
+        total_due=float(inv.total_due),
 
-        vat_breakdown={k: {"base": float(v["base"]), "vat": float(v["vat"])} for k, v in breakdown.items()},
+        vat_breakdown=inv.vat_breakdown or {},
 
         communication_mode=getattr(inv, "communication_mode", "simple"),
         communication_reference=getattr(inv, "communication_reference", "") or "",
@@ -454,37 +551,185 @@ def create_invoice(payload: InvoiceCreateIn, user: User = Depends(get_current_us
     )
 
 
-@router.get("/{invoice_id}", response_model=InvoiceOut)
-def get_invoice(invoice_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id).first()
-    if not inv:
-        raise HTTPException(404, "Invoice not found")
+@router.post("/batch")
+def create_invoices_batch(payload: InvoiceBatchIn, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    """
+    Create many invoices in one call (nightly POS / integration imports).
+
+    Clients and products are prefetched with one IN query each, numbers are
+    reserved as one locked range per year, invoices and items are inserted in
+    bulk and usage is counted once. Invalid invoices are reported by index;
+    the valid ones are created together in one transaction.
+    """
+    m = current_merchant(db, principal)
+    payloads = payload.invoices
 
-    items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).all()
+    clients = _load_clients(db, m.id, payloads)
+    products = _load_products(db, m.id, payloads)
+    last_issue_date = _last_issued_date(db, m.id)
+    today = datetime.now(timezone.utc).date()
+
+    results: list[dict | None] = [None] * len(payloads)
+    prepared: list[tuple[int, bool, dict]] = []
+    for idx, p in enumerate(payloads):
+        try:
+            prep = _prepare_invoice(p, m.id, clients, products, last_issue_date, today)
+        except HTTPException as e:
+            results[idx] = {"index": idx, "status": "failed", "id": None, "invoice_no": None, "error": e.detail}
+            continue
+        prepared.append((idx, bool(p.issue_now), prep))
+
+    # numbers follow issue dates, so the batch keeps the chronological numbering too
+    to_issue = sorted(
+        (x for x in prepared if x[1]),
+        key=lambda x: (x[2]["values"]["issue_date"], x[0]),
+    )
+    now = datetime.now(timezone.utc)
+    for _, _, prep in to_issue:
+        prep["values"].update(status=InvoiceStatus.issued, issued_at=now)
+
+    # may insert the trial subscription row inside this transaction (committed with the document)
+    subscription = get_subscription_for_merchant(db, m) if to_issue else None
+
+    if prepared:
+        rows = []
+        for _, _, prep in prepared:
+            values = prep["values"]
+            values.setdefault("issued_at", None)
+            if values["communication_mode"] == "structured":
+                values["communication_reference"] = prep["comm_ref"]
+            rows.append(values)
+
+        ids = db.execute(
+            insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True),
+            rows,
+        ).scalars().all()
+
+        # structured references derived from the id need a second pass
+        refs = [
+            {"id": inv_id, "communication_reference": _structured_reference_from_id(inv_id)}
+            for inv_id, (_, _, prep) in zip(ids, prepared)
+            if prep["values"]["communication_mode"] == "structured" and not prep["comm_ref"]
+        ]
+        if refs:
+            db.execute(update(Invoice), refs)
+
+        items = [
+            {"invoice_id": inv_id, **it}
+            for inv_id, (_, _, prep) in zip(ids, prepared)
+            for it in prep["items"]
+        ]
+        if items:
+            db.execute(insert(InvoiceItem), items)
+
+        # ✅ hot rows last: aggregate rows and the sequence rows stay locked only until the commit below
+        apply_rollup_deltas(db, [
+            d
+            for _, _, prep in to_issue
+            for d in invoice_deltas(
+                merchant_id=m.id,
+                status=InvoiceStatus.issued,
+                issue_date=prep["values"]["issue_date"],
+                due_date=prep["values"]["due_date"],
+                net=prep["values"]["subtotal_net"],
+                vat=prep["values"]["vat_total"],
+                gross=prep["values"]["total_gross"],
+            )
+        ])
+        receivables.apply_receivable_deltas(db, [
+            d
+            for _, _, prep in to_issue
+            for d in receivables.invoice_issued_deltas(
+                merchant_id=m.id,
+                client_id=prep["values"]["client_id"],
+                issue_date=prep["values"]["issue_date"],
+                due_date=prep["values"]["due_date"],
+                gross=prep["values"]["total_gross"],
+                due=prep["values"]["total_due"],
+                today=today,
+            )
+        ])
+        product_sales.apply_product_sales_deltas(db, [
+            d
+            for _, _, prep in to_issue
+            for d in product_sales.item_deltas(m.id, prep["values"]["issue_date"], prep["items"])
+        ])
+        vat_return.apply_vat_deltas(db, [
+            d
+            for _, _, prep in to_issue
+            for d in vat_return.breakdown_deltas(
+                m.id, prep["values"]["issue_date"], prep["values"]["vat_breakdown"], vat_return.INVOICE,
+            )
+        ])
+
+        # ✅ numbers: one range per year
+        id_by_index = {idx: inv_id for inv_id, (idx, _, _) in zip(ids, prepared)}
+        by_year: dict[int, list[tuple[int, dict]]] = {}
+        for idx, _, prep in to_issue:
+            by_year.setdefault(prep["values"]["year"], []).append((id_by_index[idx], prep["values"]))
+
+        numbers = []
+        for year in sorted(by_year):
+            try:
+                first = numbering.allocate_numbers(
+                    db, m.id, year, numbering.INVOICE,
+                    count=len(by_year[year]),
+                    issue_date=max(values["issue_date"] for _, values in by_year[year]),
+                )
+            except numbering.ChronologyError as e:
+                raise _chronology_error(e.last_issued_date)
+            for offset, (inv_id, values) in enumerate(by_year[year]):
+                values.update(number=first + offset, invoice_no=format_number(first + offset))
+                numbers.append({"id": inv_id, "number": values["number"], "invoice_no": values["invoice_no"]})
+        if numbers:
+            db.execute(update(Invoice), numbers)
+
+        for inv_id, (idx, _, prep) in zip(ids, prepared):
+            results[idx] = {
+                "index": idx,
+                "status": "created",
+                "id": inv_id,
+                "invoice_no": prep["values"]["invoice_no"] or "DRAFT",
+                "error": None,
+            }
 
-    breakdown: dict[str, dict[str, float]] = {}
-    for it in items:
-        rate = float(getattr(it, "vat_rate", 0.0) or 0.0)
-        k = f"{rate:.2f}".rstrip("0").rstrip(".")
-        if k not in breakdown:
-            breakdown[k] = {"base": 0.0, "vat": 0.0}
-        breakdown[k]["base"] += float(getattr(it, "line_net", 0.0) or 0.0)
-        breakdown[k]["vat"] += float(getattr(it, "line_vat", 0.0) or 0.0)
+    # ✅ Track usage once for the whole batch
+    usage_info = None
+    if subscription:
+        check_and_increment_usage(db, subscription, document_count=len(to_issue))
+        should_warn, warn_level = should_warn_user(subscription)
+        if should_warn:
+            usage_info = {"warning_level": warn_level, **get_usage_status(subscription).to_dict()}
 
-    disc = max(0.0, float(getattr(inv, "discount_percent", 0.0) or 0.0)) / 100.0
-    subtotal_net = float(getattr(inv, "subtotal_net", 0.0) or 0.0)
+    db.commit()
+    if to_issue:
+        editor_context.invalidate(m.id)
+
+    return {
+        "results": results,
+        "created": len(prepared),
+        "issued": len(to_issue),
+        "failed": len(payloads) - len(prepared),
+        "usage": usage_info,
+    }
 
-    if disc > 0.0 and disc < 1.0:
-        subtotal_net_before = sum(float(getattr(it, "line_net", 0.0) or 0.0) / (1.0 - disc) for it in items)
-    else:
-        subtotal_net_before = subtotal_net
 
-    discount_amount = max(0.0, subtotal_net_before - subtotal_net)
+@router.get("/{invoice_id}", response_model=InvoiceOut)
+def get_invoice(invoice_id: int, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    inv = (
+        db.query(Invoice)
+        .options(selectinload(Invoice.items))
+        .filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id)
+        .first()
+    )
+    if not inv:
+        raise HTTPException(404, "Invoice not found")
 
-    total_gross = float(getattr(inv, "total_gross", 0.0) or 0.0)
-    advance_paid = float(getattr(inv, "advance_paid", 0.0) or 0.0)
-    total_due = max(0.0, total_gross - advance_paid)
+    # ✅ totals / breakdown stored at write time -> nothing to recompute here
+    total_gross = float(inv.total_gross)
+    advance_paid = float(inv.advance_paid)
+    subtotal_net = float(inv.subtotal_net)
 
     return InvoiceOut(
         id=inv.id,
@@ -517,10 +762,10 @@ def get_invoice(invoice_id: int, user: User = Depends(get_current_user), db: Ses
     ],
 
         discount_percent=float(getattr(inv, "discount_percent", 0.0) or 0.0),
-        discount_amount=float(discount_amount),
-        total_due=float(total_due),
+        discount_amount=float(inv.discount_amount),
+        total_due=float(inv.total_due),
 
-        vat_breakdown={k: {"base": float(v["base"]), "vat": float(v["vat"])} for k, v in breakdown.items()},
+        vat_breakdown=inv.vat_breakdown or {},
 
         communication_mode=getattr(inv, "communication_mode", "simple"),
         communication_reference=getattr(inv, "communication_reference", "") or "",
@@ -529,95 +774,304 @@ def get_invoice(invoice_id: int, user: User = Depends(get_current_user), db: Ses
     )
    
 
+def _set_invoice_status(db: Session, m: Merchant, invoice_id: int, new_status: InvoiceStatus, allowed_from: tuple) -> Invoice:
+    inv = (
+        db.query(Invoice)
+        .filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id)
+        .with_for_update()
+        .first()
+    )
+    if not inv:
+        raise HTTPException(404, "Invoice not found")
+    if inv.status not in allowed_from:
+        raise HTTPException(400, f"Cannot change invoice status from {inv.status.value} to {new_status.value}")
+    # ✅ an issued credit note stays in the rollups / ledgers -> voiding the invoice would count it twice
+    if new_status == InvoiceStatus.void and db.query(
+        select(CreditNote.id)
+        .where(CreditNote.invoice_id == inv.id, CreditNote.status == CreditNoteStatus.issued)
+        .exists()
+    ).scalar():
+        raise HTTPException(400, "Cannot void an invoice that has issued credit notes")
+
+    old_status = inv.status
+    inv.status = new_status
+    record_invoice_status_change(db, inv, old_status, new_status)
+    receivables.record_invoice_status_change(db, inv, old_status, new_status)
+    product_sales.record_invoice_status_change(db, inv, old_status, new_status)
+    vat_return.record_invoice_status_change(db, inv, old_status, new_status)
+    db.commit()
+    return inv
+
+
+@router.post("/{invoice_id}/mark-paid")
+def mark_invoice_paid(invoice_id: int, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    inv = _set_invoice_status(db, m, invoice_id, InvoiceStatus.paid, (InvoiceStatus.issued,))
+    return {"ok": True, "id": inv.id, "status": inv.status.value}
+
+
+@router.post("/{invoice_id}/void")
+def void_invoice(invoice_id: int, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    inv = _set_invoice_status(db, m, invoice_id, InvoiceStatus.void, (InvoiceStatus.draft, InvoiceStatus.issued))
+    return {"ok": True, "id": inv.id, "status": inv.status.value}
+
+
+def _invoice_pdf_bytes(inv: Invoice, m: Merchant) -> bytes:
+    # ✅ issued invoices are immutable -> serve from the render cache; drafts always re-render
+    if not is_cacheable(inv):
+        return build_invoice_pdf(inv, merchant_logo_url=m.logo_url)
+    key = invoice_cache_key(inv, m.logo_url)
+    return pdf_cache.get_or_render(key, lambda: build_invoice_pdf(inv, merchant_logo_url=m.logo_url))
+
+
 @router.get("/{invoice_id}/pdf")
-def download_invoice_pdf(invoice_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    m = _current_merchant(db, user)
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id).first()
+def download_invoice_pdf(invoice_id: int, request: Request, principal: Principal = Depends(get_principal), db: Session = Depends(get_db)):
+    m = current_merchant(db, principal)
+    inv = (
+        db.query(Invoice)
+        .options(selectinload(Invoice.items))
+        .filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id)
+        .first()
+    )
     if not inv:
         raise HTTPException(404, "Invoice not found")
 
-    pdf = build_invoice_pdf(inv, merchant_logo_url=m.logo_url)
     filename = (inv.invoice_no or f"invoice-{inv.id}").replace("/", "-") + ".pdf"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if is_cacheable(inv):
+        key = invoice_cache_key(inv, m.logo_url)
+        headers["ETag"] = etag_for(key)
+        headers["Cache-Control"] = "private, no-cache"
+        if etag_matches(request.headers.get("if-none-match"), key):
+            return Response(status_code=304, headers=headers)
+
+    pdf = _invoice_pdf_bytes(inv, m)
 
     return Response(
         content=pdf,
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers=headers,
     )
 
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class SendEmailRequest(BaseModel):
     from_email: EmailStr
     to_email: EmailStr
 
 
+class BatchSendEmailRequest(BaseModel):
+    from_email: EmailStr
+    # explicit ids, or (when omitted) every issued invoice not yet sent by email
+    invoice_ids: list[int] | None = None
+    limit: int = Field(500, ge=1, le=2000)
+
+
+def _check_sender_email(m: Merchant, from_email: str) -> None:
+    # Validate that the from_email belongs to this merchant
+    valid_emails = [
+        m.communication_email,
+        m.client_invoices_email,
+        m.supplier_invoices_email,
+    ]
+    valid_emails = [e for e in valid_emails if e]  # filter empty
+    
+    if from_email not in valid_emails:
+        raise HTTPException(400, "Invalid sender email. Please configure your email in Settings.")
+
+
+def _invoice_email_fields(inv: Invoice, m: Merchant) -> dict:
+    return {
+        "client_name": inv.client_name,
+        "company_name": m.company_name,
+        "invoice_no": inv.invoice_no,
+        "issue_date": inv.issue_date.strftime("%d/%m/%Y") if inv.issue_date else "",
+        "due_date": inv.due_date.strftime("%d/%m/%Y") if inv.due_date else "",
+        "total_amount": f"{float(inv.total_gross):.2f}",
+        "payment_reference": inv.communication_reference or inv.invoice_no or "",
+        "language": (inv.language or "FR").lower()[:2],
+    }
+
+
 @router.post("/{invoice_id}/send-email")
 def send_invoice_email_endpoint(
     invoice_id: int,
     req: SendEmailRequest,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
     Send invoice PDF via email.
     Uses SMTP service if configured, otherwise logs to console.
     """
-    m = _current_merchant(db, user)
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id).first()
+    m = current_merchant(db, principal)
+    inv = (
+        db.query(Invoice)
+        .options(selectinload(Invoice.items))
+        .filter(Invoice.id == invoice_id, Invoice.merchant_id == m.id)
+        .first()
+    )
     if not inv:
         raise HTTPException(404, "Invoice not found")
 
-    # Validate that the from_email belongs to this merchant
-    valid_emails = [
-        m.communication_email,
-        m.client_invoices_email,
-        m.supplier_invoices_email,
-    ]
-    valid_emails = [e for e in valid_emails if e]  # filter empty
-    
-    if req.from_email not in valid_emails:
-        raise HTTPException(400, "Invalid sender email. Please configure your email in Settings.")
+    _check_sender_email(m, req.from_email)
 
     # Generate PDF
-    pdf = build_invoice_pdf(inv, merchant_logo_url=m.logo_url)
-    filename = (inv.invoice_no or f"invoice-{inv.id}").replace("/", "-") + ".pdf"
-    
-    # Prepare invoice details
-    issue_date_str = inv.issue_date.strftime("%d/%m/%Y") if inv.issue_date else ""
-    due_date_str = inv.due_date.strftime("%d/%m/%Y") if inv.due_date else ""
-    total_amount_str = f"{float(inv.total_gross):.2f}"
-    payment_ref = inv.communication_reference or inv.invoice_no or ""
-    
-    # Determine language
-    language = (inv.language or "FR").lower()[:2]
+    pdf = _invoice_pdf_bytes(inv, m)
     
-    # Send email using email service
-    email_sent = send_invoice_email(
+    # Queue email (delivered by the email worker; the request does not wait for SMTP)
+    email_queued = send_invoice_email(
         to_email=req.to_email,
-        client_name=inv.client_name,
-        company_name=m.company_name,
-        invoice_no=inv.invoice_no,
-        issue_date=issue_date_str,
-        due_date=due_date_str,
-        total_amount=total_amount_str,
-        payment_reference=payment_ref,
-        language=language,
+        **_invoice_email_fields(inv, m),
         from_email=req.from_email,
         pdf_attachment=pdf,
+        db=db,
+        invoice_id=inv.id,
     )
     
-    # Mark invoice as sent via email
+    # Mark invoice as sent via email (email_sent_at is set once the worker delivers it)
     inv.sent_via_email = True
     db.commit()
     
     return {
         "success": True,
-        "email_sent": email_sent,
-        "message": f"Invoice {inv.invoice_no} {'sent' if email_sent else 'queued'} to {req.to_email}",
+        "email_queued": email_queued,
+        "message": f"Invoice {inv.invoice_no} queued to {req.to_email}",
         "from_email": req.from_email,
         "to_email": req.to_email,
         "invoice_no": inv.invoice_no,
     }
 
+
+@router.post("/send-email/batch")
+def send_invoice_emails_batch(
+    req: BatchSendEmailRequest,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Month-end campaign: email many invoices to their clients in one call.
+
+    PDFs are rendered in the export process pool while already rendered ones are
+    delivered over EMAIL_BATCH_CONNECTIONS long-lived SMTP sessions. Transient SMTP
+    failures (and everything, when SMTP is not configured) fall back to the outbox.
+    """
+    m = current_merchant(db, principal)
+    _check_sender_email(m, req.from_email)
+    started = time.perf_counter()
+
+    q = (
+        db.query(Invoice)
+        .options(selectinload(Invoice.items))
+        .filter(Invoice.merchant_id == m.id, Invoice.status.in_([InvoiceStatus.issued, InvoiceStatus.paid]))
+    )
+    if req.invoice_ids:
+        q = q.filter(Invoice.id.in_(req.invoice_ids))
+    else:
+        q = q.filter(Invoice.status == InvoiceStatus.issued, Invoice.sent_via_email.is_(False))
+    invoices = q.order_by(Invoice.id).limit(req.limit).all()
+
+    results: dict[int, dict] = {}
+    for inv_id in req.invoice_ids or []:
+        results[inv_id] = {"invoice_id": inv_id, "status": "skipped", "error": "not found or not issued"}
+
+    sendable = {}
+    for inv in invoices:
+        if inv.client_email:
+            sendable[inv.id] = inv
+        else:
+            results[inv.id] = {"invoice_id": inv.id, "status": "skipped", "error": "client has no email"}
+
+    worker = EmailQueueWorker(connections=settings.EMAIL_BATCH_CONNECTIONS) if is_email_configured() else None
+    in_flight = []
+    sent_ids, queued_ids = [], []
+    rendered_at = started
+
+    try:
+        docs = ((str(inv.id), "invoice", snapshot(inv)) for inv in sendable.values())
+        for name, pdf, error in render_in_pool(docs, m.logo_url):
+            inv = sendable[int(name)]
+            if pdf is None:
+                results[inv.id] = {"invoice_id": inv.id, "status": "failed", "error": f"render: {error}"}
+                continue
+
+            fields = _invoice_email_fields(inv, m)
+            rendered = render_template("invoice_sent", fields.pop("language"), fields)
+            if rendered is None:
+                results[inv.id] = {"invoice_id": inv.id, "status": "failed", "error": "email template"}
+                continue
+            subject, body = rendered
+            msg = build_message(
+                inv.client_email, subject, body, from_email=req.from_email,
+                attachments=[(f"invoice_{inv.invoice_no}.pdf", pdf, "application/pdf")],
+            )
+
+            if worker is None:
+                enqueue_message(db, msg, ref_type="invoice", ref_id=inv.id)
+                queued_ids.append(inv.id)
+                continue
+
+            row = _BatchMessage(inv.client_email, msg["From"], msg.as_bytes())
+            in_flight.append((inv, msg, worker.submit(row)))
+        rendered_at = time.perf_counter()
+
+        for inv, msg, fut in in_flight:
+            error, permanent = fut.result()
+            if error is None:
+                sent_ids.append(inv.id)
+            elif permanent:
+                results[inv.id] = {"invoice_id": inv.id, "status": "failed", "error": error}
+            else:
+                # transient (connection, 4xx) -> durable retry through the outbox
+                enqueue_message(db, msg, ref_type="invoice", ref_id=inv.id)
+                queued_ids.append(inv.id)
+    finally:
+        if worker is not None:
+            worker.close()
+
+    now = datetime.now(timezone.utc)
+    if sent_ids:
+        db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(sent_ids))
+            .values(sent_via_email=True, email_sent_at=now)
+        )
+    if queued_ids:
+        db.execute(update(Invoice).where(Invoice.id.in_(queued_ids)).values(sent_via_email=True))
+    db.commit()
+
+    for inv_id in sent_ids:
+        results[inv_id] = {"invoice_id": inv_id, "status": "sent", "error": None}
+    for inv_id in queued_ids:
+        results[inv_id] = {"invoice_id": inv_id, "status": "queued", "error": None}
+
+    elapsed = time.perf_counter() - started
+    counts = {k: 0 for k in ("sent", "queued", "failed", "skipped")}
+    for r in results.values():
+        counts[r["status"]] += 1
+
+    return {
+        "results": [results[k] for k in sorted(results)],
+        **counts,
+        "metrics": {
+            "invoices": len(sendable),
+            "smtp_connections": worker.connections if worker else 0,
+            "render_seconds": round(rendered_at - started, 3),
+            "total_seconds": round(elapsed, 3),
+            "emails_per_second": round(len(sent_ids) / elapsed, 2) if elapsed > 0 else None,
+        },
+    }
+
+
+class _BatchMessage:
+    """Row-like object accepted by EmailQueueWorker.submit."""
+    __slots__ = ("to_email", "to_domain", "from_email", "message")
+
+    def __init__(self, to_email: str, from_email: str, message: bytes):
+        self.to_email = to_email
+        self.to_domain = to_email.rsplit("@", 1)[-1].lower()
+        self.from_email = from_email
+        self.message = message
@@ -4,24 +4,16 @@ from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
-from app.api.routes.deps import require_role
+from app.api.routes.deps import get_current_merchant
 from app.models.user import User, UserRole
 from app.models.merchant import Merchant
+from app.core.pdf_assets import invalidate_logo
 
 router = APIRouter(prefix="/merchants", tags=["Merchants"])
 
 LOGOS_DIR = Path("static/logos")
 LOGOS_DIR.mkdir(parents=True, exist_ok=True)
 
-def get_current_merchant(
-    user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
-) -> Merchant:
-    m = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not m:
-        raise HTTPException(status_code=403, detail="Merchant not found for this user")
-    return m
-
 @router.post("/me/logo")
 async def upload_my_logo(
     file: UploadFile = File(...),
@@ -39,6 +31,10 @@ async def upload_my_logo(
     out_path = LOGOS_DIR / f"merchant_{merchant.id}{ext}"
     out_path.write_bytes(data)
 
+    # ✅ drop the decoded logo (old url and new one; extension may have changed)
+    invalidate_logo(merchant.logo_url)
+    invalidate_logo(f"/static/logos/merchant_{merchant.id}{ext}")
+
     merchant.logo_url = f"/static/logos/merchant_{merchant.id}{ext}"
     db.add(merchant)
     db.commit()
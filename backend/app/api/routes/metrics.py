@@ -0,0 +1,33 @@
+import hmac
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.core import metrics
+from app.core.config import settings
+
+router = APIRouter(tags=["metrics"])
+
+_LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def _allowed(request: Request) -> bool:
+    if settings.METRICS_TOKEN:
+        auth = request.headers.get("authorization", "")
+        if hmac.compare_digest(auth, f"Bearer {settings.METRICS_TOKEN}"):
+            return True
+
+    host = request.client.host if request.client else ""
+    if host in settings.METRICS_ALLOWED_IPS:
+        return True
+    # a request forwarded by a local reverse proxy is not local
+    if "x-forwarded-for" in request.headers or "forwarded" in request.headers:
+        return False
+    return host in _LOCAL_HOSTS
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    if not settings.METRICS_ENABLED or not _allowed(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,36 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.api.routes.deps import get_current_user, get_current_merchant
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.db.session import get_async_db
+from app.api.routes.deps import get_current_user
 from app.models.user import User
 from app.models.preferences import (
-    BankDetails, TaxRate, InvoiceTemplate, 
-    SubscriptionInfo, EmailExpenses, PeppolIntegration
+    BankDetails, TaxRate, InvoiceTemplate, EmailExpenses, PeppolIntegration
 )
 from app.schemas.preferences import (
-    BankDetailsCreate, BankDetailsUpdate, BankDetailsResponse,
+    BankDetailsUpdate, BankDetailsResponse,
     TaxRateCreate, TaxRateUpdate, TaxRateResponse,
-    InvoiceTemplateCreate, InvoiceTemplateUpdate, InvoiceTemplateResponse,
-    SubscriptionInfoCreate, SubscriptionInfoResponse,
+    InvoiceTemplateUpdate, InvoiceTemplateResponse,
+    SubscriptionInfoResponse,
     EmailExpensesCreate, EmailExpensesUpdate, EmailExpensesResponse,
-    PeppolIntegrationCreate, PeppolIntegrationUpdate, PeppolIntegrationResponse,
+    PeppolIntegrationUpdate, PeppolIntegrationResponse,
     PreferencesResponse
 )
 from app.models.merchant import Merchant
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel
 from typing import Optional
-from app.core.security import hash_password, verify_password
+from app.core import editor_context
 
 router = APIRouter(prefix="/preferences", tags=["preferences"])
 
-# Helper to get merchant
+# Helper to get merchant (preferences relationships eager-loaded: no lazy IO on AsyncSession)
 async def get_merchant(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Merchant:
-    merchant = db.query(Merchant).filter(
-        Merchant.owner_user_id == current_user.id
-    ).first()
+    merchant = await db.scalar(
+        select(Merchant)
+        .where(Merchant.owner_user_id == current_user.id)
+        .options(
+            selectinload(Merchant.bank_details),
+            selectinload(Merchant.tax_rates),
+            selectinload(Merchant.invoice_template),
+            selectinload(Merchant.subscription_info),
+            selectinload(Merchant.email_expenses),
+            selectinload(Merchant.peppol_integration),
+        )
+        .limit(1)
+    )
     if not merchant:
         raise HTTPException(status_code=404, detail="Merchant not found")
     return merchant
@@ -39,7 +50,7 @@ async def get_merchant(
 @router.get("/", response_model=PreferencesResponse, summary="Get all preferences")
 async def get_all_preferences(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all preferences/settings for current merchant"""
     return PreferencesResponse(
@@ -55,15 +66,15 @@ async def get_all_preferences(
 @router.get("/bank", response_model=BankDetailsResponse, summary="Get bank details")
 async def get_bank_details(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get merchant bank details"""
     if not merchant.bank_details:
         # Create default empty record
         bank = BankDetails(merchant_id=str(merchant.id))
         db.add(bank)
-        db.commit()
-        db.refresh(bank)
+        await db.commit()
+        await db.refresh(bank)
         return bank
     return merchant.bank_details
 
@@ -71,7 +82,7 @@ async def get_bank_details(
 async def update_bank_details(
     data: BankDetailsUpdate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update merchant bank details"""
     bank = merchant.bank_details
@@ -82,15 +93,15 @@ async def update_bank_details(
     for field, value in data.dict(exclude_unset=True).items():
         setattr(bank, field, value)
     
-    db.commit()
-    db.refresh(bank)
+    await db.commit()
+    await db.refresh(bank)
     return bank
 
 # ==================== TAX RATES ====================
 @router.get("/tax-rates", response_model=list[TaxRateResponse], summary="Get tax rates")
 async def get_tax_rates(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all tax rates for merchant"""
     return merchant.tax_rates
@@ -99,13 +110,14 @@ async def get_tax_rates(
 async def create_tax_rate(
     data: TaxRateCreate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create new tax rate"""
     rate = TaxRate(merchant_id=str(merchant.id), **data.dict())
     db.add(rate)
-    db.commit()
-    db.refresh(rate)
+    await db.commit()
+    editor_context.invalidate(merchant.id)
+    await db.refresh(rate)
     return rate
 
 @router.put("/tax-rates/{rate_id}", response_model=TaxRateResponse, summary="Update tax rate")
@@ -113,52 +125,54 @@ async def update_tax_rate(
     rate_id: str,
     data: TaxRateUpdate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update tax rate"""
-    rate = db.query(TaxRate).filter(
+    rate = await db.scalar(select(TaxRate).where(
         TaxRate.id == rate_id,
         TaxRate.merchant_id == str(merchant.id)
-    ).first()
+    ))
     if not rate:
         raise HTTPException(status_code=404, detail="Tax rate not found")
     
     for field, value in data.dict(exclude_unset=True).items():
         setattr(rate, field, value)
     
-    db.commit()
-    db.refresh(rate)
+    await db.commit()
+    editor_context.invalidate(merchant.id)
+    await db.refresh(rate)
     return rate
 
 @router.delete("/tax-rates/{rate_id}", status_code=204, summary="Delete tax rate")
 async def delete_tax_rate(
     rate_id: str,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete tax rate"""
-    rate = db.query(TaxRate).filter(
+    rate = await db.scalar(select(TaxRate).where(
         TaxRate.id == rate_id,
         TaxRate.merchant_id == str(merchant.id)
-    ).first()
+    ))
     if not rate:
         raise HTTPException(status_code=404, detail="Tax rate not found")
     
-    db.delete(rate)
-    db.commit()
+    await db.delete(rate)
+    await db.commit()
+    editor_context.invalidate(merchant.id)
 
 # ==================== INVOICE TEMPLATE ====================
 @router.get("/invoice-template", response_model=InvoiceTemplateResponse, summary="Get invoice template")
 async def get_invoice_template(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get invoice template settings"""
     if not merchant.invoice_template:
         template = InvoiceTemplate(merchant_id=str(merchant.id))
         db.add(template)
-        db.commit()
-        db.refresh(template)
+        await db.commit()
+        await db.refresh(template)
         return template
     return merchant.invoice_template
 
@@ -166,7 +180,7 @@ async def get_invoice_template(
 async def update_invoice_template(
     data: InvoiceTemplateUpdate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update invoice template settings"""
     template = merchant.invoice_template
@@ -177,15 +191,16 @@ async def update_invoice_template(
     for field, value in data.dict(exclude_unset=True).items():
         setattr(template, field, value)
     
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    editor_context.invalidate(merchant.id)
+    await db.refresh(template)
     return template
 
 # ==================== SUBSCRIPTION INFO ====================
 @router.get("/subscription", response_model=SubscriptionInfoResponse, summary="Get subscription info")
 async def get_subscription(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get subscription/plan information"""
     if not merchant.subscription_info:
@@ -196,7 +211,7 @@ async def get_subscription(
 @router.get("/email-expenses", response_model=list[EmailExpensesResponse], summary="Get email accounts")
 async def get_email_expenses(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all email accounts for expenses/bills"""
     return merchant.email_expenses
@@ -205,7 +220,7 @@ async def get_email_expenses(
 async def create_email_expense(
     data: EmailExpensesCreate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add new email account for expense collection"""
     email = EmailExpenses(
@@ -216,8 +231,8 @@ async def create_email_expense(
         imap_port=data.imap_port
     )
     db.add(email)
-    db.commit()
-    db.refresh(email)
+    await db.commit()
+    await db.refresh(email)
     return email
 
 @router.put("/email-expenses/{email_id}", response_model=EmailExpensesResponse, summary="Update email account")
@@ -225,52 +240,52 @@ async def update_email_expense(
     email_id: str,
     data: EmailExpensesUpdate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update email account"""
-    email = db.query(EmailExpenses).filter(
+    email = await db.scalar(select(EmailExpenses).where(
         EmailExpenses.id == email_id,
         EmailExpenses.merchant_id == str(merchant.id)
-    ).first()
+    ))
     if not email:
         raise HTTPException(status_code=404, detail="Email account not found")
     
     for field, value in data.dict(exclude_unset=True).items():
         setattr(email, field, value)
     
-    db.commit()
-    db.refresh(email)
+    await db.commit()
+    await db.refresh(email)
     return email
 
 @router.delete("/email-expenses/{email_id}", status_code=204, summary="Delete email account")
 async def delete_email_expense(
     email_id: str,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete email account"""
-    email = db.query(EmailExpenses).filter(
+    email = await db.scalar(select(EmailExpenses).where(
         EmailExpenses.id == email_id,
         EmailExpenses.merchant_id == str(merchant.id)
-    ).first()
+    ))
     if not email:
         raise HTTPException(status_code=404, detail="Email account not found")
     
-    db.delete(email)
-    db.commit()
+    await db.delete(email)
+    await db.commit()
 
 # ==================== PEPPOL INTEGRATION ====================
 @router.get("/peppol", response_model=PeppolIntegrationResponse, summary="Get PEPPOL status")
 async def get_peppol_integration(
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get PEPPOL integration status"""
     if not merchant.peppol_integration:
         peppol = PeppolIntegration(merchant_id=str(merchant.id))
         db.add(peppol)
-        db.commit()
-        db.refresh(peppol)
+        await db.commit()
+        await db.refresh(peppol)
         return peppol
     return merchant.peppol_integration
 
@@ -278,7 +293,7 @@ async def get_peppol_integration(
 async def update_peppol_integration(
     data: PeppolIntegrationUpdate,
     merchant: Merchant = Depends(get_merchant),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update PEPPOL ID"""
     peppol = merchant.peppol_integration
@@ -289,8 +304,8 @@ async def update_peppol_integration(
     for field, value in data.dict(exclude_unset=True).items():
         setattr(peppol, field, value)
     
-    db.commit()
-    db.refresh(peppol)
+    await db.commit()
+    await db.refresh(peppol)
     return peppol
 
 
@@ -309,7 +324,7 @@ class AccountUpdate(BaseModel):
 @router.get("/account")
 async def get_account(
     current_user: User = Depends(get_current_user),
-    merchant: Merchant = Depends(get_current_merchant),
+    merchant: Merchant = Depends(get_merchant),
 ):
     """Get user and merchant account info"""
     return {
@@ -329,10 +344,13 @@ async def get_account(
 async def update_account(
     data: AccountUpdate,
     current_user: User = Depends(get_current_user),
-    merchant: Merchant = Depends(get_current_merchant),
-    db: Session = Depends(get_db)
+    merchant: Merchant = Depends(get_merchant),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user and merchant account info"""
+    # current_user comes from the auth (sync) session -> re-load it in this async session
+    current_user = await db.get(User, current_user.id)
+
     # Update user fields
     if data.first_name is not None:
         current_user.first_name = data.first_name
@@ -353,11 +371,9 @@ async def update_account(
     if data.supplier_invoices_email is not None:
         merchant.supplier_invoices_email = data.supplier_invoices_email
     
-    db.add(current_user)
-    db.add(merchant)
-    db.commit()
-    db.refresh(current_user)
-    db.refresh(merchant)
+    await db.commit()
+    await db.refresh(current_user)
+    await db.refresh(merchant)
     
     return {
         "first_name": current_user.first_name,
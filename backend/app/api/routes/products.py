@@ -1,29 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.core import search
 from app.db.session import get_db
-from app.api.routes.clients import get_current_merchant
+from app.api.routes.deps import get_current_merchant, get_current_merchant_id
 from app.models.product import Product
 from app.schemas.products import ProductCreate, ProductOut, ProductUpdate
 from app.models.merchant import Merchant
 
-from fastapi import UploadFile, File
-from decimal import Decimal, InvalidOperation
-import csv
-import io
+from fastapi import UploadFile, File, Query
+from sqlalchemy.exc import IntegrityError
+import os
+import shutil
+import tempfile
+
+from app.db.session import SessionLocal
+from app.core.jobs import Job, get_job, start_job
+from app.core.product_import import CsvImportError, import_products_csv
 
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+IMPORT_JOB = "product_import"
+
+
+def _normalize_code(data: dict) -> dict:
+    # blank code = no code (codes are unique per merchant)
+    if "code" in data:
+        data["code"] = (data["code"] or "").strip() or None
+    return data
+
+
+def _commit_product(db: Session) -> None:
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A product with this code already exists")
+
+
 @router.get("/", response_model=List[ProductOut])
 def list_products(
+    response: Response,
+    q: str | None = Query(None, description="Name prefix, or part of name / code (3+ chars)"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(200, ge=1, le=500),
     db: Session = Depends(get_db),
-    merchant: Merchant = Depends(get_current_merchant),
+    merchant_id: int = Depends(get_current_merchant_id),
 ):
-    return db.query(Product).filter(
-        Product.merchant_id == merchant.id
-    ).all()
+    """
+    By name, keyset-paginated on (lower(name), id). The body stays a plain list;
+    the next page cursor is in the X-Next-Cursor header (absent on the last page).
+    """
+    # ✅ only the listed columns, no Product objects
+    stmt = select(
+        Product.id, Product.code, Product.name, Product.description, Product.unit_price, Product.vat_rate,
+        search.name_key(Product.name).label("sort_key"),
+    ).where(Product.merchant_id == merchant_id)
+    term = search.normalize_term(q)
+    if term:
+        stmt = stmt.where(search.search_filter(Product.name, (Product.name, Product.code), term))
+
+    rows, next_cursor = search.page(db, stmt, Product.name, Product.id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 @router.post("/", response_model=ProductOut)
 def create_product(
@@ -32,11 +75,11 @@ def create_product(
     merchant: Merchant = Depends(get_current_merchant),
 ):
     product = Product(
-        **payload.dict(),
+        **_normalize_code(payload.dict()),
         merchant_id=merchant.id,
     )
     db.add(product)
-    db.commit()
+    _commit_product(db)
     db.refresh(product)
     return product
 
@@ -55,125 +98,65 @@ def update_product(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    for k, v in payload.dict(exclude_unset=True).items():
+    for k, v in _normalize_code(payload.dict(exclude_unset=True)).items():
         setattr(product, k, v)
 
-    db.commit()
+    _commit_product(db)
     db.refresh(product)
     return product
 
 
 @router.post("/upload-csv")
-async def upload_products_csv(
+def upload_products_csv(
     file: UploadFile = File(...),
+    background: bool = Query(False, description="Import in a background job (poll /products/import-jobs/{id})"),
     db: Session = Depends(get_db),
     merchant: Merchant = Depends(get_current_merchant),
 ):
+    """
+    Import / update products from a CSV (columns: name, unit_price, optional code,
+    description, vat_rate). Rows with an existing code update that product.
+    The file is parsed as a stream and written in chunks, so catalog size is not capped.
+    """
     # Acceptă doar CSV
     if not file.filename or not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="File must be a .csv")
 
-    raw = await file.read()
-    try:
-        text = raw.decode("utf-8-sig")  # suportă UTF-8 + BOM
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid CSV encoding (use UTF-8)")
-
-    reader = csv.DictReader(io.StringIO(text))
-    if not reader.fieldnames:
-        raise HTTPException(status_code=400, detail="CSV must include a header row")
-
-    # Coloane acceptate (nu te obligă să le ai pe toate)
-    # Recomandat: name, unit_price sunt obligatorii pe fiecare rând
-    required_cols = {"name", "unit_price"}
-    missing_required = required_cols - set([c.strip() for c in reader.fieldnames])
-    if missing_required:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns: {', '.join(sorted(missing_required))}",
-        )
-
-    def parse_decimal(val: str, default: Decimal | None = None) -> Decimal | None:
-        if val is None:
-            return default
-        s = str(val).strip()
-        if s == "":
-            return default
-        # acceptă și 12,34
-        s = s.replace(",", ".")
+    if not background:
         try:
-            return Decimal(s)
-        except (InvalidOperation, ValueError):
-            return None
-
-    created = 0
-    updated = 0
-    errors = []
-
-    # opțional: limite ca să nu bage cineva 200k rânduri
-    MAX_ROWS = 5000
-    row_index = 1  # 1-based pentru user (după header)
-
-    for row in reader:
-        row_index += 1
-        if row_index > MAX_ROWS + 1:
-            errors.append({"row": row_index, "error": f"Too many rows (max {MAX_ROWS})"})
-            break
-
-        name = (row.get("name") or "").strip()
-        code = (row.get("code") or "").strip() or None
-        description = (row.get("description") or "").strip() or None
-
-        unit_price = parse_decimal(row.get("unit_price"))
-        vat_rate = parse_decimal(row.get("vat_rate"), default=Decimal("0"))
-
-        if not name:
-            errors.append({"row": row_index, "error": "name is required"})
-            continue
-        if unit_price is None:
-            errors.append({"row": row_index, "error": "unit_price must be a number"})
-            continue
-        if vat_rate is None:
-            errors.append({"row": row_index, "error": "vat_rate must be a number"})
-            continue
-
-        # Decide: update dacă există deja același code la merchant (dacă ai code)
-        existing = None
-        if code:
-            existing = db.query(Product).filter(
-                Product.merchant_id == merchant.id,
-                Product.code == code
-            ).first()
-
-        if existing:
-            existing.name = name
-            existing.description = description
-            existing.unit_price = unit_price
-            existing.vat_rate = vat_rate
-            updated += 1
-        else:
-            p = Product(
-                merchant_id=merchant.id,
-                name=name,
-                code=code,
-                description=description,
-                unit_price=unit_price,
-                vat_rate=vat_rate,
-            )
-            db.add(p)
-            created += 1
-
-    db.commit()
+            return import_products_csv(db, merchant.id, file.file)
+        except CsvImportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # the upload is closed with the request -> the job reads its own copy
+    with tempfile.NamedTemporaryFile(prefix="products-", suffix=".csv", delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        path = tmp.name
+    merchant_id = merchant.id
+
+    def run(job: Job) -> dict:
+        job_db = SessionLocal()
+        try:
+            with open(path, "rb") as fh:
+                return import_products_csv(job_db, merchant_id, fh, on_progress=job.progress)
+        finally:
+            job_db.close()
+            os.unlink(path)
 
-    return {
-        "ok": True,
-        "created": created,
-        "updated": updated,
-        "failed": len(errors),
-        "errors": errors[:50],  # nu trimite 5000 erori în response
-    }
+    job = start_job(IMPORT_JOB, merchant_id, run)
+    return job.to_dict()
 
 
+@router.get("/import-jobs/{job_id}")
+def product_import_job_status(
+    job_id: str,
+    merchant: Merchant = Depends(get_current_merchant),
+):
+    job = get_job(job_id, merchant.id, IMPORT_JOB)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    # "done" counts processed rows; the summary is available once the job is done
+    return {**job.to_dict(), "result": job.result if job.status == "done" else None}
 
 
 @router.delete("/{product_id}")
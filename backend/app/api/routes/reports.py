@@ -1,200 +1,181 @@
 """
 Reports endpoints for generating business analytics and reports.
 """
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, and_, extract
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.routes.deps import get_current_user, require_role
-from app.db.session import get_db
-from app.models.user import User, UserRole
+from app.api.routes.deps import get_current_merchant_id
+from app.db.session import get_async_db
 from app.models.merchant import Merchant
-from app.models.invoice import Invoice
 from app.models.client import Client
 from app.models.product import Product
-from app.models.credit_note import CreditNote
+from app.models.report_rollup import InvoiceDailyRollup as R
+from app.models.receivable import ClientReceivable as CR
+from app.models.product_sales import ProductSalesMonthly as PS
+from app.core.report_rollups import CREDITED
+from app.core.receivables import AGING_COLUMNS
+from app.core.product_sales import month_of
+from app.core.countries import CountryCode
+from app.core import revenue_series, vat_return
+from app.core.money import cents
 
 router = APIRouter()
 
 
-def _get_merchant_id(db: Session, user: User) -> int:
-    """Get merchant_id for the current user."""
-    from fastapi import HTTPException
-    merchant = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not merchant:
-        raise HTTPException(status_code=404, detail="Merchant not found for this user")
-    return merchant.id
+# Statuses that count as revenue; "credited" rows are negative (issued credit notes)
+_INVOICE_STATUSES = ("issued", "paid")
+_REVENUE_STATUSES = ("issued", "paid", CREDITED)
+
+
+def _date_filters(start_date: Optional[str], end_date: Optional[str]) -> list:
+    filters = []
+    if start_date:
+        filters.append(R.day >= date.fromisoformat(start_date[:10]))
+    if end_date:
+        filters.append(R.day <= date.fromisoformat(end_date[:10]))
+    return filters
+
+
+def _sum(col, *conds):
+    agg = func.sum(col).filter(and_(*conds)) if conds else func.sum(col)
+    return func.coalesce(agg, 0)
 
 
 @router.get("/revenue")
 async def get_revenue_report(
-    start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
-    group_by: str = Query("month", regex="^(day|week|month|year)$"),
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD (default: first revenue day)"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD (default: today)"),
+    group_by: str = Query("month", regex="^(day|week|month|year|custom)$"),
+    bucket_days: Optional[int] = Query(None, ge=1, le=366, description="Bucket size for group_by=custom"),
+    compare: Optional[str] = Query(None, regex="^(previous|year)$", description="Previous period or same period last year"),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get revenue report with grouping by day/week/month/year.
-    Returns: total revenue, invoice count, average invoice value.
+    Get revenue report with grouping by day/week/month/year (or custom N-day buckets).
+    Returns: total revenue, invoice count, average invoice value per bucket; every
+    bucket of the range is listed (zeros included), optionally next to the
+    compared period. Answered from the daily rollup (issued/paid invoices net of credit notes).
     """
-    merchant_id = _get_merchant_id(db, current_user)
+    if group_by == "custom" and not bucket_days:
+        raise HTTPException(status_code=400, detail="bucket_days is required for group_by=custom")
 
-    query = db.query(
-        func.sum(Invoice.total_gross).label("total_revenue"),
-        func.count(Invoice.id).label("invoice_count"),
-        func.avg(Invoice.total_gross).label("avg_invoice"),
-    ).filter(Invoice.merchant_id == merchant_id)
-
-    # Date filters
+    is_revenue = (R.merchant_id == merchant_id, R.status.in_(_REVENUE_STATUSES), R.invoice_count != 0)
+    end = date.fromisoformat(end_date[:10]) if end_date else datetime.utcnow().date()
     if start_date:
-        query = query.filter(Invoice.issue_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Invoice.issue_date <= datetime.fromisoformat(end_date))
-
-    # Group by time period
-    if group_by == "day":
-        query = query.add_columns(
-            func.date(Invoice.issue_date).label("period")
-        ).group_by(func.date(Invoice.issue_date))
-    elif group_by == "week":
-        query = query.add_columns(
-            extract("year", Invoice.issue_date).label("year"),
-            extract("week", Invoice.issue_date).label("week"),
-        ).group_by(
-            extract("year", Invoice.issue_date),
-            extract("week", Invoice.issue_date),
+        start = date.fromisoformat(start_date[:10])
+    else:
+        start = min(await db.scalar(select(func.min(R.day)).where(*is_revenue)) or end, end)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+
+    series = revenue_series.Series(group_by, bucket_days or 1, start, end)
+    try:
+        previous = revenue_series.comparison(series, compare) if compare else None
+        revenue_series.bucket_starts(series)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    ranges = [R.day.between(series.start, series.end)]
+    if previous is not None:
+        ranges.append(R.day.between(previous.start, previous.end))
+    rows = (await db.execute(
+        select(
+            R.day,
+            _sum(R.gross_total).label("total_revenue"),
+            _sum(R.invoice_count, R.status.in_(_INVOICE_STATUSES)).label("invoice_count"),
         )
-    elif group_by == "month":
-        query = query.add_columns(
-            extract("year", Invoice.issue_date).label("year"),
-            extract("month", Invoice.issue_date).label("month"),
-        ).group_by(
-            extract("year", Invoice.issue_date),
-            extract("month", Invoice.issue_date),
-        )
-    elif group_by == "year":
-        query = query.add_columns(
-            extract("year", Invoice.issue_date).label("year")
-        ).group_by(extract("year", Invoice.issue_date))
-
-    results = query.all()
-
-    data = []
-    for row in results:
-        item = {
-            "total_revenue": float(row.total_revenue or 0),
-            "invoice_count": row.invoice_count,
-            "avg_invoice": float(row.avg_invoice or 0),
-        }
-        
-        if group_by == "day":
-            item["period"] = str(row.period)
-        elif group_by == "week":
-            item["year"] = row.year
-            item["week"] = row.week
-        elif group_by == "month":
-            item["year"] = row.year
-            item["month"] = row.month
-        elif group_by == "year":
-            item["year"] = row.year
-            
-        data.append(item)
-
-    return {"group_by": group_by, "data": data}
+        .where(*is_revenue, or_(*ranges))
+        .group_by(R.day)
+    )).all()
+
+    daily = {r.day: (cents(r.total_revenue), int(r.invoice_count)) for r in rows}
+    return revenue_series.build(daily, series, compare, previous)
 
 
 @router.get("/invoices-summary")
 async def get_invoices_summary(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get invoices summary: total, paid, pending, overdue.
+    total/paid/pending honour the issue-date range; overdue is the current
+    state (issued invoices whose due date has passed).
     """
-    merchant_id = _get_merchant_id(db, current_user)
-
-    base_query = db.query(Invoice).filter(Invoice.merchant_id == merchant_id)
-
-    if start_date:
-        base_query = base_query.filter(Invoice.issue_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        base_query = base_query.filter(Invoice.issue_date <= datetime.fromisoformat(end_date))
 
-    total_count = base_query.count()
-    total_amount = db.query(func.sum(Invoice.total_gross)).filter(
-        Invoice.merchant_id == merchant_id
-    ).scalar() or 0
-
-    paid_count = base_query.filter(Invoice.status == "paid").count()
-    paid_amount = db.query(func.sum(Invoice.total_gross)).filter(
-        and_(Invoice.merchant_id == merchant_id, Invoice.status == "paid")
-    ).scalar() or 0
-
-    pending_count = base_query.filter(Invoice.status == "issued").count()
-    pending_amount = db.query(func.sum(Invoice.total_gross)).filter(
-        and_(Invoice.merchant_id == merchant_id, Invoice.status == "issued")
-    ).scalar() or 0
-
-    # Overdue: issued + due_date < today
     today = datetime.utcnow().date()
-    overdue_count = base_query.filter(
-        and_(Invoice.status == "issued", Invoice.due_date < today)
-    ).count()
-    overdue_amount = db.query(func.sum(Invoice.total_gross)).filter(
-        and_(
-            Invoice.merchant_id == merchant_id,
-            Invoice.status == "issued",
-            Invoice.due_date < today,
-        )
-    ).scalar() or 0
+    in_range = _date_filters(start_date, end_date)
+    is_overdue = (R.status == "issued", R.day < today)
+
+    row = (await db.execute(
+        select(
+            _sum(R.invoice_count, *in_range, R.status.in_(_INVOICE_STATUSES)).label("total_count"),
+            _sum(R.gross_total, *in_range, R.status.in_(_INVOICE_STATUSES)).label("total_amount"),
+            _sum(R.invoice_count, *in_range, R.status == "paid").label("paid_count"),
+            _sum(R.gross_total, *in_range, R.status == "paid").label("paid_amount"),
+            _sum(R.invoice_count, *in_range, R.status == "issued").label("pending_count"),
+            _sum(R.gross_total, *in_range, R.status == "issued").label("pending_amount"),
+            _sum(R.due_count, *is_overdue).label("overdue_count"),
+            _sum(R.due_gross, *is_overdue).label("overdue_amount"),
+        ).where(R.merchant_id == merchant_id)
+    )).one()
 
     return {
-        "total": {"count": total_count, "amount": float(total_amount)},
-        "paid": {"count": paid_count, "amount": float(paid_amount)},
-        "pending": {"count": pending_count, "amount": float(pending_amount)},
-        "overdue": {"count": overdue_count, "amount": float(overdue_amount)},
+        "total": {"count": int(row.total_count), "amount": float(row.total_amount)},
+        "paid": {"count": int(row.paid_count), "amount": float(row.paid_amount)},
+        "pending": {"count": int(row.pending_count), "amount": float(row.pending_amount)},
+        "overdue": {"count": int(row.overdue_count), "amount": float(row.overdue_amount)},
     }
 
 
 @router.get("/clients-summary")
 async def get_clients_summary(
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get clients summary: total clients, top clients by revenue.
+    Answered from the receivables ledger (issued/paid invoices net of credit notes).
     """
-    merchant_id = _get_merchant_id(db, current_user)
 
-    total_clients = db.query(Client).filter(Client.merchant_id == merchant_id).count()
+    total_clients = await db.scalar(
+        select(func.count(Client.id)).where(Client.merchant_id == merchant_id)
+    ) or 0
 
     # Top 10 clients by revenue
+    revenue = CR.invoiced_total - CR.credited_total
     top_clients = (
-        db.query(
-            Client.id,
-            Client.name,
-            func.count(Invoice.id).label("invoice_count"),
-            func.sum(Invoice.total_gross).label("total_revenue"),
+        await db.execute(
+            select(
+                CR.client_id,
+                Client.name,
+                CR.invoice_count,
+                revenue.label("total_revenue"),
+                CR.open_balance,
+                CR.last_invoice_date,
+            )
+            .join(Client, Client.id == CR.client_id)
+            .where(CR.merchant_id == merchant_id, CR.invoice_count > 0)
+            .order_by(revenue.desc(), CR.client_id)
+            .limit(10)
         )
-        .join(Invoice, Invoice.client_id == Client.id)
-        .filter(Client.merchant_id == merchant_id)
-        .group_by(Client.id, Client.name)
-        .order_by(func.sum(Invoice.total_gross).desc())
-        .limit(10)
-        .all()
-    )
+    ).all()
 
     top_clients_data = [
         {
-            "client_id": c.id,
+            "client_id": c.client_id,
             "client_name": c.name,
             "invoice_count": c.invoice_count,
             "total_revenue": float(c.total_revenue or 0),
+            "open_balance": float(c.open_balance or 0),
+            "last_invoice_date": c.last_invoice_date.isoformat() if c.last_invoice_date else None,
         }
         for c in top_clients
     ]
@@ -205,25 +186,108 @@ async def get_clients_summary(
     }
 
 
+@router.get("/aging")
+async def get_aging_report(
+    limit: int = Query(20, ge=1, le=500, description="Clients listed, largest open balance first"),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get receivables aging: open balance per 0-30 / 31-60 / 61-90 / 90+ days past due,
+    merchant totals plus the clients owing the most. Buckets are as of `aged_on`
+    (recomputed nightly); amounts include today's events.
+    """
+
+    buckets = [CR.__table__.c[col] for col in AGING_COLUMNS]
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(CR.open_balance), 0).label("open_balance"),
+            *(func.coalesce(func.sum(b), 0).label(b.name) for b in buckets),
+            func.min(CR.aged_on).label("aged_on"),
+        ).where(CR.merchant_id == merchant_id)
+    )).one()
+
+    clients = (await db.execute(
+        select(CR.client_id, Client.name, CR.open_balance, *buckets)
+        .join(Client, Client.id == CR.client_id)
+        .where(CR.merchant_id == merchant_id, CR.open_balance != 0)
+        .order_by(CR.open_balance.desc(), CR.client_id)
+        .limit(limit)
+    )).all()
+
+    def _buckets(row) -> dict:
+        return {col: float(getattr(row, col) or 0) for col in AGING_COLUMNS}
+
+    return {
+        "aged_on": totals.aged_on.isoformat() if totals.aged_on else None,
+        "total": {"open_balance": float(totals.open_balance), **_buckets(totals)},
+        "clients": [
+            {
+                "client_id": c.client_id,
+                "client_name": c.name,
+                "open_balance": float(c.open_balance or 0),
+                **_buckets(c),
+            }
+            for c in clients
+        ],
+    }
+
+
 @router.get("/products-summary")
 async def get_products_summary(
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD (whole months)"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD (whole months)"),
+    sort: str = Query("revenue", regex="^(revenue|quantity)$"),
+    limit: int = Query(10, ge=1, le=100),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get products summary: most sold products, revenue by product.
+    Get products summary: top products by revenue (net) or quantity sold.
+    Answered from the monthly product sales aggregate (issued/paid invoices net
+    of credit notes), so the date range is applied by month.
     """
-    merchant_id = _get_merchant_id(db, current_user)
 
-    # Top products would require invoice_items join
-    # For now, return basic product count
-    total_products = db.query(Product).filter(Product.merchant_id == merchant_id).count()
+    total_products = await db.scalar(
+        select(func.count(Product.id)).where(Product.merchant_id == merchant_id)
+    ) or 0
+
+    filters = [PS.merchant_id == merchant_id]
+    if start_date:
+        filters.append(PS.month >= month_of(date.fromisoformat(start_date[:10])))
+    if end_date:
+        filters.append(PS.month <= month_of(date.fromisoformat(end_date[:10])))
+
+    quantity = func.sum(PS.quantity)
+    net = func.sum(PS.net_total)
+    vat = func.sum(PS.vat_total)
+    rows = (await db.execute(
+        select(
+            PS.product_id, Product.code, Product.name,
+            quantity.label("quantity"), net.label("net_total"), vat.label("vat_total"),
+        )
+        .join(Product, Product.id == PS.product_id)
+        .where(*filters)
+        .group_by(PS.product_id, Product.code, Product.name)
+        .order_by((net if sort == "revenue" else quantity).desc(), PS.product_id)
+        .limit(limit)
+    )).all()
 
     return {
         "total_products": total_products,
-        "message": "Detailed product analytics require invoice items tracking",
+        "sort": sort,
+        "top_products": [
+            {
+                "product_id": r.product_id,
+                "code": r.code,
+                "name": r.name,
+                "quantity": float(r.quantity or 0),
+                "net_total": float(r.net_total or 0),
+                "vat_total": float(r.vat_total or 0),
+                "gross_total": float((r.net_total or 0) + (r.vat_total or 0)),
+            }
+            for r in rows
+        ],
     }
 
 
@@ -231,26 +295,24 @@ async def get_products_summary(
 async def get_tax_summary(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get tax summary: total VAT collected by period.
+    Get tax summary: total VAT collected by period (issued/paid invoices net of credit notes).
     """
-    merchant_id = _get_merchant_id(db, current_user)
 
-    query = db.query(
-        func.sum(Invoice.vat_total).label("total_tax"),
-        func.sum(Invoice.subtotal_net).label("total_subtotal"),
-        func.sum(Invoice.total_gross).label("total_with_tax"),
-    ).filter(Invoice.merchant_id == merchant_id)
-
-    if start_date:
-        query = query.filter(Invoice.issue_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Invoice.issue_date <= datetime.fromisoformat(end_date))
-
-    result = query.first()
+    result = (await db.execute(
+        select(
+            func.sum(R.vat_total).label("total_tax"),
+            func.sum(R.net_total).label("total_subtotal"),
+            func.sum(R.gross_total).label("total_with_tax"),
+        ).where(
+            R.merchant_id == merchant_id,
+            R.status.in_(_REVENUE_STATUSES),
+            *_date_filters(start_date, end_date),
+        )
+    )).first()
 
     return {
         "total_tax_collected": float(result.total_tax or 0),
@@ -259,62 +321,94 @@ async def get_tax_summary(
     }
 
 
-@router.get("/dashboard")
-async def get_dashboard_summary(
-    current_user: User = Depends(require_role(UserRole.merchant_admin)),
-    db: Session = Depends(get_db),
+async def _vat_return(
+    db: AsyncSession, merchant_id: int, period: str, country: Optional[CountryCode]
+) -> tuple[vat_return.Period, dict]:
+    try:
+        p = vat_return.parse_period(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if country is None:
+        code = await db.scalar(select(Merchant.country_code).where(Merchant.id == merchant_id))
+        try:
+            country = CountryCode(code)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"No VAT rules for country {code}")
+
+    rows = (await db.execute(vat_return.grid_query(merchant_id, p))).all()
+    return p, vat_return.build_return(country, p, rows)
+
+
+@router.get("/vat-return")
+async def get_vat_return(
+    period: str = Query(..., description="2026-Q3, 2026-07 or 2026"),
+    country: Optional[CountryCode] = Query(None, description="Default: the merchant's country"),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get comprehensive dashboard with all key metrics.
+    Get the VAT return for a period: base and VAT per rate for invoices, credit
+    notes and their net. Answered from the monthly per-rate aggregate.
     """
-    merchant_id = _get_merchant_id(db, current_user)
-
-    # Last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-    # Revenue last 30 days
-    revenue_30d = (
-        db.query(func.sum(Invoice.total_gross))
-        .filter(
-            and_(
-                Invoice.merchant_id == merchant_id,
-                Invoice.issue_date >= thirty_days_ago,
-            )
-        )
-        .scalar() or 0
+    _, report = await _vat_return(db, merchant_id, period, country)
+    return report
+
+
+@router.get("/vat-return/export")
+async def export_vat_return(
+    period: str = Query(..., description="2026-Q3, 2026-07 or 2026"),
+    country: Optional[CountryCode] = Query(None, description="Default: the merchant's country"),
+    fmt: str = Query("csv", alias="format", regex="^(csv|xml)$"),
+    documents: bool = Query(False, description="Per-document journal (CSV: instead of the grid, XML: after it)"),
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    VAT return as a CSV / XML download for accountants, streamed.
+    """
+    p, report = await _vat_return(db, merchant_id, period, country)
+
+    # ✅ the journal opens its own session (the request one is closed once streaming starts)
+    docs = vat_return.iter_documents(merchant_id, p) if documents else None
+    stream = vat_return.iter_csv(report, docs) if fmt == "csv" else vat_return.iter_xml(report, docs)
+    filename = f"vat-return_{report['country']}_{p.label}{'_documents' if documents else ''}.{fmt}"
+    return StreamingResponse(
+        stream,
+        media_type="text/csv; charset=utf-8" if fmt == "csv" else "application/xml",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
-    # Total invoices
-    total_invoices = db.query(Invoice).filter(Invoice.merchant_id == merchant_id).count()
-
-    # Total clients
-    total_clients = db.query(Client).filter(Client.merchant_id == merchant_id).count()
 
-    # Pending invoices (issued but not paid)
-    pending_invoices = (
-        db.query(Invoice)
-        .filter(and_(Invoice.merchant_id == merchant_id, Invoice.status == "issued"))
-        .count()
-    )
+@router.get("/dashboard")
+async def get_dashboard_summary(
+    merchant_id: int = Depends(get_current_merchant_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get comprehensive dashboard with all key metrics (single query on the rollup).
+    """
 
-    # Overdue invoices
     today = datetime.utcnow().date()
-    overdue_invoices = (
-        db.query(Invoice)
-        .filter(
-            and_(
-                Invoice.merchant_id == merchant_id,
-                Invoice.status == "issued",
-                Invoice.due_date < today,
-            )
-        )
-        .count()
+    thirty_days_ago = today - timedelta(days=30)
+
+    total_clients = (
+        select(func.count(Client.id)).where(Client.merchant_id == merchant_id).scalar_subquery()
     )
 
+    row = (await db.execute(
+        select(
+            _sum(R.gross_total, R.day >= thirty_days_ago, R.status.in_(_REVENUE_STATUSES)).label("revenue_30d"),
+            _sum(R.invoice_count, R.status.in_(_INVOICE_STATUSES)).label("total_invoices"),
+            _sum(R.invoice_count, R.status == "issued").label("pending_invoices"),
+            _sum(R.due_count, R.status == "issued", R.day < today).label("overdue_invoices"),
+            total_clients.label("total_clients"),
+        ).where(R.merchant_id == merchant_id)
+    )).one()
+
     return {
-        "revenue_last_30_days": float(revenue_30d),
-        "total_invoices": total_invoices,
-        "total_clients": total_clients,
-        "pending_invoices": pending_invoices,
-        "overdue_invoices": overdue_invoices,
+        "revenue_last_30_days": float(row.revenue_30d),
+        "total_invoices": int(row.total_invoices),
+        "total_clients": int(row.total_clients or 0),
+        "pending_invoices": int(row.pending_invoices),
+        "overdue_invoices": int(row.overdue_invoices),
     }
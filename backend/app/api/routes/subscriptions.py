@@ -7,16 +7,17 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request, Header
 from sqlalchemy.orm import Session
 
-from app.api.routes.deps import get_current_user
+from app.api.routes.deps import get_current_user, get_principal, current_merchant, Principal
 from app.db.session import get_db
-from app.models.user import User, UserRole
+from app.models.user import User
 from app.models.merchant import Merchant
-from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus, BillingInterval, PLAN_CONFIG
+from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus, BillingInterval
 from app.schemas.subscriptions import (
     SubscriptionOut, CreateCheckoutSessionRequest, CreateCheckoutSessionResponse,
     CreatePortalSessionRequest, CreatePortalSessionResponse,
     PlanInfo, PlansResponse, UsageResponse
 )
+from app.core import editor_context
 from app.core.config import settings
 
 router = APIRouter(prefix="/subscriptions", tags=["subscriptions"])
@@ -35,16 +36,6 @@ PRICE_ID_MAP = {
 }
 
 
-def _current_merchant(db: Session, user: User) -> Merchant:
-    """Get the merchant for the current user."""
-    if user.role != UserRole.merchant_admin:
-        raise HTTPException(403, "Only merchants can access subscriptions")
-    m = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not m:
-        raise HTTPException(403, "Merchant not found for this user")
-    return m
-
-
 def _get_or_create_subscription(db: Session, merchant: Merchant) -> Subscription:
     """Get or create subscription for merchant."""
     if merchant.subscription:
@@ -71,25 +62,25 @@ def _get_or_create_subscription(db: Session, merchant: Merchant) -> Subscription
 
 @router.get("/current", response_model=SubscriptionOut)
 def get_current_subscription(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Get current subscription for the merchant."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     return sub
 
 
 @router.post("/sync")
 def sync_subscription(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Sync subscription data from Stripe (useful for local testing)."""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(500, "Stripe not configured")
     
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     # If we have a Stripe subscription ID, sync from Stripe
@@ -98,6 +89,7 @@ def sync_subscription(
             stripe_sub = stripe.Subscription.retrieve(sub.stripe_subscription_id)
             _update_subscription_from_stripe(sub, stripe_sub)
             db.commit()
+            editor_context.invalidate(sub.merchant_id)
         except stripe.error.StripeError as e:
             raise HTTPException(400, f"Failed to sync subscription: {str(e)}")
     
@@ -106,11 +98,11 @@ def sync_subscription(
 
 @router.get("/plans", response_model=PlansResponse)
 def get_available_plans(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Get all available subscription plans."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     plans = [
@@ -166,11 +158,11 @@ def get_available_plans(
 
 @router.get("/usage", response_model=UsageResponse)
 def get_usage(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Get current usage statistics."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     invoices_remaining = max(0, sub.invoices_limit - sub.invoices_used_this_month)
@@ -199,13 +191,14 @@ def get_usage(
 def create_checkout_session(
     request: CreateCheckoutSessionRequest,
     user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Create a Stripe checkout session for subscription."""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(500, "Stripe not configured")
     
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     # Get price ID
@@ -257,14 +250,14 @@ def create_checkout_session(
 @router.post("/portal", response_model=CreatePortalSessionResponse)
 def create_portal_session(
     request: CreatePortalSessionRequest,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Create a Stripe customer portal session."""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(500, "Stripe not configured")
     
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     if not sub.stripe_customer_id:
@@ -284,14 +277,14 @@ def create_portal_session(
 
 @router.post("/cancel")
 def cancel_subscription(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Cancel the current subscription at period end."""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(500, "Stripe not configured")
     
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     if not sub.stripe_subscription_id:
@@ -310,6 +303,7 @@ def cancel_subscription(
         # Update local subscription
         sub.cancel_at_period_end = True
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
         
         return {"ok": True, "message": "Subscription will be canceled at the end of the current period"}
         
@@ -319,14 +313,14 @@ def cancel_subscription(
 
 @router.post("/reactivate")
 def reactivate_subscription(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Reactivate a subscription that was set to cancel at period end."""
     if not settings.STRIPE_SECRET_KEY:
         raise HTTPException(500, "Stripe not configured")
     
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
     sub = _get_or_create_subscription(db, merchant)
     
     if not sub.stripe_subscription_id:
@@ -345,6 +339,7 @@ def reactivate_subscription(
         # Update local subscription
         sub.cancel_at_period_end = False
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
         
         return {"ok": True, "message": "Subscription reactivated successfully"}
         
@@ -419,6 +414,7 @@ async def _handle_checkout_completed(db: Session, session: dict):
     # Update subscription
     _update_subscription_from_stripe(sub, stripe_sub)
     db.commit()
+    editor_context.invalidate(sub.merchant_id)
 
 
 async def _handle_subscription_updated(db: Session, stripe_sub: dict):
@@ -436,6 +432,7 @@ async def _handle_subscription_updated(db: Session, stripe_sub: dict):
     if sub:
         _update_subscription_from_stripe(sub, stripe_sub)
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
 
 
 async def _handle_subscription_deleted(db: Session, stripe_sub: dict):
@@ -448,6 +445,7 @@ async def _handle_subscription_deleted(db: Session, stripe_sub: dict):
         sub.status = SubscriptionStatus.canceled
         sub.canceled_at = datetime.utcnow()
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
 
 
 async def _handle_payment_succeeded(db: Session, invoice: dict):
@@ -462,6 +460,7 @@ async def _handle_payment_succeeded(db: Session, invoice: dict):
         # Reset monthly usage on successful payment
         sub.invoices_used_this_month = 0
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
 
 
 async def _handle_payment_failed(db: Session, invoice: dict):
@@ -475,6 +474,7 @@ async def _handle_payment_failed(db: Session, invoice: dict):
     if sub:
         sub.status = SubscriptionStatus.past_due
         db.commit()
+        editor_context.invalidate(sub.merchant_id)
 
 
 def _update_subscription_from_stripe(sub: Subscription, stripe_sub: dict):
@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
-from app.api.routes.deps import get_current_user
+from app.api.routes.deps import get_principal, current_merchant, Principal
 from app.db.session import get_db
 from app.models.user import User, UserRole
 from app.models.merchant import Merchant
@@ -25,27 +25,17 @@ UPLOAD_DIR = "static/supplier_invoices"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-def _current_merchant(db: Session, user: User) -> Merchant:
-    """Get the merchant for the current user."""
-    if user.role != UserRole.merchant_admin:
-        raise HTTPException(403, "Only merchants can access suppliers")
-    m = db.query(Merchant).filter(Merchant.owner_user_id == user.id).first()
-    if not m:
-        raise HTTPException(403, "Merchant not found for this user")
-    return m
-
-
 # ─────────────────────────────────────────────────────────────────
 # Suppliers CRUD
 # ─────────────────────────────────────────────────────────────────
 
 @router.get("", response_model=List[SupplierOut])
 def list_suppliers(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """List all suppliers for current merchant."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     suppliers = (
         db.query(Supplier)
@@ -59,11 +49,11 @@ def list_suppliers(
 @router.post("", response_model=SupplierOut)
 def create_supplier(
     data: SupplierCreate,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Create a new supplier."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     supplier = Supplier(
         merchant_id=merchant.id,
@@ -85,11 +75,11 @@ def create_supplier(
 @router.get("/{supplier_id}", response_model=SupplierOut)
 def get_supplier(
     supplier_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Get a single supplier by ID."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     supplier = (
         db.query(Supplier)
@@ -105,11 +95,11 @@ def get_supplier(
 def update_supplier(
     supplier_id: int,
     data: SupplierUpdate,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Update a supplier."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     supplier = (
         db.query(Supplier)
@@ -130,11 +120,11 @@ def update_supplier(
 @router.delete("/{supplier_id}")
 def delete_supplier(
     supplier_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Delete a supplier."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     supplier = (
         db.query(Supplier)
@@ -155,11 +145,11 @@ def delete_supplier(
 
 @router.get("/invoices/all", response_model=List[SupplierInvoiceOut])
 def list_supplier_invoices(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """List all supplier invoices for current merchant."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     rows = (
         db.query(SupplierInvoice, Supplier.name.label("supplier_name"))
@@ -198,11 +188,11 @@ def list_supplier_invoices(
 @router.post("/invoices", response_model=SupplierInvoiceOut)
 def create_supplier_invoice(
     data: SupplierInvoiceCreate,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Create a supplier invoice manually."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     invoice = SupplierInvoice(
         merchant_id=merchant.id,
@@ -261,11 +251,11 @@ async def upload_supplier_invoice(
     total_gross: str = Form(...),
     description: str = Form(None),
     notes: str = Form(None),
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Upload a PDF invoice from supplier."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     # Validate file type
     if not file.filename or not file.filename.lower().endswith('.pdf'):
@@ -333,11 +323,11 @@ async def upload_supplier_invoice(
 @router.get("/invoices/{invoice_id}", response_model=SupplierInvoiceOut)
 def get_supplier_invoice(
     invoice_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Get a single supplier invoice."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     row = (
         db.query(SupplierInvoice, Supplier.name.label("supplier_name"))
@@ -377,11 +367,11 @@ def get_supplier_invoice(
 def update_supplier_invoice(
     invoice_id: int,
     data: SupplierInvoiceUpdate,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Update a supplier invoice."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     invoice = (
         db.query(SupplierInvoice)
@@ -430,11 +420,11 @@ def update_supplier_invoice(
 @router.delete("/invoices/{invoice_id}")
 def delete_supplier_invoice(
     invoice_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Delete a supplier invoice."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     invoice = (
         db.query(SupplierInvoice)
@@ -462,11 +452,11 @@ def delete_supplier_invoice(
 @router.get("/invoices/{invoice_id}/pdf")
 def download_supplier_invoice_pdf(
     invoice_id: int,
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Download the PDF of a supplier invoice."""
-    merchant = _current_merchant(db, user)
+    merchant = current_merchant(db, principal)
 
     invoice = (
         db.query(SupplierInvoice)
@@ -495,7 +485,7 @@ def download_supplier_invoice_pdf(
 
 @router.post("/peppol/fetch", response_model=PeppolFetchResult)
 def fetch_peppol_invoices(
-    user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """
@@ -505,7 +495,7 @@ def fetch_peppol_invoices(
     - AS4 protocol handling
     - UBL parsing
     """
-    _current_merchant(db, user)  # Just validate access
+    current_merchant(db, principal)  # Just validate access
 
     # TODO: Implement actual PEPPOL fetch
     # For now, return a placeholder response
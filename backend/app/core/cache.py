@@ -0,0 +1,111 @@
+"""
+Small in-process caches shared by the core modules.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and/or total size.
+
+    `sizeof` measures a value (default: len) when `max_bytes` is set.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # would evict everything else; not worth caching
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            self._bytes -= item[1]
+            return item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire `ttl_seconds` after being set
+    (LRU-bounded by `max_entries`).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: Optional[int] = None):
+        self.ttl = ttl_seconds
+        self._lru = LRUCache(max_entries=max_entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._lru.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if time.monotonic() >= expires_at:
+            self._lru.pop(key)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._lru.set(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._lru.pop(key)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+    def __len__(self) -> int:
+        return len(self._lru)
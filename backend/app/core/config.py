@@ -21,6 +21,11 @@ class Settings(BaseModel):
     # Tokens
     ACCESS_TOKEN_MINUTES: int = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
     REFRESH_TOKEN_DAYS: int = int(os.getenv("REFRESH_TOKEN_DAYS", "5"))
+    # resolved user/merchant per token subject (app.api.routes.deps)
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30") or "30")
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000") or "10000")
+    # invoice editor context per merchant (app.core.editor_context)
+    EDITOR_CONTEXT_CACHE_TTL_SECONDS: float = float(os.getenv("EDITOR_CONTEXT_CACHE_TTL_SECONDS", "60") or "60")
 
     # ✅ Legal versions (enterprise)
     LEGAL_TERMS_VERSION: str = os.getenv("LEGAL_TERMS_VERSION", "2025-12-17")
@@ -28,6 +33,24 @@ class Settings(BaseModel):
 
     # DB
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_TIMEOUT_SECONDS: int = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 = no limit
+    # debug: X-DB-Query-Count response header + warning above the threshold (app.core.query_counter)
+    DEBUG_QUERY_COUNT: bool = os.getenv("DEBUG_QUERY_COUNT", "false").lower() == "true"
+    DEBUG_QUERY_COUNT_WARN: int = int(os.getenv("DEBUG_QUERY_COUNT_WARN", "25") or "25")
+    # log SQL statements slower than this, with route + merchant (app.db.session); 0 = off
+    DB_SLOW_QUERY_MS: int = int(os.getenv("DB_SLOW_QUERY_MS", "0") or "0")
+    # on-demand sampling profiler for platform admins (/admin/profiling)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    # Prometheus metrics on /metrics; reachable from localhost, METRICS_ALLOWED_IPS or with the bearer token
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    METRICS_ALLOWED_IPS: list[str] = [
+        ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()
+    ]
     
     # App URLs
     APP_BASE_URL: str = os.getenv("APP_BASE_URL", "http://localhost:3000")
@@ -39,6 +62,25 @@ class Settings(BaseModel):
     SMTP_USER: str = os.getenv("SMTP_USER", "")
     SMTP_PASS: str = os.getenv("SMTP_PASS", "")
     EMAIL_FROM: str = os.getenv("EMAIL_FROM", "no-reply@acont.be")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_TIMEOUT_SECONDS: int = int(os.getenv("SMTP_TIMEOUT_SECONDS", "30") or "30")
+
+    # Outbound email queue (email_outbox)
+    EMAIL_QUEUE_EMBEDDED_WORKER: bool = os.getenv("EMAIL_QUEUE_EMBEDDED_WORKER", "true").lower() == "true"
+    EMAIL_QUEUE_POLL_SECONDS: float = float(os.getenv("EMAIL_QUEUE_POLL_SECONDS", "2") or "2")
+    EMAIL_QUEUE_CONNECTIONS: int = int(os.getenv("EMAIL_QUEUE_CONNECTIONS", "2") or "2")
+    EMAIL_QUEUE_PER_DOMAIN: int = int(os.getenv("EMAIL_QUEUE_PER_DOMAIN", "2") or "2")
+    EMAIL_QUEUE_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", "8") or "8")
+    EMAIL_BATCH_CONNECTIONS: int = int(os.getenv("EMAIL_BATCH_CONNECTIONS", "3") or "3")
+
+    # PDF render cache (issued documents only; drafts are always rendered)
+    PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", "var/pdf_cache")
+    PDF_CACHE_MEMORY_MB: int = int(os.getenv("PDF_CACHE_MEMORY_MB", "64") or "64")
+    PDF_CACHE_DISK_MB: int = int(os.getenv("PDF_CACHE_DISK_MB", "1024") or "1024")
+
+    # Bulk PDF export (process pool size, background job output)
+    PDF_EXPORT_WORKERS: int = int(os.getenv("PDF_EXPORT_WORKERS", "0") or "0")  # 0 = min(4, cpu count)
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "var/exports")
 
     # Stripe
     STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
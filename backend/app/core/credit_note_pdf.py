@@ -1,15 +1,13 @@
 from __future__ import annotations
 
 from io import BytesIO
-from pathlib import Path
-from collections import defaultdict
 
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from reportlab.lib import colors
-import requests
 
+from app.core.metrics import pdf_render_seconds, timed_function
+from app.core.pdf_assets import draw_logo
 from app.models.credit_note import CreditNote
 
 
@@ -67,37 +65,9 @@ def tr(lang: str | None, key: str) -> str:
     return LABELS.get(lang2, LABELS["FR"]).get(key, key)
 
 
-def draw_logo(c: canvas.Canvas, merchant_logo_url: str | None, *, x=40, y=790, w=110, h=35) -> bool:
-    if not merchant_logo_url:
-        return False
-
-    try:
-        # URL direct
-        if merchant_logo_url.startswith("http://") or merchant_logo_url.startswith("https://"):
-            r = requests.get(merchant_logo_url, timeout=3)
-            r.raise_for_status()
-            img = ImageReader(BytesIO(r.content))
-            c.drawImage(img, x=x, y=y, width=w, height=h, mask="auto", preserveAspectRatio=True)
-            return True
-
-        # path local /static/...
-        if merchant_logo_url.startswith("/static/"):
-            local_path = Path(merchant_logo_url.lstrip("/"))
-            if local_path.exists():
-                c.drawImage(ImageReader(str(local_path)), x=x, y=y, width=w, height=h, mask="auto", preserveAspectRatio=True)
-                return True
-    except Exception:
-        pass
-
-    return False
-
-
 def _vat_breakdown(cn: CreditNote):
-    b = defaultdict(lambda: {"vat": 0.0})
-    for it in cn.items:
-        k = f"{float(it.vat_rate):.2f}".rstrip("0").rstrip(".")
-        b[k]["vat"] += float(it.line_vat)
-    return dict(b)
+    # computed once at write time and stored on the credit note
+    return cn.vat_breakdown or {}
 
 
 def _draw_header(c: canvas.Canvas, *, tpl: str, w: float, h: float, merchant_logo_url: str | None) -> float:
@@ -135,6 +105,7 @@ def _draw_header(c: canvas.Canvas, *, tpl: str, w: float, h: float, merchant_log
     return h - 85
 
 
+@timed_function(pdf_render_seconds, kind="credit_note")
 def build_credit_note_pdf(cn: CreditNote, merchant_logo_url: str | None = None) -> bytes:
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
@@ -0,0 +1,71 @@
+"""
+Upsert of incremental aggregate deltas.
+
+The report rollup, the receivables ledger, product sales and the VAT grid are
+maintained the same way: an event builds delta rows, which are merged per key
+and added to the aggregate table in one INSERT ... ON CONFLICT DO UPDATE inside
+the caller's transaction.
+"""
+from typing import Iterable, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.money import to_decimal
+
+
+def merge_deltas(deltas: Iterable[dict], key_cols: Sequence[str], sum_cols: Sequence[str]) -> dict[tuple, dict]:
+    """Delta rows merged per key: sum_cols added, other columns keep the newest non-null value."""
+    merged: dict[tuple, dict] = {}
+    for d in deltas:
+        key = tuple(d[col] for col in key_cols)
+        acc = merged.get(key)
+        if acc is None:
+            merged[key] = dict(d)
+            continue
+        for col, value in d.items():
+            if col in sum_cols:
+                acc[col] += value
+            elif col not in key_cols and value is not None and (acc[col] is None or value > acc[col]):
+                acc[col] = value
+    return merged
+
+
+def upsert_deltas(
+    db: Session,
+    model,
+    key_cols: Sequence[str],
+    sum_cols: Sequence[str],
+    deltas: Iterable[dict],
+    *,
+    cents_cols: Sequence[str] = (),
+    greatest_cols: Sequence[str] = (),
+) -> None:
+    """
+    Merge `deltas` per `key_cols` (the table's unique key) and add them to `model`'s rows.
+
+    - sum_cols are added to the stored values; cents_cols among them are integer
+      cents (or hundredths) and are written as Decimal
+    - other columns are written on insert only, except greatest_cols, which keep
+      GREATEST(stored, new) (NULLs ignored)
+    """
+    merged = merge_deltas(deltas, key_cols, sum_cols)
+    if not merged:
+        return
+
+    # sorted -> rows are always locked in the same order (no deadlocks between concurrent upserts)
+    values = [
+        {**merged[key], **{col: to_decimal(merged[key][col]) for col in cents_cols}}
+        for key in sorted(merged)
+    ]
+    stmt = pg_insert(model).values(values)
+    tbl = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tbl.c[col] for col in key_cols],
+        set_={
+            **{col: tbl.c[col] + stmt.excluded[col] for col in sum_cols},
+            **{col: func.greatest(tbl.c[col], stmt.excluded[col]) for col in greatest_cols},
+        },
+    )
+    db.execute(stmt)
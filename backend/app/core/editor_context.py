@@ -0,0 +1,50 @@
+"""
+Per-merchant cache of the invoice editor context (GET /invoices/editor-context):
+usage status, last issued date, next number, tax rates, default template.
+
+Invalidated explicitly on issuance, subscription changes (endpoints + Stripe
+webhook) and preferences changes - always after the commit.
+The TTL bounds staleness across worker processes (an invalidation only reaches
+the process it ran in). A generation counter per merchant keeps a build that
+raced with an invalidation from being stored.
+"""
+import threading
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# merchant_id -> (generation, {year: context})
+_contexts = TTLCache(ttl_seconds=settings.EDITOR_CONTEXT_CACHE_TTL_SECONDS, max_entries=settings.AUTH_CACHE_MAX_ENTRIES)
+_generations: dict[int, int] = {}
+_lock = threading.Lock()
+
+
+def generation(merchant_id: int) -> int:
+    with _lock:
+        return _generations.get(merchant_id, 0)
+
+
+def get(merchant_id: int, year: int) -> Optional[dict]:
+    entry = _contexts.get(merchant_id)
+    if entry is None or entry[0] != generation(merchant_id):
+        return None
+    return entry[1].get(year)
+
+
+def put(merchant_id: int, year: int, context: dict, built_at_generation: int) -> None:
+    with _lock:
+        if _generations.get(merchant_id, 0) != built_at_generation:
+            return  # invalidated while it was being built
+        entry = _contexts.get(merchant_id)
+        by_year = dict(entry[1]) if entry is not None and entry[0] == built_at_generation else {}
+        by_year[year] = context
+        _contexts.set(merchant_id, (built_at_generation, by_year))
+
+
+def invalidate(merchant_id: Optional[int]) -> None:
+    if merchant_id is None:
+        return
+    with _lock:
+        _generations[merchant_id] = _generations.get(merchant_id, 0) + 1
+    _contexts.pop(merchant_id)
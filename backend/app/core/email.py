@@ -12,6 +12,7 @@ from typing import Optional, List
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.metrics import smtp_send_seconds, timed
 
 logger = logging.getLogger(__name__)
 
@@ -491,8 +492,110 @@ Echipa ACONT
 
 
 def is_email_configured() -> bool:
-    """Check if email is properly configured."""
-    return bool(settings.SMTP_HOST and settings.SMTP_USER and settings.SMTP_PASS)
+    """Check if email is properly configured (no SMTP_USER = relay without login)."""
+    return bool(settings.SMTP_HOST and (settings.SMTP_PASS or not settings.SMTP_USER))
+
+
+def build_message(
+    to_email: str,
+    subject: str,
+    body_text: str,
+    body_html: Optional[str] = None,
+    from_email: Optional[str] = None,
+    attachments: Optional[List[tuple]] = None,  # List of (filename, content, mime_type)
+) -> MIMEMultipart:
+    """Build the MIME message sent by send_email / stored in the outbox."""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_email or settings.EMAIL_FROM
+    msg["To"] = to_email
+
+    # Add text body
+    msg.attach(MIMEText(body_text, "plain", "utf-8"))
+
+    # Add HTML body if provided
+    if body_html:
+        msg.attach(MIMEText(body_html, "html", "utf-8"))
+
+    # Add attachments
+    if attachments:
+        for filename, content, mime_type in attachments:
+            part = MIMEBase("application", "octet-stream")
+            part.set_payload(content)
+            encoders.encode_base64(part)
+            part.add_header(
+                "Content-Disposition",
+                f"attachment; filename={filename}",
+            )
+            msg.attach(part)
+
+    return msg
+
+
+def _log_unsent(to_email: str, subject: str, body_text: str) -> None:
+    logger.warning(f"Email not configured. Would send to {to_email}: {subject}")
+    # Log to console for development
+    print(f"\n{'='*60}")
+    print(f"EMAIL (not sent - SMTP not configured)")
+    print(f"To: {to_email}")
+    print(f"Subject: {subject}")
+    print(f"Body:\n{body_text}")
+    print(f"{'='*60}\n")
+
+
+class SmtpSession:
+    """
+    One long-lived SMTP connection (connect + STARTTLS + login once, many messages).
+    Reconnects transparently if the server dropped the connection.
+
+    SSL for port 465, STARTTLS when SMTP_STARTTLS is on, login only when SMTP_USER
+    is set -> works against a local aiosmtpd stand-in (SMTP_STARTTLS=false, no user).
+    """
+
+    def __init__(self):
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        if settings.SMTP_PORT == 465:
+            server = smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        else:
+            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+            if settings.SMTP_STARTTLS:
+                server.starttls()
+        if settings.SMTP_USER:
+            server.login(settings.SMTP_USER, settings.SMTP_PASS)
+        return server
+
+    def send(self, from_email: str, to_email: str, message: bytes) -> None:
+        with timed(smtp_send_seconds):
+            self._send(from_email, to_email, message)
+
+    def _send(self, from_email: str, to_email: str, message: bytes) -> None:
+        for attempt in (1, 2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.sendmail(from_email, [to_email], message)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # idle connection closed by the server -> reconnect once
+                self._server = None
+                if attempt == 2:
+                    raise
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def __enter__(self) -> "SmtpSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 def send_email(
@@ -504,8 +607,9 @@ def send_email(
     attachments: Optional[List[tuple]] = None,  # List of (filename, content, mime_type)
 ) -> bool:
     """
-    Send an email using SMTP.
-    
+    Send an email using SMTP, inline (one connection per call).
+    Request handlers should prefer enqueue_email (delivered by app.core.email_queue).
+
     Args:
         to_email: Recipient email address
         subject: Email subject
@@ -513,93 +617,77 @@ def send_email(
         body_html: Optional HTML body
         from_email: Sender email (defaults to EMAIL_FROM)
         attachments: Optional list of (filename, content_bytes, mime_type)
-    
+
     Returns:
         True if sent successfully, False otherwise
     """
     if not is_email_configured():
-        logger.warning(f"Email not configured. Would send to {to_email}: {subject}")
-        # Log to console for development
-        print(f"\n{'='*60}")
-        print(f"EMAIL (not sent - SMTP not configured)")
-        print(f"To: {to_email}")
-        print(f"Subject: {subject}")
-        print(f"Body:\n{body_text}")
-        print(f"{'='*60}\n")
+        _log_unsent(to_email, subject, body_text)
         return False
-    
+
     try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = from_email or settings.EMAIL_FROM
-        msg["To"] = to_email
-        
-        # Add text body
-        msg.attach(MIMEText(body_text, "plain", "utf-8"))
-        
-        # Add HTML body if provided
-        if body_html:
-            msg.attach(MIMEText(body_html, "html", "utf-8"))
-        
-        # Add attachments
-        if attachments:
-            for filename, content, mime_type in attachments:
-                part = MIMEBase("application", "octet-stream")
-                part.set_payload(content)
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition",
-                    f"attachment; filename={filename}",
-                )
-                msg.attach(part)
-        
-        # Send via SMTP (SSL for port 465, STARTTLS for port 587)
-        if settings.SMTP_PORT == 465:
-            # SSL connection
-            with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.login(settings.SMTP_USER, settings.SMTP_PASS)
-                server.sendmail(msg["From"], [to_email], msg.as_string())
-        else:
-            # STARTTLS connection (port 587)
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASS)
-                server.sendmail(msg["From"], [to_email], msg.as_string())
-        
+        msg = build_message(to_email, subject, body_text, body_html, from_email, attachments)
+        with SmtpSession() as smtp:
+            smtp.send(msg["From"], to_email, msg.as_bytes())
+
         logger.info(f"Email sent successfully to {to_email}")
         return True
-        
+
     except Exception as e:
         logger.error(f"Failed to send email to {to_email}: {e}")
         return False
 
 
-def send_template_email(
+def enqueue_message(db, msg: MIMEMultipart, ref_type: Optional[str] = None, ref_id: Optional[int] = None):
+    """Queue an already built message (see build_message); caller commits."""
+    from app.models.email_outbox import EmailOutbox
+
+    to_email = msg["To"]
+    row = EmailOutbox(
+        state="pending",
+        attempts=0,
+        to_email=to_email,
+        to_domain=to_email.rsplit("@", 1)[-1].lower(),
+        from_email=msg["From"],
+        subject=(msg["Subject"] or "")[:512],
+        message=msg.as_bytes(),
+        ref_type=ref_type,
+        ref_id=ref_id,
+    )
+    db.add(row)
+    return row
+
+
+def enqueue_email(
+    db,
     to_email: str,
-    template_name: str,
-    language: str,
-    context: dict,
+    subject: str,
+    body_text: str,
+    body_html: Optional[str] = None,
     from_email: Optional[str] = None,
     attachments: Optional[List[tuple]] = None,
-) -> bool:
+    ref_type: Optional[str] = None,
+    ref_id: Optional[int] = None,
+):
     """
-    Send an email using a predefined template.
-    
-    Args:
-        to_email: Recipient email address
-        template_name: Name of the template (e.g., "welcome", "invoice_sent")
-        language: Language code (en, fr, nl, ro)
-        context: Dictionary with template variables
-        from_email: Optional sender email
-        attachments: Optional attachments
-    
-    Returns:
-        True if sent successfully
+    Queue an email in the outbox (part of the caller's transaction, caller commits).
+    Returns the EmailOutbox row.
     """
+    msg = build_message(to_email, subject, body_text, body_html, from_email, attachments)
+    row = enqueue_message(db, msg, ref_type=ref_type, ref_id=ref_id)
+
+    if not is_email_configured():
+        # stays queued until SMTP is configured; show it in the console for development
+        _log_unsent(to_email, subject, body_text)
+    return row
+
+
+def render_template(template_name: str, language: str, context: dict) -> Optional[tuple[str, str]]:
+    """(subject, body) of a predefined template, or None if it cannot be rendered."""
     template = EMAIL_TEMPLATES.get(template_name)
     if not template:
         logger.error(f"Email template not found: {template_name}")
-        return False
+        return None
     
     # Normalize language
     lang = language.lower()[:2] if language else "en"
@@ -612,12 +700,57 @@ def send_template_email(
     
     # Format with context
     try:
-        subject = subject.format(**context)
-        body = body.format(**context)
+        return subject.format(**context), body.format(**context)
     except KeyError as e:
         logger.error(f"Missing template variable: {e}")
+        return None
+
+
+def send_template_email(
+    to_email: str,
+    template_name: str,
+    language: str,
+    context: dict,
+    from_email: Optional[str] = None,
+    attachments: Optional[List[tuple]] = None,
+    db=None,
+    ref: Optional[tuple] = None,
+) -> bool:
+    """
+    Send an email using a predefined template.
+    
+    Args:
+        to_email: Recipient email address
+        template_name: Name of the template (e.g., "welcome", "invoice_sent")
+        language: Language code (en, fr, nl, ro)
+        context: Dictionary with template variables
+        from_email: Optional sender email
+        attachments: Optional attachments
+        db: When given, the email is queued in the outbox (caller commits) instead of sent inline
+        ref: Optional (ref_type, ref_id) stored on the outbox row
+    
+    Returns:
+        True if sent (or queued) successfully
+    """
+    rendered = render_template(template_name, language, context)
+    if rendered is None:
         return False
+    subject, body = rendered
     
+    if db is not None:
+        ref_type, ref_id = ref or (None, None)
+        enqueue_email(
+            db,
+            to_email=to_email,
+            subject=subject,
+            body_text=body,
+            from_email=from_email,
+            attachments=attachments,
+            ref_type=ref_type,
+            ref_id=ref_id,
+        )
+        return True
+
     return send_email(
         to_email=to_email,
         subject=subject,
@@ -632,6 +765,7 @@ def send_welcome_email(
     first_name: str,
     company_name: str,
     language: str = "en",
+    db=None,
 ) -> bool:
     """Send welcome email to new user."""
     dashboard_url = f"{settings.APP_BASE_URL}/dashboard"
@@ -645,6 +779,7 @@ def send_welcome_email(
             "company_name": company_name,
             "dashboard_url": dashboard_url,
         },
+        db=db,
     )
 
 
@@ -660,6 +795,8 @@ def send_invoice_email(
     language: str = "en",
     from_email: Optional[str] = None,
     pdf_attachment: Optional[bytes] = None,
+    db=None,
+    invoice_id: Optional[int] = None,
 ) -> bool:
     """Send invoice email with PDF attachment."""
     attachments = None
@@ -681,6 +818,8 @@ def send_invoice_email(
         },
         from_email=from_email,
         attachments=attachments,
+        db=db,
+        ref=("invoice", invoice_id) if invoice_id else None,
     )
 
 
@@ -694,6 +833,7 @@ def send_usage_warning_email(
     remaining: int,
     extra_price: str,
     language: str = "en",
+    db=None,
 ) -> bool:
     """Send usage warning email when approaching limit."""
     upgrade_url = f"{settings.APP_BASE_URL}/dashboard/subscription"
@@ -712,6 +852,7 @@ def send_usage_warning_email(
             "extra_price": extra_price,
             "upgrade_url": upgrade_url,
         },
+        db=db,
     )
 
 
@@ -723,6 +864,7 @@ def send_payment_success_email(
     amount: str,
     next_billing_date: str,
     language: str = "en",
+    db=None,
 ) -> bool:
     """Send payment confirmation email."""
     return send_template_email(
@@ -736,6 +878,7 @@ def send_payment_success_email(
             "amount": amount,
             "next_billing_date": next_billing_date,
         },
+        db=db,
     )
 
 
@@ -744,6 +887,7 @@ def send_forgot_password_email(
     first_name: str,
     reset_token: str,
     language: str = "en",
+    db=None,
 ) -> bool:
     """Send password reset email."""
     reset_url = f"{settings.APP_BASE_URL}/{language}/auth/reset-password?token={reset_token}"
@@ -756,4 +900,5 @@ def send_forgot_password_email(
             "first_name": first_name,
             "reset_url": reset_url,
         },
+        db=db,
     )
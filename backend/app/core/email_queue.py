@@ -0,0 +1,224 @@
+"""
+Delivery of the outbound email queue (email_outbox).
+
+Requests call enqueue_email / send_*_email(db=...) and return; this worker
+claims due rows (FOR UPDATE SKIP LOCKED -> several workers can run side by side),
+sends them over a few long-lived SMTP connections and records the outcome:
+
+- 2xx          -> sent (and the referenced invoice gets email_sent_at)
+- 5xx / refused recipient -> failed, no retry
+- anything else -> retried with exponential backoff, failed after EMAIL_QUEUE_MAX_ATTEMPTS
+
+Run it embedded in the API process (EMAIL_QUEUE_EMBEDDED_WORKER, default) or as
+`python -m app.scripts.email_worker`. For local testing point SMTP_HOST/PORT at
+`python -m aiosmtpd -n -l localhost:8025` with SMTP_STARTTLS=false and no SMTP_USER.
+"""
+import logging
+import random
+import smtplib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.email import SmtpSession, is_email_configured
+from app.db.session import SessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.models.invoice import Invoice
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = 50
+_STALE_SENDING = timedelta(minutes=10)
+_BACKOFF_BASE_SECONDS = 30
+_BACKOFF_MAX_SECONDS = 3600
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+def claim_batch(db: Session, limit: int = _BATCH_SIZE) -> list:
+    """Mark up to `limit` due rows as sending and return them (committed)."""
+    # rows left in "sending" by a worker that died mid-batch go back to the queue
+    db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.state == "sending", EmailOutbox.locked_at < func.now() - _STALE_SENDING)
+        .values(state="pending", locked_at=None)
+    )
+
+    rows = db.execute(
+        select(
+            EmailOutbox.id, EmailOutbox.attempts, EmailOutbox.to_email, EmailOutbox.to_domain,
+            EmailOutbox.from_email, EmailOutbox.message, EmailOutbox.ref_type, EmailOutbox.ref_id,
+        )
+        .where(EmailOutbox.state == "pending", EmailOutbox.next_attempt_at <= func.now())
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    if rows:
+        db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_([r.id for r in rows]))
+            .values(state="sending", locked_at=func.now(), attempts=EmailOutbox.attempts + 1)
+        )
+    db.commit()
+    return rows
+
+
+def record_results(db: Session, rows: list, results: list[tuple[Optional[str], bool]]) -> None:
+    """results[i] = (error, permanent) for rows[i]; error None = delivered."""
+    now = datetime.now(timezone.utc)
+    sent_ids, sent_invoice_ids = [], []
+
+    for row, (error, permanent) in zip(rows, results):
+        if error is None:
+            sent_ids.append(row.id)
+            if row.ref_type == "invoice" and row.ref_id:
+                sent_invoice_ids.append(row.ref_id)
+            continue
+
+        attempts = row.attempts + 1
+        if permanent or attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            values = {"state": "failed", "locked_at": None, "last_error": error[:2000]}
+            logger.error(f"Email {row.id} to {row.to_email} failed permanently: {error}")
+        else:
+            values = {
+                "state": "pending", "locked_at": None, "last_error": error[:2000],
+                "next_attempt_at": now + _backoff(attempts),
+            }
+        db.execute(update(EmailOutbox).where(EmailOutbox.id == row.id).values(**values))
+
+    if sent_ids:
+        db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(sent_ids))
+            .values(state="sent", sent_at=now, locked_at=None, last_error=None)
+        )
+    if sent_invoice_ids:
+        db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(sent_invoice_ids))
+            .values(sent_via_email=True, email_sent_at=now)
+        )
+    db.commit()
+
+
+class EmailQueueWorker:
+    """
+    Drains the outbox over `connections` SMTP sessions (one per delivery thread,
+    reused across batches) with at most `per_domain` concurrent sends per recipient domain.
+    """
+
+    def __init__(self, connections: Optional[int] = None, per_domain: Optional[int] = None):
+        self.connections = max(1, connections or settings.EMAIL_QUEUE_CONNECTIONS)
+        self.per_domain = max(1, per_domain or settings.EMAIL_QUEUE_PER_DOMAIN)
+        self._pool = ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="smtp")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: list[SmtpSession] = []
+        self._domain_limits: dict[str, threading.BoundedSemaphore] = {}
+
+    def _session(self) -> SmtpSession:
+        smtp = getattr(self._local, "smtp", None)
+        if smtp is None:
+            smtp = SmtpSession()
+            self._local.smtp = smtp
+            with self._lock:
+                self._sessions.append(smtp)
+        return smtp
+
+    def _domain_limit(self, domain: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._domain_limits.get(domain)
+            if sem is None:
+                sem = self._domain_limits[domain] = threading.BoundedSemaphore(self.per_domain)
+            return sem
+
+    def _deliver(self, row) -> tuple[Optional[str], bool]:
+        smtp = self._session()
+        with self._domain_limit(row.to_domain):
+            try:
+                smtp.send(row.from_email, row.to_email, row.message)
+                return None, False
+            except smtplib.SMTPRecipientsRefused as e:
+                return f"recipient refused: {e.recipients}", True
+            except smtplib.SMTPResponseException as e:
+                smtp.close()  # do not reuse a session in an unknown state
+                return f"{e.smtp_code} {e.smtp_error!r}", e.smtp_code >= 500
+            except Exception as e:
+                smtp.close()
+                return str(e) or e.__class__.__name__, False
+
+    def submit(self, row) -> Future:
+        """Deliver one message in the background; the future holds (error, permanent)."""
+        return self._pool.submit(self._deliver, row)
+
+    def deliver(self, rows: list) -> list[tuple[Optional[str], bool]]:
+        return list(self._pool.map(self._deliver, rows))
+
+    def drain_once(self, limit: int = _BATCH_SIZE) -> int:
+        """Claim and deliver one batch; returns the number of rows processed."""
+        if not is_email_configured():
+            return 0  # stay queued until SMTP is configured
+
+        db = SessionLocal()
+        try:
+            rows = claim_batch(db, limit)
+            if not rows:
+                return 0
+            results = self.deliver(rows)
+            record_results(db, rows, results)
+            return len(rows)
+        finally:
+            db.close()
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        logger.info(f"Email queue worker started ({self.connections} SMTP connections)")
+        while not stop.is_set():
+            try:
+                n = self.drain_once()
+            except Exception:
+                logger.exception("Email queue drain failed")
+                n = 0
+            if n == 0:
+                stop.wait(settings.EMAIL_QUEUE_POLL_SECONDS)
+        self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            for smtp in self._sessions:
+                smtp.close()
+            self._sessions.clear()
+
+
+_embedded: Optional[tuple[threading.Thread, threading.Event]] = None
+
+
+def start_embedded_worker() -> None:
+    global _embedded
+    if _embedded is not None or not settings.EMAIL_QUEUE_EMBEDDED_WORKER:
+        return
+    stop = threading.Event()
+    thread = threading.Thread(target=EmailQueueWorker().run_forever, args=(stop,), name="email-queue", daemon=True)
+    thread.start()
+    _embedded = (thread, stop)
+
+
+def stop_embedded_worker() -> None:
+    global _embedded
+    if _embedded is None:
+        return
+    thread, stop = _embedded
+    stop.set()
+    thread.join(timeout=10)
+    _embedded = None
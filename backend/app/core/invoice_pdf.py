@@ -1,18 +1,13 @@
 from __future__ import annotations
 
 from io import BytesIO
-from pathlib import Path
-from collections import defaultdict
 
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from reportlab.lib import colors
-import requests
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from pathlib import Path as _Path
 
+from app.core.metrics import pdf_render_seconds, timed_function
+from app.core.pdf_assets import draw_logo, pdf_fonts
 from app.models.invoice import Invoice
 
 
@@ -93,45 +88,9 @@ def tr(lang: str | None, key: str) -> str:
     return LABELS.get(lang2, LABELS["FR"]).get(key, key)
 
 
-def draw_logo(c, merchant_logo_url: str | None, *, x=40, y=790, w=110, h=35) -> bool:
-    if not merchant_logo_url:
-        return False
-
-    try:
-        # 1) URL direct (ex: https://.../logo.png) -> DO Spaces, etc.
-        if merchant_logo_url.startswith("http://") or merchant_logo_url.startswith("https://"):
-            r = requests.get(merchant_logo_url, timeout=3)
-            r.raise_for_status()
-            img = ImageReader(BytesIO(r.content))
-            c.drawImage(
-                img, x=x, y=y, width=w, height=h,
-                mask="auto", preserveAspectRatio=True
-            )
-            return True
-
-        # 2) path local /static/...
-        if merchant_logo_url.startswith("/static/"):
-            local_path = Path(merchant_logo_url.lstrip("/"))  # static/logos/...
-            if local_path.exists():
-                c.drawImage(
-                    ImageReader(str(local_path)), x=x, y=y, width=w, height=h,
-                    mask="auto", preserveAspectRatio=True
-                )
-                return True
-    except Exception:
-        pass
-
-    return False
-
-
 def _vat_breakdown_from_invoice(inv: Invoice):
-    # group by vat_rate (as stored on items)
-    b = defaultdict(lambda: {"base": 0.0, "vat": 0.0})
-    for it in inv.items:
-        k = f"{float(it.vat_rate):.2f}".rstrip("0").rstrip(".")
-        b[k]["base"] += float(it.line_net)
-        b[k]["vat"] += float(it.line_vat)
-    return dict(b)
+    # computed once at write time (app.core.money) and stored on the invoice
+    return inv.vat_breakdown or {}
 
 
 def _draw_totals_block(c: canvas.Canvas, inv: Invoice, lang: str, x_right: int, y: int):
@@ -165,7 +124,7 @@ def _draw_totals_block(c: canvas.Canvas, inv: Invoice, lang: str, x_right: int,
         c.drawRightString(x_right, y, f"{float(inv.advance_paid):.2f} {inv.currency}")
         y -= 14
 
-        due = float(inv.total_gross) - float(inv.advance_paid)
+        due = float(inv.total_due)
         c.setFont("Helvetica-Bold", 11)
         c.drawRightString(x_right - 65, y, f"{tr(lang,'due')}:")
         c.drawRightString(x_right, y, f"{due:.2f} {inv.currency}")
@@ -181,28 +140,14 @@ def _draw_totals_block(c: canvas.Canvas, inv: Invoice, lang: str, x_right: int,
     return y
 
 
+@timed_function(pdf_render_seconds, kind="invoice")
 def build_invoice_pdf(inv: Invoice, merchant_logo_url: str | None = None) -> bytes:
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     w, h = A4
 
-    # Register a Unicode TrueType font when available (DejaVu Sans common on Linux)
-    # Fallback to built-in Helvetica if not present.
-    _deja_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-    _deja_bold = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-    FONT_REGULAR = "Helvetica"
-    FONT_BOLD = "Helvetica-Bold"
-    try:
-        if _Path(_deja_path).exists():
-            pdfmetrics.registerFont(TTFont("DejaVuSans", _deja_path))
-            FONT_REGULAR = "DejaVuSans"
-        if _Path(_deja_bold).exists():
-            pdfmetrics.registerFont(TTFont("DejaVuSans-Bold", _deja_bold))
-            FONT_BOLD = "DejaVuSans-Bold"
-    except Exception:
-        # keep Helvetica if registration fails
-        FONT_REGULAR = "Helvetica"
-        FONT_BOLD = "Helvetica-Bold"
+    # DejaVu (Unicode) is registered once at startup; Helvetica if not available
+    FONT_REGULAR, FONT_BOLD = pdf_fonts()
 
     lang = (inv.language or "FR").strip().upper()
     tpl = (getattr(inv, "template", "classic") or "classic").strip().lower()
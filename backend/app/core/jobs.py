@@ -0,0 +1,104 @@
+"""
+Minimal in-process background jobs with progress polling.
+
+Used for long-running per-merchant work (large exports, imports). Jobs live in
+the memory of the API process that started them, so polling must hit the same
+process (single worker / sticky sessions); finished jobs are dropped after
+JOB_RETENTION_SECONDS.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_RETENTION_SECONDS = 6 * 3600
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="job")
+_jobs: dict[str, "Job"] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    merchant_id: int
+    status: str = "queued"  # queued | running | done | failed
+    total: int = 0
+    done: int = 0
+    error: Optional[str] = None
+    result: Any = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    on_expire: Optional[Callable[["Job"], None]] = None  # e.g. delete the produced file
+
+    def progress(self, done: int, total: Optional[int] = None) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "percent": round(100.0 * self.done / self.total, 1) if self.total else (100.0 if self.status == "done" else 0.0),
+            "error": self.error,
+        }
+
+
+def _run(job: Job, fn: Callable[[Job], Any]) -> None:
+    job.status = "running"
+    try:
+        job.result = fn(job)
+        job.status = "done"
+    except Exception as e:
+        logger.exception(f"Job {job.kind} {job.id} failed")
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+
+
+def _cleanup() -> None:
+    now = time.time()
+    with _lock:
+        expired = [j for j in _jobs.values() if j.finished_at and now - j.finished_at > JOB_RETENTION_SECONDS]
+        for j in expired:
+            _jobs.pop(j.id, None)
+    for j in expired:
+        if j.on_expire:
+            try:
+                j.on_expire(j)
+            except Exception:
+                logger.exception(f"Job {j.kind} {j.id} cleanup failed")
+
+
+def start_job(
+    kind: str,
+    merchant_id: int,
+    fn: Callable[[Job], Any],
+    total: int = 0,
+    on_expire: Optional[Callable[[Job], None]] = None,
+) -> Job:
+    """Run fn(job) in the background; fn reports progress via job.progress()."""
+    _cleanup()
+    job = Job(id=uuid.uuid4().hex, kind=kind, merchant_id=merchant_id, total=total, on_expire=on_expire)
+    with _lock:
+        _jobs[job.id] = job
+    _executor.submit(_run, job, fn)
+    return job
+
+
+def get_job(job_id: str, merchant_id: int, kind: Optional[str] = None) -> Optional[Job]:
+    job = _jobs.get(job_id)
+    if not job or job.merchant_id != merchant_id or (kind and job.kind != kind):
+        return None
+    return job
@@ -0,0 +1,240 @@
+"""
+Process metrics in the Prometheus text exposition format (served on /metrics).
+
+A small in-process registry (counters, gauges, histograms with labels); the
+numbers are per worker process, Prometheus scrapes each worker / instance.
+
+Recorded here:
+- HTTP requests: count, latency per route template, in-flight
+- DB statements and DB time per request (cursor events, see query_counter)
+- PDF render and SMTP send durations (`timed`)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Iterator, Optional, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import query_counter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: dict = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.doc}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(f"{line}\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.label_names, key)} {_num(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+_LE_INF = 'le="+Inf"'
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (not cumulative) counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((k, [list(s[0]), s[1], s[2]]) for k, s in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_num(float(bound))}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.label_names, key, _LE_INF)} {count}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(m.render() for m in self._metrics)
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+START_TIME = time.time()
+
+http_requests = registry.register(Counter(
+    "acont_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"),
+))
+http_latency = registry.register(Histogram(
+    "acont_http_request_duration_seconds", "HTTP request latency (until the response is complete).", ("method", "route"),
+))
+http_in_flight = registry.register(Gauge(
+    "acont_http_requests_in_flight", "HTTP requests currently being served.",
+))
+db_queries = registry.register(Histogram(
+    "acont_db_queries_per_request", "SQL statements executed per HTTP request.", ("route",), buckets=COUNT_BUCKETS,
+))
+db_seconds = registry.register(Histogram(
+    "acont_db_seconds_per_request", "Time spent in SQL statements per HTTP request.", ("route",),
+))
+pdf_render_seconds = registry.register(Histogram(
+    "acont_pdf_render_seconds", "PDF render duration (cache misses only).", ("kind",),
+))
+smtp_send_seconds = registry.register(Histogram(
+    "acont_smtp_send_seconds", "SMTP send duration, reconnects included.", ("result",),
+))
+process_start = registry.register(Gauge(
+    "acont_process_start_time_seconds", "Start time of the process (unix epoch).",
+))
+process_start.set(START_TIME)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels) -> Iterator[None]:
+    """Observe the duration of the block; `result` (if a label) becomes ok / error."""
+    started = time.perf_counter()
+    result = "ok"
+    try:
+        yield
+    except BaseException:
+        result = "error"
+        raise
+    finally:
+        if "result" in histogram.label_names:
+            labels["result"] = result
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def timed_function(histogram: Histogram, **labels):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(histogram, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _route_label(scope: Scope) -> Optional[str]:
+    # FastAPI stores the matched route in the (shared) scope -> template, not the raw path
+    return getattr(scope.get("route"), "path", None)
+
+
+class MetricsMiddleware:
+    """Request count, latency, in-flight and per-request DB numbers (pure ASGI, streaming-safe)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter, token = query_counter.begin()
+        started = time.perf_counter()
+        status = 500
+        http_in_flight.inc()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            query_counter.end(token)
+            route = _route_label(scope) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method=method, route=route, status=status)
+            http_latency.observe(time.perf_counter() - started, method=method, route=route)
+            db_queries.observe(counter.count, route=route)
+            db_seconds.observe(counter.seconds, route=route)
@@ -0,0 +1,192 @@
+"""
+Money engine: document totals in integer cents.
+
+Amounts are held as integer cents, quantities as hundredths (the Numeric(12,2)
+columns), VAT rates and discounts as basis points. Nothing goes through float;
+rounding is half away from zero and happens at fixed points only:
+
+1. line net before discount = unit price x quantity, rounded to the cent
+2. line net = line net before x (1 - discount), rounded to the cent
+3. VAT is computed once per rate bucket on the bucket base; each line gets its own
+   rounded VAT and the few cents of difference to the bucket VAT go to the lines
+   closest to rounding the other way (largest remainder), so line VATs always add
+   up to the bucket and keep the sign of their line
+4. gross = net + VAT; total due = gross - advance, never below zero
+
+Used by invoices, credit notes and the PDF builders, so an amount shown anywhere
+is the same amount that was stored.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Union
+
+Number = Union[int, float, str, Decimal, None]
+
+_BP = 10_000  # basis points in 100 %
+
+
+def _scaled(value: Number, places: int) -> int:
+    if value is None or value == "":
+        return 0
+    d = value if isinstance(value, Decimal) else Decimal(str(value))
+    return int(d.scaleb(places).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def cents(value: Number) -> int:
+    """12.345 -> 1235"""
+    return _scaled(value, 2)
+
+
+def hundredths(value: Number) -> int:
+    """Quantities: 1.5 -> 150"""
+    return _scaled(value, 2)
+
+
+def basis_points(rate: Number) -> int:
+    """Percentages: 21 -> 2100, 5.5 -> 550"""
+    return _scaled(rate, 2)
+
+
+def to_decimal(amount_cents: int) -> Decimal:
+    """Cents -> Decimal for Numeric(…, 2) columns."""
+    return Decimal(amount_cents).scaleb(-2)
+
+
+def to_float(amount_cents: int) -> float:
+    """Cents -> float for JSON responses (exact to the cent)."""
+    return float(to_decimal(amount_cents))
+
+
+def rate_key(rate_bp: int) -> str:
+    """Breakdown key as shown to users: 2100 -> "21", 550 -> "5.5"."""
+    return f"{rate_bp / 100:.2f}".rstrip("0").rstrip(".")
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounded half away from zero."""
+    q, r = divmod(abs(numerator), denominator)
+    if 2 * r >= denominator:
+        q += 1
+    return q if numerator >= 0 else -q
+
+
+def line_net_before(unit_price: Number, quantity: Number) -> int:
+    return div_round(cents(unit_price) * hundredths(quantity), 100)
+
+
+def _line_vats(nets: list[int], rate_bp: int, bucket_vat: int) -> list[int]:
+    """
+    VAT of each line of one rate bucket, adding up to `bucket_vat`.
+
+    Every line is rounded on its own (signed net, so discount / negative lines get
+    negative VAT); the rounding difference to the bucket is then spread one cent at
+    a time over the lines whose exact VAT was closest to rounding the other way.
+    """
+    exact = [net * rate_bp for net in nets]  # in 1/_BP cents
+    vats = [div_round(x, _BP) for x in exact]
+    diff = bucket_vat - sum(vats)
+    if diff and vats:
+        step = 1 if diff > 0 else -1
+        # remainder left after rounding, oriented so that the largest one gets the cent first
+        order = sorted(range(len(vats)), key=lambda i: (-step * (exact[i] - vats[i] * _BP), i))
+        for k in range(abs(diff)):
+            vats[order[k % len(order)]] += step
+    return vats
+
+
+@dataclass(frozen=True)
+class LineAmounts:
+    rate_bp: int
+    net_before: int
+    net: int
+    vat: int
+    gross: int
+
+
+@dataclass
+class DocumentTotals:
+    lines: list[LineAmounts] = field(default_factory=list)
+    subtotal_net_before: int = 0
+    subtotal_net: int = 0
+    vat_total: int = 0
+    total_gross: int = 0
+    advance_paid: int = 0
+    total_due: int = 0
+    breakdown: dict[int, tuple[int, int]] = field(default_factory=dict)  # rate_bp -> (base, vat)
+
+    @property
+    def discount_amount(self) -> int:
+        return self.subtotal_net_before - self.subtotal_net
+
+    def breakdown_out(self) -> dict[str, dict[str, float]]:
+        return breakdown_out(self.breakdown)
+
+
+def compute_totals(
+    lines: Iterable[tuple[Number, Number, Number]],
+    discount_percent: Number = 0,
+    advance_paid: Number = 0,
+) -> DocumentTotals:
+    """Totals of (unit_price, quantity, vat_rate) lines under the rounding rules above."""
+    disc_bp = min(_BP, max(0, basis_points(discount_percent)))
+
+    rates, befores, nets = [], [], []
+    for unit_price, quantity, vat_rate in lines:
+        before = line_net_before(unit_price, quantity)
+        rates.append(basis_points(vat_rate))
+        befores.append(before)
+        nets.append(div_round(before * (_BP - disc_bp), _BP))
+
+    # VAT rounded once per rate bucket, line VATs adjusted to add up to it
+    buckets: dict[int, list[int]] = defaultdict(list)
+    for i, rate_bp in enumerate(rates):
+        buckets[rate_bp].append(i)
+
+    vats = [0] * len(nets)
+    breakdown: dict[int, tuple[int, int]] = {}
+    for rate_bp in sorted(buckets):
+        idx = buckets[rate_bp]
+        base = sum(nets[i] for i in idx)
+        vat = div_round(base * rate_bp, _BP)
+        breakdown[rate_bp] = (base, vat)
+        for i, part in zip(idx, _line_vats([nets[i] for i in idx], rate_bp, vat)):
+            vats[i] = part
+
+    out_lines = [
+        LineAmounts(rate_bp=r, net_before=b, net=n, vat=v, gross=n + v)
+        for r, b, n, v in zip(rates, befores, nets, vats)
+    ]
+    subtotal_net = sum(nets)
+    vat_total = sum(v for _, v in breakdown.values())
+    total_gross = subtotal_net + vat_total
+    advance = cents(advance_paid)
+
+    return DocumentTotals(
+        lines=out_lines,
+        subtotal_net_before=sum(befores),
+        subtotal_net=subtotal_net,
+        vat_total=vat_total,
+        total_gross=total_gross,
+        advance_paid=advance,
+        total_due=max(0, total_gross - advance),
+        breakdown=breakdown,
+    )
+
+
+def breakdown_from_lines(lines: Iterable[tuple[Number, Number, Number]]) -> dict[int, tuple[int, int]]:
+    """Per-rate (base, vat) of stored (vat_rate, line_net, line_vat) lines, summed in cents."""
+    acc: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+    for vat_rate, line_net, line_vat in lines:
+        row = acc[basis_points(vat_rate)]
+        row[0] += cents(line_net)
+        row[1] += cents(line_vat)
+    return {rate_bp: (base, vat) for rate_bp, (base, vat) in sorted(acc.items())}
+
+
+def breakdown_out(breakdown: dict[int, tuple[int, int]]) -> dict[str, dict[str, float]]:
+    """{"21": {"base": 100.0, "vat": 21.0}, ...} as returned by the API."""
+    return {
+        rate_key(rate_bp): {"base": to_float(base), "vat": to_float(vat)}
+        for rate_bp, (base, vat) in sorted(breakdown.items())
+    }
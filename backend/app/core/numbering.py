@@ -0,0 +1,105 @@
+"""
+Gapless document numbering (invoices, credit notes) per merchant, year and type.
+
+One statement allocates a range and returns it:
+
+    INSERT INTO invoice_sequences (merchant_id, year, doc_type, next_number)
+    VALUES (..., 1 + count)
+    ON CONFLICT (merchant_id, year, doc_type)
+    DO UPDATE SET next_number = invoice_sequences.next_number + count
+    RETURNING next_number
+
+The row lock it takes is what keeps numbers gapless: a concurrent allocation
+waits until this transaction commits (and sees its increment) or rolls back
+(and reuses the numbers). The lock cannot be shorter than "until commit", so
+callers allocate as the LAST write before the commit - everything else
+(document rows, items, rollups, subscription lookups) happens before, outside
+the locked window. The upsert also covers the first document of a year
+(no SELECT-then-INSERT race on the missing row).
+
+The same statement keeps `last_issued_date` (latest issue date of the row's
+numbered documents), so the chronological numbering check reads a handful of
+sequence rows instead of the merchant's documents - and is enforced again
+under the lock: an issue date older than what another transaction just
+committed raises ChronologyError.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.invoice_sequence import InvoiceSequence
+
+INVOICE = "invoice"
+CREDIT_NOTE = "credit_note"
+
+_sequences = InvoiceSequence.__table__
+
+
+class ChronologyError(ValueError):
+    """The issue date is older than the last issued document's (numbers must follow dates)."""
+
+    def __init__(self, last_issued_date: date):
+        super().__init__(f"last issued {last_issued_date.isoformat()}")
+        self.last_issued_date = last_issued_date
+
+
+def allocate_numbers(
+    db: Session,
+    merchant_id: int,
+    year: int,
+    doc_type: str,
+    count: int = 1,
+    issue_date: Optional[date] = None,
+) -> int:
+    """
+    Reserve `count` consecutive numbers; returns the first one. Locks the sequence row until commit.
+    `issue_date` = latest issue date of the documents being numbered (kept as last_issued_date).
+    """
+    if count < 1:
+        raise ValueError("count must be >= 1")
+    stmt = pg_insert(_sequences).values(
+        merchant_id=merchant_id, year=year, doc_type=doc_type, next_number=1 + count,
+        last_issued_date=issue_date,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_sequences.c.merchant_id, _sequences.c.year, _sequences.c.doc_type],
+        set_={
+            "next_number": _sequences.c.next_number + count,
+            # GREATEST ignores NULLs
+            "last_issued_date": func.greatest(_sequences.c.last_issued_date, stmt.excluded.last_issued_date),
+        },
+    ).returning(_sequences.c.next_number, _sequences.c.last_issued_date)
+    next_number, last_date = db.execute(stmt).one()
+    if issue_date is not None and last_date is not None and last_date > issue_date:
+        raise ChronologyError(last_date)
+    return next_number - count
+
+
+def last_issued_date(db: Session, merchant_id: int, doc_type: str) -> Optional[date]:
+    """Latest issue date of the merchant's numbered documents of this type (all years)."""
+    return db.execute(
+        select(func.max(_sequences.c.last_issued_date)).where(
+            _sequences.c.merchant_id == merchant_id,
+            _sequences.c.doc_type == doc_type,
+        )
+    ).scalar()
+
+
+def peek_next_number(db: Session, merchant_id: int, year: int, doc_type: str) -> int:
+    """Next number as currently committed (display only, no lock)."""
+    n = db.execute(
+        select(_sequences.c.next_number).where(
+            _sequences.c.merchant_id == merchant_id,
+            _sequences.c.year == year,
+            _sequences.c.doc_type == doc_type,
+        )
+    ).scalar()
+    return int(n) if n else 1
+
+
+def format_number(n: int) -> str:
+    # ✅ cerință: 000001, 000002...
+    return f"{n:06d}"
@@ -0,0 +1,197 @@
+"""
+Shared assets for the PDF builders (invoice_pdf, credit_note_pdf).
+
+- fonts are registered with ReportLab once per process (startup hook), never per render
+- merchant logos are decoded once into ImageReader objects and kept in an LRU
+- remote (http/https) logos are downloaded in the background; the render path
+  never makes an outbound call and simply skips the logo until it is ready
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+import requests
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from app.core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_DEJAVU_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_DEJAVU_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+_fonts_lock = threading.Lock()
+_fonts: Optional[tuple[str, str]] = None
+
+_LOGO_CACHE_ENTRIES = 256
+_REMOTE_LOGO_TIMEOUT = 3
+_REMOTE_LOGO_RETRY_SECONDS = 600
+
+# url -> (version, ImageReader); version = (mtime_ns, size) for local files, "" for remote
+# a failed remote download is kept as (failed_at, None) so we do not retry on every render
+_logos = LRUCache(max_entries=_LOGO_CACHE_ENTRIES)
+_pending: set[str] = set()
+_pending_lock = threading.Lock()
+_fetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="logo-fetch")
+
+
+def register_fonts() -> tuple[str, str]:
+    """Register DejaVu (Unicode) if present; returns (regular, bold) font names."""
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+
+    with _fonts_lock:
+        if _fonts is not None:
+            return _fonts
+
+        regular, bold = "Helvetica", "Helvetica-Bold"
+        try:
+            if Path(_DEJAVU_REGULAR).exists():
+                pdfmetrics.registerFont(TTFont("DejaVuSans", _DEJAVU_REGULAR))
+                regular = "DejaVuSans"
+            if Path(_DEJAVU_BOLD).exists():
+                pdfmetrics.registerFont(TTFont("DejaVuSans-Bold", _DEJAVU_BOLD))
+                bold = "DejaVuSans-Bold"
+        except Exception as e:
+            # keep Helvetica if registration fails
+            logger.warning(f"PDF font registration failed, using Helvetica: {e}")
+            regular, bold = "Helvetica", "Helvetica-Bold"
+
+        _fonts = (regular, bold)
+        return _fonts
+
+
+def pdf_fonts() -> tuple[str, str]:
+    return _fonts or register_fonts()
+
+
+def _is_remote(url: str) -> bool:
+    return url.startswith("http://") or url.startswith("https://")
+
+
+def _local_path(url: str) -> Path:
+    return Path(url.lstrip("/"))  # /static/logos/... -> static/logos/...
+
+
+def _decode(src) -> ImageReader:
+    img = ImageReader(src)
+    img.getSize()  # force decode now, not inside a render
+    return img
+
+
+def _fetch_remote(url: str) -> None:
+    try:
+        r = requests.get(url, timeout=_REMOTE_LOGO_TIMEOUT)
+        r.raise_for_status()
+        _logos.set(url, ("", _decode(BytesIO(r.content))))
+    except Exception as e:
+        logger.warning(f"Could not fetch merchant logo {url}: {e}")
+        _logos.set(url, (time.monotonic(), None))
+    finally:
+        with _pending_lock:
+            _pending.discard(url)
+
+
+def prefetch_logo(url: Optional[str]) -> None:
+    """Schedule a background download of a remote logo (no-op if cached / in flight)."""
+    if not url or not _is_remote(url):
+        return
+    hit = _logos.get(url)
+    if hit is not None and (hit[1] is not None or time.monotonic() - hit[0] < _REMOTE_LOGO_RETRY_SECONDS):
+        return
+    with _pending_lock:
+        if url in _pending:
+            return
+        _pending.add(url)
+    _fetcher.submit(_fetch_remote, url)
+
+
+def preload_logo(url: Optional[str]) -> None:
+    """
+    Blocking warm-up for batch workers (bulk export): after this, get_logo(url)
+    answers from memory in this process. Not for the request path.
+    """
+    if not url:
+        return
+    if _is_remote(url):
+        hit = _logos.get(url)
+        if hit is None or (hit[1] is None and time.monotonic() - hit[0] >= _REMOTE_LOGO_RETRY_SECONDS):
+            _fetch_remote(url)
+        return
+    get_logo(url)
+
+
+def get_logo(url: Optional[str]) -> Optional[ImageReader]:
+    """Decoded logo for a merchant logo_url, or None (missing / remote not fetched yet)."""
+    if not url:
+        return None
+
+    if _is_remote(url):
+        hit = _logos.get(url)
+        if hit is None or hit[1] is None:
+            prefetch_logo(url)
+            return None
+        return hit[1]
+
+    if not url.startswith("/static/"):
+        return None
+
+    path = _local_path(url)
+    try:
+        st = path.stat()
+    except OSError:
+        _logos.pop(url)
+        return None
+
+    # stat is cheap and keeps other worker processes consistent after an upload
+    version = (st.st_mtime_ns, st.st_size)
+    hit = _logos.get(url)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+
+    try:
+        img = _decode(str(path))
+    except Exception as e:
+        logger.warning(f"Could not decode merchant logo {path}: {e}")
+        return None
+    _logos.set(url, (version, img))
+    return img
+
+
+def logo_version(url: Optional[str]) -> str:
+    """Token identifying what get_logo(url) would draw (part of the PDF cache key)."""
+    if not url:
+        return ""
+    if _is_remote(url):
+        hit = _logos.get(url)
+        return f"{url}:{'ready' if hit is not None and hit[1] is not None else 'pending'}"
+    if url.startswith("/static/"):
+        try:
+            st = _local_path(url).stat()
+            return f"{url}:{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            return f"{url}:missing"
+    return url
+
+
+def invalidate_logo(url: Optional[str]) -> None:
+    if url:
+        _logos.pop(url)
+
+
+def draw_logo(c, merchant_logo_url: Optional[str], *, x=40, y=790, w=110, h=35) -> bool:
+    img = get_logo(merchant_logo_url)
+    if img is None:
+        return False
+    try:
+        c.drawImage(img, x=x, y=y, width=w, height=h, mask="auto", preserveAspectRatio=True)
+        return True
+    except Exception:
+        return False
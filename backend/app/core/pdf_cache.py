@@ -0,0 +1,190 @@
+"""
+Content-addressed cache for rendered invoice / credit note PDFs.
+
+Issued documents are immutable, so the rendered bytes only depend on the
+document content, the template, the language and the merchant logo.
+The cache key is a sha256 over exactly that; any change produces a new key,
+so nothing ever needs explicit invalidation.
+
+Two tiers: an in-memory LRU (bounded by bytes) in front of a local disk
+directory (bounded by bytes, oldest files evicted first).
+Drafts must not go through the cache (callers check `is_cacheable`).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.core.cache import LRUCache
+from app.core.pdf_assets import logo_version
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the PDF layout code changes -> every cached artifact is re-rendered.
+PDF_RENDER_VERSION = 2
+
+
+def _items_payload(items) -> list:
+    return [
+        [
+            it.item_code, it.description,
+            str(it.unit_price), str(it.quantity), str(it.vat_rate),
+            str(it.line_net), str(it.line_vat), str(it.line_gross),
+        ]
+        for it in items
+    ]
+
+
+def invoice_cache_key(inv, merchant_logo_url: Optional[str]) -> str:
+    payload = {
+        "v": PDF_RENDER_VERSION,
+        "kind": "invoice",
+        "id": inv.id,
+        "no": inv.invoice_no,
+        "issue_date": inv.issue_date,
+        "due_date": inv.due_date,
+        "language": inv.language,
+        "template": inv.template,
+        "currency": inv.currency,
+        "client": [inv.client_name, inv.client_email, inv.client_tax_id, inv.client_address],
+        "comm": [inv.communication_mode, inv.communication_reference],
+        "amounts": [str(inv.discount_percent), str(inv.advance_paid), str(inv.subtotal_net),
+                    str(inv.vat_total), str(inv.total_gross)],
+        "notes": inv.notes,
+        "items": _items_payload(inv.items),
+        "logo": logo_version(merchant_logo_url),
+    }
+    return _digest(payload)
+
+
+def credit_note_cache_key(cn, merchant_logo_url: Optional[str]) -> str:
+    payload = {
+        "v": PDF_RENDER_VERSION,
+        "kind": "credit_note",
+        "id": cn.id,
+        "no": cn.credit_note_no,
+        "issue_date": cn.issue_date,
+        "language": cn.language,
+        "template": cn.template,
+        "currency": cn.currency,
+        "client": [cn.client_name, cn.client_email, cn.client_tax_id, cn.client_address],
+        "comm": [cn.communication_mode, cn.communication_reference],
+        "amounts": [str(cn.subtotal_net), str(cn.vat_total), str(cn.total_gross)],
+        "notes": cn.notes,
+        "items": _items_payload(cn.items),
+        "logo": logo_version(merchant_logo_url),
+    }
+    return _digest(payload)
+
+
+def _digest(payload: dict) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(doc) -> bool:
+    status = getattr(doc.status, "value", doc.status)
+    return status != "draft"
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag_for(key) in tags or f"W/{etag_for(key)}" in tags
+
+
+class PdfCache:
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.dir = Path(directory)
+        self.disk_bytes = disk_bytes
+        self.memory = LRUCache(max_bytes=memory_bytes)
+        self._disk_lock = threading.Lock()
+        self._disk_usage: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # LRU order on disk = mtime
+        except OSError:
+            pass
+        self.memory.set(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.memory.set(key, data)
+        if self.disk_bytes <= 0:
+            return
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"PDF cache disk write failed for {key}: {e}")
+            return
+
+        with self._disk_lock:
+            if self._disk_usage is None:
+                self._disk_usage = sum(p.stat().st_size for p in self.dir.glob("*/*.pdf"))
+            else:
+                self._disk_usage += len(data)
+            if self._disk_usage > self.disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = []
+        for p in self.dir.glob("*/*.pdf"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        files.sort()
+
+        usage = sum(f[1] for f in files)
+        target = int(self.disk_bytes * 0.9)  # leave headroom so we do not evict on every write
+        for _, size, p in files:
+            if usage <= target:
+                break
+            try:
+                p.unlink()
+                usage -= size
+            except OSError:
+                pass
+        self._disk_usage = usage
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+
+pdf_cache = PdfCache(
+    directory=settings.PDF_CACHE_DIR,
+    memory_bytes=settings.PDF_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_bytes=settings.PDF_CACHE_DISK_MB * 1024 * 1024,
+)
@@ -0,0 +1,274 @@
+"""
+Bulk PDF export: render many invoices / credit notes in a process pool and
+stream them as a ZIP.
+
+- ORM objects are loaded in chunks and turned into plain picklable snapshots;
+  workers never touch the database
+- each worker process registers the fonts once (pool initializer) and keeps the
+  merchant logo decoded in memory (pdf_assets), issued documents go through the
+  shared disk tier of the PDF render cache
+- the number of documents in flight is bounded and the ZIP is written to the
+  response as each entry completes, so memory stays flat for large exports
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Iterable, Iterator, Optional
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.credit_note import CreditNote, CreditNoteStatus
+from app.models.invoice import Invoice, InvoiceStatus
+
+logger = logging.getLogger(__name__)
+
+_LOAD_CHUNK = 100
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class ExportFilters:
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    status: Optional[str] = None  # invoice status; None = everything except drafts
+    client_id: Optional[int] = None
+    include_credit_notes: bool = True
+
+
+# ----------------------------
+# Worker side
+# ----------------------------
+def _init_worker() -> None:
+    from app.core.pdf_assets import register_fonts
+    register_fonts()
+
+
+def _render(kind: str, snap: SimpleNamespace, logo_url: Optional[str]) -> bytes:
+    from app.core.credit_note_pdf import build_credit_note_pdf
+    from app.core.invoice_pdf import build_invoice_pdf
+    from app.core.pdf_assets import preload_logo
+    from app.core.pdf_cache import credit_note_cache_key, invoice_cache_key, is_cacheable, pdf_cache
+
+    preload_logo(logo_url)  # once per worker process, then from memory
+
+    build, cache_key = (
+        (build_invoice_pdf, invoice_cache_key) if kind == "invoice"
+        else (build_credit_note_pdf, credit_note_cache_key)
+    )
+    if not is_cacheable(snap):
+        return build(snap, merchant_logo_url=logo_url)
+    return pdf_cache.get_or_render(cache_key(snap, logo_url), lambda: build(snap, merchant_logo_url=logo_url))
+
+
+def _workers() -> int:
+    return settings.PDF_EXPORT_WORKERS or min(4, os.cpu_count() or 1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: the API process has threads (db pool, logo fetcher); fork is not safe with them
+                _pool = ProcessPoolExecutor(
+                    max_workers=_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ----------------------------
+# Loading (parent process)
+# ----------------------------
+def snapshot(obj) -> SimpleNamespace:
+    """Picklable copy of a document (columns + items) for the worker processes."""
+    data = {a.key: getattr(obj, a.key) for a in sa_inspect(obj).mapper.column_attrs}
+    data["items"] = [
+        SimpleNamespace(**{a.key: getattr(it, a.key) for a in sa_inspect(it).mapper.column_attrs})
+        for it in obj.items
+    ]
+    return SimpleNamespace(**data)
+
+
+def document_refs(db: Session, merchant_id: int, f: ExportFilters) -> list[tuple[str, int]]:
+    """(kind, id) of every document matching the filters; ids only, cheap even for large exports."""
+    q = db.query(Invoice.id).filter(Invoice.merchant_id == merchant_id)
+    if f.status:
+        q = q.filter(Invoice.status == InvoiceStatus(f.status))
+    else:
+        q = q.filter(Invoice.status != InvoiceStatus.draft)
+    if f.start_date:
+        q = q.filter(Invoice.issue_date >= f.start_date)
+    if f.end_date:
+        q = q.filter(Invoice.issue_date <= f.end_date)
+    if f.client_id:
+        q = q.filter(Invoice.client_id == f.client_id)
+    refs = [("invoice", r[0]) for r in q.order_by(Invoice.issue_date, Invoice.id)]
+
+    if f.include_credit_notes:
+        q = db.query(CreditNote.id).filter(
+            CreditNote.merchant_id == merchant_id,
+            CreditNote.status == CreditNoteStatus.issued,
+        )
+        if f.start_date:
+            q = q.filter(CreditNote.issue_date >= f.start_date)
+        if f.end_date:
+            q = q.filter(CreditNote.issue_date <= f.end_date)
+        if f.client_id:
+            q = q.filter(CreditNote.client_id == f.client_id)
+        refs += [("credit_note", r[0]) for r in q.order_by(CreditNote.issue_date, CreditNote.id)]
+
+    return refs
+
+
+def _arcname(kind: str, snap: SimpleNamespace) -> str:
+    if kind == "invoice":
+        if not snap.invoice_no:
+            return f"invoices/drafts/invoice-{snap.id}.pdf"
+        return f"invoices/{snap.issue_date.year}/{snap.invoice_no.replace('/', '-')}.pdf"
+    no = (snap.credit_note_no or f"credit-note-{snap.id}").replace("/", "-")
+    return f"credit_notes/{snap.issue_date.year}/{no}.pdf"
+
+
+def _load_snapshots(merchant_id: int, refs: list[tuple[str, int]]) -> Iterator[tuple[str, SimpleNamespace]]:
+    models = {"invoice": Invoice, "credit_note": CreditNote}
+    db = SessionLocal()
+    try:
+        for i in range(0, len(refs), _LOAD_CHUNK):
+            chunk = refs[i:i + _LOAD_CHUNK]
+            loaded: dict[tuple[str, int], SimpleNamespace] = {}
+            for kind, model in models.items():
+                ids = [doc_id for k, doc_id in chunk if k == kind]
+                if not ids:
+                    continue
+                rows = (
+                    db.query(model)
+                    .options(selectinload(model.items))
+                    .filter(model.merchant_id == merchant_id, model.id.in_(ids))
+                    .all()
+                )
+                for r in rows:
+                    loaded[(kind, r.id)] = snapshot(r)
+            # release the connection and the identity map between chunks
+            db.close()
+            for ref in chunk:
+                if ref in loaded:
+                    yield ref[0], loaded[ref]
+    finally:
+        db.close()
+
+
+def render_in_pool(
+    docs: Iterable[tuple[str, str, SimpleNamespace]],
+    logo_url: Optional[str],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    Render (name, kind, snapshot) items in the process pool.
+    Yields (name, pdf_bytes, error) in input order; at most workers * 4 documents are in flight.
+    """
+    pool = _get_pool()
+    window = _workers() * 4
+    pending: deque = deque()
+    done = 0
+
+    def _take():
+        nonlocal done
+        name, fut = pending.popleft()
+        done += 1
+        if on_progress:
+            on_progress(done)
+        try:
+            return name, fut.result(), None
+        except Exception as e:
+            logger.warning(f"PDF render failed for {name}: {e}")
+            return name, None, str(e)
+
+    for name, kind, snap in docs:
+        pending.append((name, pool.submit(_render, kind, snap, logo_url)))
+        while len(pending) >= window:
+            yield _take()
+    while pending:
+        yield _take()
+
+
+def render_documents(
+    merchant_id: int,
+    logo_url: Optional[str],
+    refs: list[tuple[str, int]],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[tuple[str, Optional[bytes], Optional[str]]]:
+    """Load + render the referenced documents; yields (arcname, pdf_bytes, error) in order."""
+    docs = ((_arcname(kind, snap), kind, snap) for kind, snap in _load_snapshots(merchant_id, refs))
+    return render_in_pool(docs, logo_url, on_progress)
+
+
+# ----------------------------
+# ZIP writing
+# ----------------------------
+class _ChunkSink:
+    """Unseekable file object collecting what ZipFile writes (ZipFile then uses data descriptors)."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def iter_zip(entries: Iterable[tuple[str, Optional[bytes], Optional[str]]]) -> Iterator[bytes]:
+    """ZIP bytes produced entry by entry; failed documents are listed in errors.txt."""
+    sink = _ChunkSink()
+    errors: list[str] = []
+    # PDFs are already compressed -> store, do not deflate again
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, data, error in entries:
+            if data is None:
+                errors.append(f"{name}: {error}")
+                continue
+            zf.writestr(name, data)
+            yield sink.drain()
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors) + "\n")
+    yield sink.drain()
+
+
+def write_export_zip(path: Path, merchant_id: int, logo_url: Optional[str], refs: list[tuple[str, int]], on_progress=None) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as fh:
+        for chunk in iter_zip(render_documents(merchant_id, logo_url, refs, on_progress)):
+            fh.write(chunk)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,201 @@
+"""
+Streaming CSV product import.
+
+The upload is decoded and parsed row by row (never read as a whole), valid rows
+are written in chunks with INSERT ... ON CONFLICT (merchant_id, code) DO UPDATE,
+so memory is bounded by the chunk size plus the merchant's set of existing codes
+(loaded once, only to report created vs updated).
+
+Every chunk is committed: an interrupted import keeps the rows written so far,
+and importing the same file again converges to the same catalog.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+
+CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 50
+REQUIRED_COLUMNS = {"name", "unit_price"}
+
+_UPSERT_COLUMNS = ("name", "description", "unit_price", "vat_rate")
+# limits of the products columns (String(50/200/500), Numeric(10,2), Numeric(5,2))
+_MAX_CODE, _MAX_NAME, _MAX_DESCRIPTION = 50, 200, 500
+_MAX_PRICE, _MAX_VAT = Decimal("100000000"), Decimal("1000")
+
+
+class CsvImportError(ValueError):
+    """The file cannot be imported at all (encoding, header)."""
+
+
+def parse_decimal(val: Optional[str], default: Optional[Decimal] = None) -> Optional[Decimal]:
+    if val is None:
+        return default
+    s = str(val).strip()
+    if s == "":
+        return default
+    # acceptă și 12,34
+    s = s.replace(",", ".")
+    try:
+        d = Decimal(s)
+    except (InvalidOperation, ValueError):
+        return None
+    return d if d.is_finite() else None
+
+
+def _parse_row(row: dict) -> tuple[Optional[dict], Optional[str]]:
+    """(values, None) for a valid row, (None, error) otherwise."""
+    name = (row.get("name") or "").strip()
+    code = (row.get("code") or "").strip() or None
+    description = (row.get("description") or "").strip() or None
+
+    unit_price = parse_decimal(row.get("unit_price"))
+    vat_rate = parse_decimal(row.get("vat_rate"), default=Decimal("0"))
+
+    if not name:
+        return None, "name is required"
+    if unit_price is None:
+        return None, "unit_price must be a number"
+    if vat_rate is None:
+        return None, "vat_rate must be a number"
+    if len(name) > _MAX_NAME:
+        return None, f"name is too long (max {_MAX_NAME})"
+    if code and len(code) > _MAX_CODE:
+        return None, f"code is too long (max {_MAX_CODE})"
+    if description and len(description) > _MAX_DESCRIPTION:
+        return None, f"description is too long (max {_MAX_DESCRIPTION})"
+    if abs(unit_price) >= _MAX_PRICE:
+        return None, "unit_price is out of range"
+    if abs(vat_rate) >= _MAX_VAT:
+        return None, "vat_rate is out of range"
+
+    return {
+        "name": name,
+        "code": code,
+        "description": description,
+        "unit_price": unit_price,
+        "vat_rate": vat_rate,
+    }, None
+
+
+_products = Product.__table__
+_upsert = pg_insert(_products)
+_upsert = _upsert.on_conflict_do_update(
+    index_elements=[_products.c.merchant_id, _products.c.code],
+    set_={col: _upsert.excluded[col] for col in _UPSERT_COLUMNS},
+)
+
+
+def _write_chunk(db: Session, merchant_id: int, by_code: dict[str, dict], without_code: list[dict]) -> None:
+    # executemany of one parameterised statement (batched by the driver); building a
+    # multi-row VALUES clause per chunk costs more than the round trips it saves
+    if by_code:
+        # sorted -> concurrent imports lock rows in the same order
+        db.execute(_upsert, [{"merchant_id": merchant_id, **by_code[code]} for code in sorted(by_code)])
+    if without_code:
+        db.execute(insert(_products), [{"merchant_id": merchant_id, **v} for v in without_code])
+    db.commit()
+
+
+def import_products_csv(
+    db: Session,
+    merchant_id: int,
+    fileobj: BinaryIO,
+    on_progress: Optional[Callable[[int], None]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Import a products CSV (UTF-8, optional BOM) read from a binary file object.
+    Rows with a code update the merchant's product with that code, rows without
+    one are always created. Raises CsvImportError when the header is unusable.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        try:
+            fieldnames = reader.fieldnames
+        except UnicodeDecodeError:
+            raise CsvImportError("Invalid CSV encoding (use UTF-8)")
+        if not fieldnames:
+            raise CsvImportError("CSV must include a header row")
+
+        reader.fieldnames = [c.strip() for c in fieldnames]
+        missing_required = REQUIRED_COLUMNS - set(reader.fieldnames)
+        if missing_required:
+            raise CsvImportError(f"Missing required columns: {', '.join(sorted(missing_required))}")
+
+        known_codes = {
+            code for (code,) in
+            db.query(Product.code).filter(Product.merchant_id == merchant_id, Product.code.isnot(None))
+        }
+
+        created = updated = failed = rows = 0
+        errors: list[dict] = []
+        by_code: dict[str, dict] = {}
+        without_code: list[dict] = []
+
+        def fail(row_index: int, error: str) -> None:
+            nonlocal failed
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_index, "error": error})
+
+        row_index = 1  # 1-based pentru user (după header)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except UnicodeDecodeError:
+                fail(row_index + 1, "Invalid CSV encoding (use UTF-8); import stopped here")
+                break
+            except csv.Error as e:
+                fail(row_index + 1, f"Malformed CSV: {e}; import stopped here")
+                break
+
+            row_index += 1
+            rows += 1
+            values, error = _parse_row(row)
+            if error:
+                fail(row_index, error)
+                continue
+
+            code = values["code"]
+            if code is None:
+                without_code.append(values)
+                created += 1
+            else:
+                # the same code twice in a chunk -> last row wins (one upsert per code)
+                by_code[code] = values
+                if code in known_codes:
+                    updated += 1
+                else:
+                    known_codes.add(code)
+                    created += 1
+
+            if len(by_code) + len(without_code) >= chunk_size:
+                _write_chunk(db, merchant_id, by_code, without_code)
+                by_code, without_code = {}, []
+                if on_progress:
+                    on_progress(rows)
+
+        _write_chunk(db, merchant_id, by_code, without_code)
+        if on_progress:
+            on_progress(rows)
+    finally:
+        text.detach()  # leave the underlying file to its owner
+
+    return {
+        "ok": True,
+        "rows": rows,
+        "created": created,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors,  # first MAX_REPORTED_ERRORS only
+    }
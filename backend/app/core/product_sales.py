@@ -0,0 +1,77 @@
+"""
+Incremental maintenance of the product sales aggregate (product_sales_monthly).
+
+Invoice issuance, void and credit-note issuance call the helpers below inside
+the caller's transaction (next to the report rollups), so product reports group
+a merchant's months instead of joining invoice items. Lines without a
+product_id (free text) are not attributed.
+"""
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from app.core.deltas import upsert_deltas
+from app.core.money import cents, hundredths
+from app.models.invoice import InvoiceStatus
+from app.models.invoice_item import InvoiceItem
+from app.models.product_sales import ProductSalesMonthly
+
+_SUM_COLUMNS = ("line_count", "quantity", "net_total", "vat_total")
+_SCALED_COLUMNS = ("quantity", "net_total", "vat_total")  # deltas in hundredths / cents
+
+
+def month_of(day: date) -> date:
+    return day.replace(day=1)
+
+
+def item_deltas(merchant_id: int, day: date, items: Iterable, sign: int = 1) -> list[dict]:
+    """
+    Aggregate rows (amounts in cents, quantities in hundredths) contributed by invoice
+    lines issued on `day` (sign=-1 removes them).
+    `items` are InvoiceItem rows or the item dicts built at invoice creation.
+    """
+    month = month_of(day)
+    rows = []
+    for it in items:
+        get = it.get if isinstance(it, dict) else lambda k: getattr(it, k)
+        product_id = get("product_id")
+        if not product_id:
+            continue
+        rows.append({
+            "merchant_id": merchant_id, "month": month, "product_id": product_id,
+            "line_count": sign, "quantity": sign * hundredths(get("quantity")),
+            "net_total": sign * cents(get("line_net")), "vat_total": sign * cents(get("line_vat")),
+        })
+    return rows
+
+
+def apply_product_sales_deltas(db: Session, deltas: Iterable[dict]) -> None:
+    """Merge deltas per (merchant, month, product) and upsert them in one statement."""
+    upsert_deltas(
+        db, ProductSalesMonthly, ("merchant_id", "month", "product_id"), _SUM_COLUMNS, deltas,
+        cents_cols=_SCALED_COLUMNS,
+    )
+
+
+def record_invoice_issued(db: Session, inv, items: Iterable) -> None:
+    apply_product_sales_deltas(db, item_deltas(inv.merchant_id, inv.issue_date, items))
+
+
+def record_invoice_status_change(db: Session, inv, old_status, new_status) -> None:
+    """
+    Voiding an issued invoice takes its lines out (paid changes nothing). Credited
+    invoices cannot be voided (invoices._set_invoice_status), so no credit note's
+    negative lines are left behind.
+    """
+    if old_status != InvoiceStatus.issued or new_status != InvoiceStatus.void:
+        return
+    items = db.query(InvoiceItem).filter(
+        InvoiceItem.invoice_id == inv.id, InvoiceItem.product_id.is_not(None)
+    ).all()
+    apply_product_sales_deltas(db, item_deltas(inv.merchant_id, inv.issue_date, items, sign=-1))
+
+
+def record_credit_note_issued(db: Session, cn, invoice_items: Iterable) -> None:
+    # a credit note negates the credited invoice's lines, in its own month
+    apply_product_sales_deltas(db, item_deltas(cn.merchant_id, cn.issue_date, invoice_items, sign=-1))
@@ -0,0 +1,216 @@
+"""
+Opt-in profiling surface: request context for logs, and an on-demand sampling profiler.
+
+Request context: `ProfilingMiddleware` puts a small mutable `RequestInfo` in a
+contextvar; the auth dependency fills in the merchant. The object is shared by
+the threadpool copies of the context, so the slow-query log (app.db.session)
+can say which route and merchant a statement came from.
+
+Sampling profiler: an admin arms a session for one route template; a
+background thread samples every thread's stack (sys._current_frames) and keeps
+the samples that run inside that route's endpoint. This works the same for sync
+endpoints (threadpool) and async ones (event loop) - a per-thread tracer like
+cProfile would only see the thread it was enabled on. After the next N requests
+to the route the session stops; the result is a folded-stack flamegraph
+(flamegraph.pl, speedscope, inferno) plus the hottest functions.
+
+Sessions are per worker process: arm it on the instance you want to look at.
+"""
+import contextvars
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+MAX_STACK_DEPTH = 128
+
+
+@dataclass
+class RequestInfo:
+    method: str
+    path: str
+    scope: Scope
+    merchant_id: Optional[int] = None
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope once routing happened
+        return getattr(self.scope.get("route"), "path", None) or self.path
+
+
+_request: contextvars.ContextVar[Optional[RequestInfo]] = contextvars.ContextVar("request_info", default=None)
+
+
+def current_request() -> Optional[RequestInfo]:
+    return _request.get()
+
+
+def set_request_merchant(merchant_id: Optional[int]) -> None:
+    info = _request.get()
+    if info is not None:
+        info.merchant_id = merchant_id
+
+
+def _frame_label(code) -> str:
+    module = code.co_filename.rsplit("/", 1)[-1]
+    return f"{code.co_qualname} ({module}:{code.co_firstlineno})"
+
+
+@dataclass
+class ProfileSession:
+    id: str
+    route: str
+    method: str
+    requests: int
+    interval: float
+    expires_at: float
+    endpoint_code: object
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    captured: int = 0
+    durations_ms: list[float] = field(default_factory=list)
+    samples: Counter = field(default_factory=Counter)
+    sample_count: int = 0
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def top_functions(self, limit: int = 25) -> list[dict]:
+        # self time = innermost frame of each sample
+        leaves: Counter = Counter()
+        for stack, n in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        total = self.sample_count or 1
+        return [
+            {"function": fn, "samples": n, "percent": round(100 * n / total, 1)}
+            for fn, n in leaves.most_common(limit)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "method": self.method,
+            "active": self.active,
+            "requests": self.requests,
+            "captured": self.captured,
+            "durations_ms": [round(d, 1) for d in self.durations_ms],
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": self.sample_count,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "top_functions": self.top_functions(),
+        }
+
+
+class Profiler:
+    """At most one active session per process; finished ones are kept until replaced."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.session: Optional[ProfileSession] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, route: str, method: str, endpoint, requests: int, interval_ms: float, max_seconds: int) -> ProfileSession:
+        with self._lock:
+            if self.session is not None and self.session.active:
+                raise RuntimeError("A profiling session is already running")
+            session = ProfileSession(
+                id=uuid.uuid4().hex,
+                route=route,
+                method=method.upper(),
+                requests=requests,
+                interval=interval_ms / 1000,
+                expires_at=time.monotonic() + max_seconds,
+                endpoint_code=endpoint.__code__,
+            )
+            self.session = session
+            self._thread = threading.Thread(target=self._sample, args=(session,), name="profiler", daemon=True)
+            self._thread.start()
+            return session
+
+    def stop(self) -> None:
+        with self._lock:
+            if self.session is not None and self.session.active:
+                self.session.finished_at = time.time()
+
+    def get(self, session_id: str) -> Optional[ProfileSession]:
+        session = self.session
+        return session if session is not None and session.id == session_id else None
+
+    def wants(self, method: str, route: Optional[str]) -> Optional[ProfileSession]:
+        session = self.session
+        if session is None or not session.active:
+            return None
+        if route == session.route and method == session.method:
+            return session
+        return None
+
+    def request_done(self, session: ProfileSession, duration_ms: float) -> None:
+        with self._lock:
+            if not session.active:
+                return
+            session.captured += 1
+            session.durations_ms.append(duration_ms)
+            if session.captured >= session.requests:
+                session.finished_at = time.time()
+
+    def _sample(self, session: ProfileSession) -> None:
+        me = threading.get_ident()
+        target = session.endpoint_code
+        while session.active:
+            if time.monotonic() > session.expires_at:
+                self.stop()
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                inside = False
+                f = frame
+                while f is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(f.f_code)
+                    if f.f_code is target:
+                        inside = True
+                        break
+                    f = f.f_back
+                if inside:
+                    # root (endpoint) first, as flamegraph tools expect
+                    session.samples[";".join(_frame_label(c) for c in reversed(stack))] += 1
+                    session.sample_count += 1
+            time.sleep(session.interval)
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Sets the request context; counts requests of the profiled route (pure ASGI)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        info = RequestInfo(method=scope["method"], path=scope["path"], scope=scope)
+        token = _request.set(info)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
+            session = profiler.wants(info.method, getattr(scope.get("route"), "path", None))
+            if session is not None:
+                profiler.request_done(session, (time.perf_counter() - started) * 1000)
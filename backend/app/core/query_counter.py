@@ -0,0 +1,114 @@
+"""
+Per-request SQL statement counter (debug instrumentation).
+
+With DEBUG_QUERY_COUNT=true every response carries `X-DB-Query-Count` and
+requests above DEBUG_QUERY_COUNT_WARN statements are logged, which makes N+1
+patterns visible while developing. `count_queries()` gives the same number
+around any block of code (scripts, benchmarks, ad-hoc checks).
+
+Statements are counted (and timed) from the engines' cursor events; the
+counter lives in a contextvar, so it follows the request into the threadpool
+that runs sync endpoints. An executemany counts as one statement.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-DB-Query-Count"
+
+
+class QueryCounter:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current: contextvars.ContextVar[Optional[QueryCounter]] = contextvars.ContextVar("query_counter", default=None)
+_installed: set[int] = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    started = conn.info.get("query_started")
+    if counter is not None and started:
+        counter.seconds += time.perf_counter() - started.pop()
+
+
+def install(*engines: Engine) -> None:
+    """Attach the counting listeners (idempotent)."""
+    for engine in engines:
+        if id(engine) in _installed:
+            continue
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        _installed.add(id(engine))
+
+
+def begin() -> tuple[QueryCounter, Optional[contextvars.Token]]:
+    """Counter for the current context; reuses an outer one (nested middlewares share it)."""
+    counter = _current.get()
+    if counter is not None:
+        return counter, None
+    counter = QueryCounter()
+    return counter, _current.set(counter)
+
+
+def end(token: Optional[contextvars.Token]) -> None:
+    if token is not None:
+        _current.reset(token)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+class QueryCountMiddleware:
+    """Adds X-DB-Query-Count to every HTTP response (enable with DEBUG_QUERY_COUNT)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter, token = begin()
+
+        async def send_with_count(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(HEADER, str(counter.count))
+                if counter.count > settings.DEBUG_QUERY_COUNT_WARN:
+                    logger.warning(f"{scope['method']} {scope['path']} ran {counter.count} SQL statements")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            end(token)
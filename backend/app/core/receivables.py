@@ -0,0 +1,217 @@
+"""
+Incremental maintenance of the client receivables ledger (client_receivables).
+
+Issue, payment, void and credit-note issuance call the helpers below inside the
+caller's transaction (next to the report rollups), so top-clients and aging
+reports read one row per client instead of the merchant's invoices.
+
+Aging buckets move with the calendar, not with events: an event files its
+amount in the bucket of the event day, and `reage` (nightly,
+scripts/age_receivables.py) recomputes open balance and buckets per client
+from the open invoices. Between two runs a bucket can lag by the days elapsed;
+totals are always exact.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.deltas import upsert_deltas
+from app.core.money import Number, cents, to_decimal
+from app.models.credit_note import CreditNote, CreditNoteStatus
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.receivable import ClientReceivable
+
+# (max days past due, column); not yet due counts as 0-30
+BUCKETS = (
+    (30, "aging_0_30"),
+    (60, "aging_31_60"),
+    (90, "aging_61_90"),
+    (None, "aging_90_plus"),
+)
+AGING_COLUMNS = tuple(col for _, col in BUCKETS)
+
+_MONEY_COLUMNS = ("invoiced_total", "credited_total", "open_balance", *AGING_COLUMNS)  # deltas in integer cents
+_SUM_COLUMNS = ("invoice_count", *_MONEY_COLUMNS)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def bucket_for(due: date, today: date) -> str:
+    days = (today - due).days
+    for limit, col in BUCKETS:
+        if limit is None or days <= limit:
+            return col
+    return AGING_COLUMNS[-1]
+
+
+def _delta(merchant_id: int, client_id: int, **amounts) -> dict:
+    row = {"merchant_id": merchant_id, "client_id": client_id, "last_invoice_date": None, "aged_on": None}
+    row.update(dict.fromkeys(_SUM_COLUMNS, 0))
+    row.update(amounts)
+    return row
+
+
+def _open_delta(merchant_id: int, client_id: int, due: date, amount: int, today: date, **amounts) -> dict:
+    return _delta(
+        merchant_id, client_id,
+        open_balance=amount, **{bucket_for(due, today): amount}, **amounts,
+    )
+
+
+def invoice_issued_deltas(
+    *,
+    merchant_id: int,
+    client_id: int | None,
+    issue_date: date,
+    due_date: date | None,
+    gross: Number,
+    due: Number,
+    today: date,
+) -> list[dict]:
+    """Ledger row (amounts in cents) contributed by one newly issued invoice (`due` = total due after advance)."""
+    if not client_id:
+        return []
+    return [_open_delta(
+        merchant_id, client_id, due_date or issue_date, cents(due), today,
+        invoice_count=1, invoiced_total=cents(gross),
+        last_invoice_date=issue_date, aged_on=today,
+    )]
+
+
+def apply_receivable_deltas(db: Session, deltas: Iterable[dict]) -> None:
+    """Merge deltas per (merchant, client) and upsert them in one statement."""
+    # GREATEST ignores NULLs; voids do not roll the date back
+    upsert_deltas(
+        db, ClientReceivable, ("merchant_id", "client_id"), _SUM_COLUMNS, deltas,
+        cents_cols=_MONEY_COLUMNS, greatest_cols=("last_invoice_date",),
+    )
+
+
+def _credited(db: Session, invoice_id: int) -> int:
+    """Issued credit notes of one invoice in cents (negative, as stored)."""
+    return cents(db.execute(
+        select(func.coalesce(func.sum(CreditNote.total_gross), 0)).where(
+            CreditNote.invoice_id == invoice_id,
+            CreditNote.status == CreditNoteStatus.issued,
+        )
+    ).scalar())
+
+
+def record_invoice_issued(db: Session, inv, today: date | None = None) -> None:
+    apply_receivable_deltas(db, invoice_issued_deltas(
+        merchant_id=inv.merchant_id,
+        client_id=inv.client_id,
+        issue_date=inv.issue_date,
+        due_date=inv.due_date,
+        gross=inv.total_gross,
+        due=inv.total_due,
+        today=today or _today(),
+    ))
+
+
+def record_invoice_status_change(db: Session, inv, old_status, new_status, today: date | None = None) -> None:
+    """
+    issued -> paid / void closes the invoice's open amount; void also removes it from the totals.
+    Only invoices without issued credit notes can be voided (invoices._set_invoice_status),
+    so credited_total never has to be taken back here.
+    """
+    if not inv.client_id or old_status != InvoiceStatus.issued:
+        return
+    today = today or _today()
+    still_open = cents(inv.total_due) + _credited(db, inv.id)
+    extra = {}
+    if new_status == InvoiceStatus.void:
+        extra = {"invoice_count": -1, "invoiced_total": -cents(inv.total_gross)}
+    apply_receivable_deltas(db, [_open_delta(
+        inv.merchant_id, inv.client_id, inv.due_date or inv.issue_date, -still_open, today, **extra,
+    )])
+
+
+def record_credit_note_issued(db: Session, cn, inv, today: date | None = None) -> None:
+    """Credit notes are stored negative: credited_total grows, the credited invoice's open amount shrinks."""
+    if not cn.client_id:
+        return
+    today = today or _today()
+    gross = cents(cn.total_gross)
+    if inv.status == InvoiceStatus.issued:
+        delta = _open_delta(cn.merchant_id, cn.client_id, inv.due_date or inv.issue_date, gross, today)
+    else:
+        delta = _delta(cn.merchant_id, cn.client_id)
+    delta["credited_total"] = -gross
+    apply_receivable_deltas(db, [delta])
+
+
+def reage(db: Session, merchant_id: int, today: date | None = None) -> int:
+    """
+    Recompute open balance and aging buckets of a merchant's ledger rows from its
+    open invoices as of `today`; returns the number of rows that changed.
+    The caller commits (one merchant per transaction keeps the locks short).
+    """
+    today = today or _today()
+
+    # lock first, aggregate second: a concurrent issue/payment either committed
+    # before the aggregate (and is in it) or applies its delta after this commit
+    current = {
+        r.client_id: r
+        for r in db.execute(
+            select(ClientReceivable.id, ClientReceivable.client_id, ClientReceivable.open_balance,
+                   *(ClientReceivable.__table__.c[col] for col in AGING_COLUMNS))
+            .where(ClientReceivable.merchant_id == merchant_id)
+            .order_by(ClientReceivable.client_id)
+            .with_for_update()
+        )
+    }
+    if not current:
+        return 0
+
+    credited = (
+        select(func.coalesce(func.sum(CreditNote.total_gross), 0))
+        .where(CreditNote.invoice_id == Invoice.id, CreditNote.status == CreditNoteStatus.issued)
+        .scalar_subquery()
+    )
+    amount = Invoice.total_due + credited
+    due = func.coalesce(Invoice.due_date, Invoice.issue_date)
+    bucket_sums = []
+    newer_than = None
+    for limit, col in BUCKETS:
+        cond = [due >= today - timedelta(days=limit)] if limit is not None else []
+        if newer_than is not None:
+            cond.append(due < newer_than)
+        bucket_sums.append(func.coalesce(func.sum(amount).filter(*cond), 0).label(col))
+        if limit is not None:
+            newer_than = today - timedelta(days=limit)
+
+    aged = {
+        r.client_id: r
+        for r in db.execute(
+            select(Invoice.client_id, func.sum(amount).label("open_balance"), *bucket_sums)
+            .where(
+                Invoice.merchant_id == merchant_id,
+                Invoice.status == InvoiceStatus.issued,
+                Invoice.client_id.is_not(None),
+            )
+            .group_by(Invoice.client_id)
+        )
+    }
+
+    columns = ("open_balance", *AGING_COLUMNS)
+    changes = []
+    for client_id, row in current.items():
+        fresh = aged.get(client_id)
+        values = {col: cents(getattr(fresh, col)) if fresh else 0 for col in columns}
+        if any(cents(getattr(row, col)) != values[col] for col in columns):
+            changes.append({"id": row.id, **{col: to_decimal(v) for col, v in values.items()}})
+
+    if changes:
+        db.execute(update(ClientReceivable), changes)
+    db.execute(
+        update(ClientReceivable)
+        .where(ClientReceivable.merchant_id == merchant_id)
+        .values(aged_on=today)
+        .execution_options(synchronize_session=False)
+    )
+    return len(changes)
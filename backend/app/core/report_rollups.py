@@ -0,0 +1,96 @@
+"""
+Incremental maintenance of the reports rollup (invoice_daily_rollups).
+
+Every state change of an issued document calls one of the helpers below inside
+the caller's transaction, so the /reports endpoints can answer from the rollup
+instead of scanning invoices.
+"""
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from app.core.deltas import upsert_deltas
+from app.core.money import Number, cents
+from app.models.report_rollup import InvoiceDailyRollup
+
+CREDITED = "credited"
+
+_KEY_COLUMNS = ("merchant_id", "day", "status")
+_SUM_COLUMNS = ("invoice_count", "net_total", "vat_total", "gross_total", "due_count", "due_gross")
+_MONEY_COLUMNS = ("net_total", "vat_total", "gross_total", "due_gross")  # deltas in integer cents
+
+
+def _status_value(status) -> str:
+    return getattr(status, "value", status) or ""
+
+
+def invoice_deltas(
+    *,
+    merchant_id: int,
+    status,
+    issue_date: date,
+    due_date: date | None,
+    net: Number,
+    vat: Number,
+    gross: Number,
+    sign: int = 1,
+) -> list[dict]:
+    """Rollup rows (amounts in cents) contributed by one invoice in `status` (sign=-1 removes them)."""
+    st = _status_value(status)
+    if st in ("", "draft"):
+        return []
+
+    rows = [{
+        "merchant_id": merchant_id, "day": issue_date, "status": st,
+        "invoice_count": sign, "net_total": sign * cents(net),
+        "vat_total": sign * cents(vat), "gross_total": sign * cents(gross),
+        "due_count": 0, "due_gross": 0,
+    }]
+    if due_date:
+        rows.append({
+            "merchant_id": merchant_id, "day": due_date, "status": st,
+            "invoice_count": 0, "net_total": 0, "vat_total": 0, "gross_total": 0,
+            "due_count": sign, "due_gross": sign * cents(gross),
+        })
+    return rows
+
+
+def _invoice_deltas(inv, status, sign: int) -> list[dict]:
+    return invoice_deltas(
+        merchant_id=inv.merchant_id,
+        status=status,
+        issue_date=inv.issue_date,
+        due_date=inv.due_date,
+        net=inv.subtotal_net,
+        vat=inv.vat_total,
+        gross=inv.total_gross,
+        sign=sign,
+    )
+
+
+def apply_rollup_deltas(db: Session, deltas: Iterable[dict]) -> None:
+    """Merge deltas per (merchant, day, status) and upsert them in one statement."""
+    upsert_deltas(db, InvoiceDailyRollup, _KEY_COLUMNS, _SUM_COLUMNS, deltas, cents_cols=_MONEY_COLUMNS)
+
+
+def record_invoice_issued(db: Session, inv) -> None:
+    apply_rollup_deltas(db, _invoice_deltas(inv, inv.status, +1))
+
+
+def record_invoice_status_change(db: Session, inv, old_status, new_status) -> None:
+    """Move an invoice's contribution from old_status to new_status (paid / void)."""
+    apply_rollup_deltas(
+        db,
+        _invoice_deltas(inv, old_status, -1) + _invoice_deltas(inv, new_status, +1),
+    )
+
+
+def record_credit_note_issued(db: Session, cn) -> None:
+    # credit note amounts are stored negative -> "credited" rows reduce revenue when summed
+    apply_rollup_deltas(db, [{
+        "merchant_id": cn.merchant_id, "day": cn.issue_date, "status": CREDITED,
+        "invoice_count": 1, "net_total": cents(cn.subtotal_net),
+        "vat_total": cents(cn.vat_total), "gross_total": cents(cn.total_gross),
+        "due_count": 0, "due_gross": 0,
+    }])
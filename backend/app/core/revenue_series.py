@@ -0,0 +1,196 @@
+"""
+Revenue time-series from the daily rollup (invoice_daily_rollups).
+
+The route reads one row per day with data (revenue net of credit notes,
+issued + paid invoice count) and this module turns them into a dense series:
+
+- buckets: day, ISO week, month, year, or custom N-day buckets from the range start
+- gap filling: every bucket of the range is returned, empty ones as zeros
+- comparison: the same buckets shifted to the previous period (same number of
+  buckets right before) or to the same period one year earlier
+
+Amounts are summed in integer cents. Custom buckets use NumPy (np.add.reduceat
+over a dense day array) when it is installed (`pip install .[analytics]`) and a
+plain Python pass otherwise; the result is the same.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from app.core.money import to_float
+
+try:
+    import numpy as np
+except ImportError:  # optional (analytics extra)
+    np = None
+
+GROUP_BYS = ("day", "week", "month", "year", "custom")
+COMPARES = ("previous", "year")
+MAX_BUCKETS = 5000
+
+
+@dataclass(frozen=True)
+class Series:
+    group_by: str
+    bucket_days: int
+    start: date
+    end: date  # inclusive
+
+
+def add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    year, month = d.year + y, m + 1
+    nxt = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return date(year, month, min(d.day, (nxt - timedelta(days=1)).day))
+
+
+def bucket_start(d: date, s: Series) -> date:
+    if s.group_by == "week":
+        return d - timedelta(days=d.weekday())  # ISO week starts on Monday
+    if s.group_by == "month":
+        return d.replace(day=1)
+    if s.group_by == "year":
+        return d.replace(month=1, day=1)
+    if s.group_by == "custom":
+        return s.start + timedelta(days=(d - s.start).days // s.bucket_days * s.bucket_days)
+    return d
+
+
+def shift(d: date, s: Series, buckets: int) -> date:
+    """`d` moved by a whole number of buckets (negative = back)."""
+    if s.group_by == "month":
+        return add_months(d, buckets)
+    if s.group_by == "year":
+        return add_months(d, 12 * buckets)
+    step = {"day": 1, "week": 7, "custom": s.bucket_days}[s.group_by]
+    return d + timedelta(days=step * buckets)
+
+
+def bucket_starts(s: Series) -> list[date]:
+    starts = []
+    b = bucket_start(s.start, s)
+    while b <= s.end:
+        starts.append(b)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"More than {MAX_BUCKETS} buckets; use a larger bucket or a shorter range")
+        b = shift(b, s, 1)
+    return starts
+
+
+def comparison(s: Series, compare: str) -> Series:
+    """The range the current one is compared to (same bucket layout)."""
+    if compare == "previous":
+        back = -len(bucket_starts(s))
+        return Series(s.group_by, s.bucket_days, shift(s.start, s, back), shift(s.end, s, back))
+    # same period one year earlier; weeks stay on weekdays (52 weeks)
+    if s.group_by == "week":
+        return Series(s.group_by, s.bucket_days, s.start - timedelta(weeks=52), s.end - timedelta(weeks=52))
+    return Series(s.group_by, s.bucket_days, add_months(s.start, -12), add_months(s.end, -12))
+
+
+def aggregate(daily: dict[date, tuple[int, int]], s: Series, starts: list[date]) -> list[tuple[int, int]]:
+    """(revenue cents, invoice count) per bucket of `starts`, zeros for empty buckets."""
+    if s.group_by == "custom" and np is not None:
+        return _aggregate_numpy(daily, s, starts)
+
+    out = [[0, 0] for _ in starts]
+    for day, (revenue, count) in daily.items():
+        if s.start <= day <= s.end:
+            acc = out[bisect_right(starts, day) - 1]
+            acc[0] += revenue
+            acc[1] += count
+    return [(r, c) for r, c in out]
+
+
+def _aggregate_numpy(daily: dict[date, tuple[int, int]], s: Series, starts: list[date]) -> list[tuple[int, int]]:
+    first = starts[0]
+    days = (s.end - first).days + 1
+    revenue = np.zeros(days, dtype=np.int64)
+    counts = np.zeros(days, dtype=np.int64)
+    for day, (r, c) in daily.items():
+        if s.start <= day <= s.end:
+            revenue[(day - first).days] = r
+            counts[(day - first).days] = c
+    offsets = np.array([(b - first).days for b in starts], dtype=np.int64)
+    return list(zip(np.add.reduceat(revenue, offsets).tolist(), np.add.reduceat(counts, offsets).tolist()))
+
+
+def label(b: date, s: Series) -> dict:
+    """Period fields of one bucket (same keys the revenue report always returned, plus start)."""
+    if s.group_by == "day":
+        return {"period": b.isoformat(), "start": b.isoformat()}
+    if s.group_by == "week":
+        iso = b.isocalendar()
+        return {"year": iso.year, "week": iso.week, "start": b.isoformat()}
+    if s.group_by == "month":
+        return {"year": b.year, "month": b.month, "start": b.isoformat()}
+    if s.group_by == "year":
+        return {"year": b.year, "start": b.isoformat()}
+    end = min(b + timedelta(days=s.bucket_days - 1), s.end)
+    return {"start": b.isoformat(), "end": end.isoformat()}
+
+
+def _values(revenue: int, count: int) -> dict:
+    return {
+        "total_revenue": to_float(revenue),
+        "invoice_count": count,
+        "avg_invoice": to_float(revenue) / count if count else 0.0,
+    }
+
+
+def _change_pct(current: int, previous: int) -> float | None:
+    if not previous:
+        return None
+    return round(100 * (current - previous) / abs(previous), 1)
+
+
+def build(
+    daily: dict[date, tuple[int, int]],
+    s: Series,
+    compare: str | None = None,
+    previous: Series | None = None,
+) -> dict:
+    """
+    Dense series for `s`; with `compare`, `daily` must also cover `previous`
+    (comparison(s, compare)) and every bucket gets the previous values.
+    """
+    starts = bucket_starts(s)
+    current = aggregate(daily, s, starts)
+    data = [{**label(b, s), **_values(r, c)} for b, (r, c) in zip(starts, current)]
+    total_r = sum(r for r, _ in current)
+    total_c = sum(c for _, c in current)
+    totals = _values(total_r, total_c)
+
+    if compare and previous is not None:
+        # bucket i is compared to bucket i (month lengths can make the counts differ by one)
+        prev = aggregate(daily, previous, bucket_starts(previous))[: len(starts)]
+        prev += [(0, 0)] * (len(starts) - len(prev))
+        for item, (r, c), (pr, pc) in zip(data, current, prev):
+            item.update(
+                previous_revenue=to_float(pr),
+                previous_invoice_count=pc,
+                change_pct=_change_pct(r, pr),
+            )
+        prev_r = sum(r for r, _ in prev)
+        totals.update(
+            previous_revenue=to_float(prev_r),
+            previous_invoice_count=sum(c for _, c in prev),
+            change_pct=_change_pct(total_r, prev_r),
+        )
+
+    out = {
+        "group_by": s.group_by,
+        "start_date": s.start.isoformat(),
+        "end_date": s.end.isoformat(),
+        "data": data,
+        "totals": totals,
+    }
+    if s.group_by == "custom":
+        out["bucket_days"] = s.bucket_days
+    if compare and previous is not None:
+        out.update(
+            compare=compare,
+            previous_start_date=previous.start.isoformat(),
+            previous_end_date=previous.end.isoformat(),
+        )
+    return out
@@ -0,0 +1,115 @@
+"""
+Server-side search over a merchant's clients and products (list pages, typeahead).
+
+Two index-backed access paths (migration n4o5p6q7r8s9):
+
+  prefix    lower(name) COLLATE "C" LIKE 'abc%'
+            -> btree (merchant_id, lower(name) COLLATE "C", id); the same index
+               gives the list order, so keyset pages are range scans
+  contains  lower(col) LIKE '%abc%' on any searched column
+            -> one pg_trgm GIN index per column (BitmapOr across columns)
+
+Terms shorter than 3 characters have no trigrams: they only match name prefixes.
+Rows are selected as columns (no ORM objects), the caller picks the projection.
+"""
+import base64
+from typing import Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, Select, and_, false, func, not_, or_, tuple_
+from sqlalchemy.orm import Session
+
+# shortest term the trigram indexes can answer
+MIN_CONTAINS_LEN = 3
+LOOKUP_LIMIT = 10
+
+_ESCAPE = "\\"
+
+
+def name_key(col) -> ColumnElement:
+    """Sort / prefix key; must match the btree index expression."""
+    return func.lower(col).collate("C")
+
+
+def _escape_like(term: str) -> str:
+    return term.replace(_ESCAPE, _ESCAPE * 2).replace("%", _ESCAPE + "%").replace("_", _ESCAPE + "_")
+
+
+def normalize_term(q: str | None) -> str:
+    return (q or "").strip().lower()
+
+
+def prefix_match(name_col, term: str) -> ColumnElement:
+    return name_key(name_col).like(_escape_like(term) + "%", escape=_ESCAPE)
+
+
+def contains_match(cols: Sequence, term: str) -> ColumnElement:
+    if len(term) < MIN_CONTAINS_LEN:
+        return false()
+    pattern = "%" + _escape_like(term) + "%"
+    return or_(*(func.lower(c).like(pattern, escape=_ESCAPE) for c in cols))
+
+
+def search_filter(name_col, cols: Sequence, term: str) -> ColumnElement:
+    return or_(prefix_match(name_col, term), contains_match(cols, term))
+
+
+def encode_cursor(key: str, row_id: int) -> str:
+    raw = f"{row_id}|{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        row_id, key = raw.split("|", 1)
+        return key, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def page(
+    db: Session,
+    stmt: Select,
+    name_col,
+    id_col,
+    limit: int,
+    cursor: str | None,
+) -> tuple[list, str | None]:
+    """
+    One keyset page of `stmt` ordered by (name_key, id); returns (rows, next cursor).
+    `stmt` must select name_key(name_col) labelled "sort_key".
+    """
+    key = name_key(name_col)
+    if cursor:
+        c_key, c_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(key, id_col) > tuple_(c_key, c_id))
+    rows = db.execute(stmt.order_by(key, id_col).limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].sort_key, rows[-1].id)
+    return rows, None
+
+
+def lookup(
+    db: Session,
+    stmt: Select,
+    name_col,
+    id_col,
+    cols: Sequence,
+    term: str,
+    limit: int = LOOKUP_LIMIT,
+) -> list:
+    """
+    Typeahead: name-prefix matches first (index range scan, usually enough),
+    then contains-matches on any searched column to fill the remaining slots.
+    """
+    key = name_key(name_col)
+    rows = db.execute(stmt.where(prefix_match(name_col, term)).order_by(key, id_col).limit(limit)).all()
+    if len(rows) < limit and len(term) >= MIN_CONTAINS_LEN:
+        rows += db.execute(
+            stmt.where(and_(contains_match(cols, term), not_(prefix_match(name_col, term))))
+            .order_by(key, id_col)
+            .limit(limit - len(rows))
+        ).all()
+    return rows
@@ -20,10 +20,14 @@ def verify_password(p: str, hashed: str) -> bool:
 def _now() -> datetime:
     return datetime.now(timezone.utc)
 
-def create_access_token(sub: str, role: str) -> str:
+def create_access_token(sub: str, role: str, uid: int | None = None, mid: int | None = None) -> str:
     now = _now()
     exp = now + timedelta(minutes=settings.ACCESS_TOKEN_MINUTES)
     payload = {"sub": sub, "role": role, "iss": settings.JWT_ISSUER, "exp": int(exp.timestamp())}
+    if uid is not None:
+        # ✅ user / merchant ids in the claims -> requests resolve the principal without a join
+        payload["uid"] = uid
+        payload["mid"] = mid
     return jwt.encode(payload, settings.JWT_SECRET, algorithm="HS256")
 
 def create_refresh_token() -> str:
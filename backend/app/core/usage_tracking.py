@@ -4,7 +4,10 @@ Provides functions for monitoring and incrementing document usage.
 """
 from datetime import datetime
 from typing import Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.subscription import Subscription, SubscriptionStatus, SubscriptionPlan
 from app.models.merchant import Merchant
@@ -90,18 +93,26 @@ def check_and_increment_usage(
         
     Note: We don't block creation, we just track and warn.
     Extra documents will be charged on monthly invoice.
+
+    The increment is one atomic UPDATE ... RETURNING in the caller's transaction
+    (no commit here): concurrent issuers never lose an increment, a rolled back
+    document is not counted, and a batch counts all its documents at once.
+    Call it right before the commit - the subscription row stays locked until then.
     """
     # Verify subscription is active or trialing
     if subscription.status not in [SubscriptionStatus.active, SubscriptionStatus.trialing]:
         # Could raise exception here if needed
         pass
     
-    # Get current status before increment
-    was_at_limit = subscription.invoices_used_this_month >= subscription.invoices_limit
-    
-    # Increment usage
-    subscription.invoices_used_this_month += document_count
-    db.commit()
+    used = db.execute(
+        update(Subscription)
+        .where(Subscription.id == subscription.id)
+        .values(invoices_used_this_month=Subscription.invoices_used_this_month + document_count)
+        .returning(Subscription.invoices_used_this_month)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    # the value from the database, without marking the object dirty (no second UPDATE on flush)
+    set_committed_value(subscription, "invoices_used_this_month", used)
     
     # Get new status after increment
     warning = get_usage_status(subscription)
@@ -112,6 +123,8 @@ def check_and_increment_usage(
 def get_subscription_for_merchant(db: Session, merchant: Merchant) -> Optional[Subscription]:
     """
     Get subscription for a merchant, creating free trial if needed.
+    The trial joins the caller's transaction (committed with it); concurrent
+    first requests of a merchant end up with the same row.
     """
     from datetime import timedelta
     
@@ -120,20 +133,27 @@ def get_subscription_for_merchant(db: Session, merchant: Merchant) -> Optional[S
     
     # Create free trial
     now = datetime.utcnow()
-    sub = Subscription(
-        merchant_id=merchant.id,
-        plan=SubscriptionPlan.free_trial,
-        status=SubscriptionStatus.trialing,
-        invoices_limit=25,
-        extra_invoice_price="0.50",
-        trial_start=now,
-        trial_end=now + timedelta(days=30),
-        current_period_start=now,
-        current_period_end=now + timedelta(days=30),
+    db.execute(
+        pg_insert(Subscription)
+        .values(
+            merchant_id=merchant.id,
+            plan=SubscriptionPlan.free_trial,
+            status=SubscriptionStatus.trialing,
+            invoices_limit=25,
+            invoices_used_this_month=0,
+            extra_invoice_price="0.50",
+            trial_start=now,
+            trial_end=now + timedelta(days=30),
+            current_period_start=now,
+            current_period_end=now + timedelta(days=30),
+            cancel_at_period_end=False,
+            created_at=now,
+            updated_at=now,
+        )
+        .on_conflict_do_nothing(index_elements=[Subscription.merchant_id])
     )
-    db.add(sub)
-    db.commit()
-    db.refresh(sub)
+    sub = db.execute(select(Subscription).where(Subscription.merchant_id == merchant.id)).scalar_one()
+    set_committed_value(merchant, "subscription", sub)
     return sub
 
 
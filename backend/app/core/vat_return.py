@@ -0,0 +1,283 @@
+"""
+VAT return (declaration) for a period, from the monthly per-rate aggregate.
+
+Maintenance: issuance, void and credit-note issuance call the record_* helpers
+inside the caller's transaction (next to the report rollups); the amounts are
+the document's stored vat_breakdown, so the return shows exactly what the PDFs
+show and never reads items.
+
+Report: a period ("2026-Q3", "2026-07", "2026") is a range of months; the grid
+has one row per VAT rate (the country's presets always listed, other rates
+flagged as non-standard) with invoices, credit notes and the net of both.
+Exports stream CSV / XML; the per-document journal is streamed from the
+documents' breakdowns with its own session (the request one is closed once
+streaming starts).
+"""
+import csv
+import io
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import AsyncIterator, Iterable
+from xml.sax.saxutils import escape, quoteattr
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.countries import COUNTRY_RULES, CountryCode
+from app.core.deltas import upsert_deltas
+from app.core.money import basis_points, cents, rate_key, to_float
+from app.core.product_sales import month_of
+from app.db.session import AsyncSessionLocal
+from app.models.credit_note import CreditNote, CreditNoteStatus
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.vat_rollup import VatRateMonthly
+
+INVOICE = "invoice"
+CREDIT_NOTE = "credit_note"
+
+_SUM_COLUMNS = ("invoice_base", "invoice_vat", "credit_base", "credit_vat")
+_PREFIX = {INVOICE: "invoice", CREDIT_NOTE: "credit"}
+
+_STREAM_BATCH = 500
+
+
+# --- maintenance -------------------------------------------------------------
+
+def breakdown_deltas(merchant_id: int, day: date, breakdown: dict, kind: str, sign: int = 1) -> list[dict]:
+    """Aggregate rows (amounts in cents) of one document's {"21": {"base": .., "vat": ..}} breakdown."""
+    prefix = _PREFIX[kind]
+    rows = []
+    for key, amounts in (breakdown or {}).items():
+        row = {"merchant_id": merchant_id, "month": month_of(day), "rate_bp": basis_points(key)}
+        row.update(dict.fromkeys(_SUM_COLUMNS, 0))
+        row[f"{prefix}_base"] = sign * cents(amounts.get("base"))
+        row[f"{prefix}_vat"] = sign * cents(amounts.get("vat"))
+        rows.append(row)
+    return rows
+
+
+def apply_vat_deltas(db: Session, deltas: Iterable[dict]) -> None:
+    """Merge deltas per (merchant, month, rate) and upsert them in one statement."""
+    upsert_deltas(
+        db, VatRateMonthly, ("merchant_id", "month", "rate_bp"), _SUM_COLUMNS, deltas,
+        cents_cols=_SUM_COLUMNS,
+    )
+
+
+def record_invoice_issued(db: Session, inv) -> None:
+    apply_vat_deltas(db, breakdown_deltas(inv.merchant_id, inv.issue_date, inv.vat_breakdown, INVOICE))
+
+
+def record_invoice_status_change(db: Session, inv, old_status, new_status) -> None:
+    """
+    Voiding an issued invoice takes it out of its month (paid changes nothing). Credited
+    invoices cannot be voided (invoices._set_invoice_status), so no credit note's
+    negative base / VAT is left in the grid.
+    """
+    if old_status != InvoiceStatus.issued or new_status != InvoiceStatus.void:
+        return
+    apply_vat_deltas(db, breakdown_deltas(inv.merchant_id, inv.issue_date, inv.vat_breakdown, INVOICE, sign=-1))
+
+
+def record_credit_note_issued(db: Session, cn) -> None:
+    apply_vat_deltas(db, breakdown_deltas(cn.merchant_id, cn.issue_date, cn.vat_breakdown, CREDIT_NOTE))
+
+
+# --- report ------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Period:
+    label: str
+    start: date
+    end: date  # inclusive
+
+    @property
+    def first_month(self) -> date:
+        return month_of(self.start)
+
+    @property
+    def last_month(self) -> date:
+        return month_of(self.end)
+
+
+_PERIOD_RE = re.compile(r"^(\d{4})(?:-(?:Q([1-4])|(\d{2})))?$")
+
+
+def _month_end(year: int, month: int) -> date:
+    nxt = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return nxt - timedelta(days=1)
+
+
+def parse_period(value: str) -> Period:
+    """"2026-Q3" (quarter), "2026-07" (month) or "2026" (year); ValueError otherwise."""
+    m = _PERIOD_RE.match((value or "").strip().upper())
+    if not m:
+        raise ValueError("period must look like 2026-Q3, 2026-07 or 2026")
+    year = int(m.group(1))
+    if m.group(2):
+        first = 3 * int(m.group(2)) - 2
+        return Period(f"{year}-Q{m.group(2)}", date(year, first, 1), _month_end(year, first + 2))
+    if m.group(3):
+        month = int(m.group(3))
+        if not 1 <= month <= 12:
+            raise ValueError("month must be 01-12")
+        return Period(f"{year}-{month:02d}", date(year, month, 1), _month_end(year, month))
+    return Period(str(year), date(year, 1, 1), date(year, 12, 31))
+
+
+def grid_query(merchant_id: int, period: Period):
+    """One row per rate with the period's sums (served by the unique (merchant, month, rate) index)."""
+    return (
+        select(
+            VatRateMonthly.rate_bp,
+            *(func.sum(VatRateMonthly.__table__.c[col]).label(col) for col in _SUM_COLUMNS),
+        )
+        .where(
+            VatRateMonthly.merchant_id == merchant_id,
+            VatRateMonthly.month >= period.first_month,
+            VatRateMonthly.month <= period.last_month,
+        )
+        .group_by(VatRateMonthly.rate_bp)
+    )
+
+
+def _amounts(base: int, vat: int) -> dict:
+    return {"base": to_float(base), "vat": to_float(vat)}
+
+
+def build_return(country: CountryCode, period: Period, rows: Iterable) -> dict:
+    """Per-rate grid (country presets first-class) plus totals; `rows` come from grid_query."""
+    presets = {basis_points(p) for p in COUNTRY_RULES[country]["vat_presets"]}
+    grid: dict[int, list[int]] = {bp: [0, 0, 0, 0] for bp in presets}
+    for r in rows:
+        acc = grid.setdefault(r.rate_bp, [0, 0, 0, 0])
+        for i, col in enumerate(_SUM_COLUMNS):
+            acc[i] += cents(getattr(r, col))
+
+    totals = [0, 0, 0, 0]
+    rates = []
+    for rate_bp in sorted(grid):
+        inv_base, inv_vat, cn_base, cn_vat = grid[rate_bp]
+        for i, v in enumerate(grid[rate_bp]):
+            totals[i] += v
+        rates.append({
+            "rate": rate_key(rate_bp),
+            "standard": rate_bp in presets,
+            "invoices": _amounts(inv_base, inv_vat),
+            "credit_notes": _amounts(cn_base, cn_vat),
+            "net": _amounts(inv_base + cn_base, inv_vat + cn_vat),
+        })
+
+    return {
+        "country": country.value,
+        "period": period.label,
+        "start_date": period.start.isoformat(),
+        "end_date": period.end.isoformat(),
+        "currency": "EUR",  # documents are EUR only
+        "rates": rates,
+        "totals": {
+            "invoices": _amounts(totals[0], totals[1]),
+            "credit_notes": _amounts(totals[2], totals[3]),
+            "net": _amounts(totals[0] + totals[2], totals[1] + totals[3]),
+        },
+    }
+
+
+async def iter_documents(merchant_id: int, period: Period) -> AsyncIterator[tuple]:
+    """
+    Journal lines (doc_type, number, issue_date, client_name, client_tax_id, rate_bp, base, vat),
+    one per document and rate, amounts in cents; the documents the aggregate counts, by date.
+    """
+    queries = (
+        (INVOICE, select(
+            Invoice.invoice_no, Invoice.issue_date, Invoice.client_name, Invoice.client_tax_id, Invoice.vat_breakdown,
+        ).where(
+            Invoice.merchant_id == merchant_id,
+            Invoice.status.in_((InvoiceStatus.issued, InvoiceStatus.paid)),
+            Invoice.issue_date >= period.start,
+            Invoice.issue_date <= period.end,
+        ).order_by(Invoice.issue_date, Invoice.id)),
+        (CREDIT_NOTE, select(
+            CreditNote.credit_note_no, CreditNote.issue_date, CreditNote.client_name, CreditNote.client_tax_id,
+            CreditNote.vat_breakdown,
+        ).where(
+            CreditNote.merchant_id == merchant_id,
+            CreditNote.status == CreditNoteStatus.issued,
+            CreditNote.issue_date >= period.start,
+            CreditNote.issue_date <= period.end,
+        ).order_by(CreditNote.issue_date, CreditNote.id)),
+    )
+    async with AsyncSessionLocal() as db:
+        for kind, stmt in queries:
+            result = await db.stream(stmt.execution_options(yield_per=_STREAM_BATCH))
+            async for number, issue_date, client_name, client_tax_id, breakdown in result:
+                for key, amounts in sorted((breakdown or {}).items(), key=lambda kv: basis_points(kv[0])):
+                    yield (
+                        kind, number, issue_date, client_name, client_tax_id,
+                        basis_points(key), cents(amounts.get("base")), cents(amounts.get("vat")),
+                    )
+
+
+def _csv_line(values: list) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+
+async def iter_csv(report: dict, documents: AsyncIterator[tuple] | None = None) -> AsyncIterator[str]:
+    """The grid as CSV, or the journal when `documents` is given."""
+    if documents is None:
+        yield _csv_line(["period", "country", "rate", "standard", "invoice_base", "invoice_vat",
+                         "credit_note_base", "credit_note_vat", "net_base", "net_vat"])
+        for r in report["rates"] + [{"rate": "total", "standard": "", **report["totals"]}]:
+            yield _csv_line([
+                report["period"], report["country"], r["rate"], r["standard"],
+                r["invoices"]["base"], r["invoices"]["vat"],
+                r["credit_notes"]["base"], r["credit_notes"]["vat"],
+                r["net"]["base"], r["net"]["vat"],
+            ])
+        return
+
+    yield _csv_line(["doc_type", "number", "issue_date", "client_name", "client_tax_id", "rate", "base", "vat"])
+    async for kind, number, issue_date, client_name, client_tax_id, rate_bp, base, vat in documents:
+        yield _csv_line([
+            kind, number, issue_date.isoformat(), client_name, client_tax_id,
+            rate_key(rate_bp), to_float(base), to_float(vat),
+        ])
+
+
+def _xml_amounts(tag: str, amounts: dict) -> str:
+    return f'<{tag} base="{amounts["base"]:.2f}" vat="{amounts["vat"]:.2f}"/>'
+
+
+async def iter_xml(report: dict, documents: AsyncIterator[tuple] | None = None) -> AsyncIterator[str]:
+    """The grid as XML, followed by a <Documents> journal when `documents` is given."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield (
+        f'<VatReturn country={quoteattr(report["country"])} period={quoteattr(report["period"])} '
+        f'start={quoteattr(report["start_date"])} end={quoteattr(report["end_date"])} '
+        f'currency={quoteattr(report["currency"])}>\n'
+    )
+    for r in report["rates"]:
+        yield (
+            f'  <Rate value={quoteattr(r["rate"])} standard="{str(r["standard"]).lower()}">'
+            f'{_xml_amounts("Invoices", r["invoices"])}{_xml_amounts("CreditNotes", r["credit_notes"])}'
+            f'{_xml_amounts("Net", r["net"])}</Rate>\n'
+        )
+    t = report["totals"]
+    yield (
+        f'  <Totals>{_xml_amounts("Invoices", t["invoices"])}{_xml_amounts("CreditNotes", t["credit_notes"])}'
+        f'{_xml_amounts("Net", t["net"])}</Totals>\n'
+    )
+
+    if documents is not None:
+        yield "  <Documents>\n"
+        async for kind, number, issue_date, client_name, client_tax_id, rate_bp, base, vat in documents:
+            yield (
+                f'    <Line type={quoteattr(kind)} number={quoteattr(number or "")} date="{issue_date.isoformat()}" '
+                f'rate={quoteattr(rate_key(rate_bp))} base="{to_float(base):.2f}" vat="{to_float(vat):.2f}">'
+                f'<Client taxId={quoteattr(client_tax_id or "")}>{escape(client_name or "")}</Client></Line>\n'
+            )
+        yield "  </Documents>\n"
+    yield "</VatReturn>\n"
@@ -1,16 +1,88 @@
-from sqlalchemy import create_engine
+import logging
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.profiling import current_request
 import os
 print("DATABASE_URL =", os.getenv("DATABASE_URL"))
 
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+def _connect_args() -> dict:
+    # statement_timeout is set per connection so a runaway report cannot hold a pool slot forever
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _async_database_url(url: str) -> str:
+    # postgresql:// / postgresql+psycopg2:// -> postgresql+psycopg:// (psycopg3 has a native async driver)
+    u = make_url(url)
+    if u.drivername in ("postgresql", "postgres", "postgresql+psycopg2"):
+        u = u.set(drivername="postgresql+psycopg")
+    return u.render_as_string(hide_password=False)
+
+
+_pool_kwargs = dict(
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    connect_args=_connect_args(),
+)
+
+engine = create_engine(settings.DATABASE_URL, **_pool_kwargs)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# ✅ async layer for `async def` routes (reports, preferences, health) -> no blocking on the event loop
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL), **_pool_kwargs)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+slow_query_logger = logging.getLogger("app.db.slow_query")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    if elapsed_ms < settings.DB_SLOW_QUERY_MS:
+        return
+    # parameters are not logged (client data)
+    req = current_request()
+    slow_query_logger.warning(
+        "slow query %.0f ms route=%s merchant=%s%s: %s",
+        elapsed_ms,
+        f"{req.method} {req.route}" if req else "-",
+        req.merchant_id if req and req.merchant_id is not None else "-",
+        " (executemany)" if executemany else "",
+        " ".join(statement.split())[:2000],
+    )
+
+
+# ✅ opt-in: log statements slower than DB_SLOW_QUERY_MS with the route / merchant that ran them
+if settings.DB_SLOW_QUERY_MS > 0:
+    for _engine in (engine, async_engine.sync_engine):
+        event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -4,3 +4,5 @@ from . import credit_note, credit_note_item  # noqa: F401
 from . import preferences  # noqa: F401
 from . import supplier  # noqa: F401
 from . import subscription  # noqa: F401
+from . import report_rollup, receivable, product_sales, vat_rollup  # noqa: F401
+from . import email_outbox  # noqa: F401
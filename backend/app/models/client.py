@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, func
 from app.db.base import Base
 
 class Client(Base):
@@ -12,3 +12,15 @@ class Client(Base):
     tax_id = Column(String(50), nullable=True)
     address = Column(String(500), nullable=True)
     peppol_id = Column(String(100), nullable=True)  # PEPPOL ID pentru client
+
+    __table_args__ = (
+        # ✅ list order + name prefix search (app.core.search)
+        Index("ix_clients_merchant_name_key", merchant_id, func.lower(name).collate("C"), id),
+        # ✅ contains search (pg_trgm)
+        Index("ix_clients_name_trgm", func.lower(name).label("lower_name"),
+              postgresql_using="gin", postgresql_ops={"lower_name": "gin_trgm_ops"}),
+        Index("ix_clients_email_trgm", func.lower(email).label("lower_email"),
+              postgresql_using="gin", postgresql_ops={"lower_email": "gin_trgm_ops"}),
+        Index("ix_clients_tax_id_trgm", func.lower(tax_id).label("lower_tax_id"),
+              postgresql_using="gin", postgresql_ops={"lower_tax_id": "gin_trgm_ops"}),
+    )
@@ -11,7 +11,7 @@ class CreditNoteItem(Base):
 
     credit_note_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("credit_notes.id", ondelete="CASCADE"),
-        nullable=False, index=True
+        nullable=False
     )
 
     item_code: Mapped[str] = mapped_column(String(64), nullable=False, default="")
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import String, Integer, DateTime, LargeBinary, Text, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class EmailOutbox(Base):
+    """
+    Durable outbound email queue.
+
+    Requests only insert a row (fully rendered MIME message) in their own transaction;
+    app.core.email_queue delivers it over pooled SMTP connections, with retry/backoff.
+    state: pending -> sending -> sent | failed (pending again on a transient error)
+    """
+    __tablename__ = "email_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    state: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    to_email: Mapped[str] = mapped_column(String(320), nullable=False)
+    to_domain: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    from_email: Mapped[str] = mapped_column(String(320), nullable=False)
+    subject: Mapped[str] = mapped_column(String(512), nullable=False, default="")
+    message: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    # what the email is about (e.g. "invoice", 42) -> delivery can be reflected on the document
+    ref_type: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    ref_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_state_next_attempt", "state", "next_attempt_at"),
+    )
@@ -3,10 +3,10 @@ from datetime import date, datetime
 
 from sqlalchemy import (
     String, Integer, Date, DateTime, Enum, ForeignKey,
-    Numeric, Index
+    Numeric, Index, JSON
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from app.db.base import Base
 
@@ -83,6 +83,12 @@ class Invoice(Base):
     vat_total: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
     total_gross: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
 
+    # ✅ calculate o singură dată la scriere (app.core.money), citite direct în detail / PDF
+    subtotal_net_before: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    discount_amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    total_due: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    vat_breakdown: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)  # {"21": {"base": .., "vat": ..}}
+
     notes: Mapped[str] = mapped_column(String(1024), nullable=False, default="")
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -92,7 +98,8 @@ class Invoice(Base):
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
 
     __table_args__ = (
-        Index("ix_invoices_merchant_status", "merchant_id", "status"),
+        # status-filtered lists / last issued document, newest first
+        Index("ix_invoices_merchant_status_issue_date", "merchant_id", "status", text("issue_date DESC"), text("id DESC")),
         Index("ix_invoices_merchant_issue_date", "merchant_id", "issue_date"),
         Index("ix_invoices_merchant_year_number", "merchant_id", "year", "number"),
     )
@@ -11,7 +11,13 @@ class InvoiceItem(Base):
 
     invoice_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("invoices.id", ondelete="CASCADE"),
-        nullable=False, index=True
+        nullable=False
+    )
+
+    # ✅ produsul din dropdown (NULL = linie liberă); product sales analytics
+    product_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("products.id", ondelete="SET NULL"),
+        nullable=True, index=True
     )
 
     item_code: Mapped[str] = mapped_column(String(64), nullable=False, default="")
@@ -1,4 +1,6 @@
-from sqlalchemy import Integer, String, UniqueConstraint, Index
+from datetime import date
+
+from sqlalchemy import Date, Integer, String, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
@@ -12,6 +14,8 @@ class InvoiceSequence(Base):
     year: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     doc_type: Mapped[str] = mapped_column(String(32), nullable=False, default="invoice")
     next_number: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    # latest issue date among this row's numbered documents (chronological numbering check)
+    last_issued_date: Mapped[date | None] = mapped_column(Date, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("merchant_id", "year", "doc_type", name="uq_invoice_seq"),
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Index, func
 from app.db.base import Base
 
 class Product(Base):
@@ -13,3 +13,15 @@ class Product(Base):
 
     unit_price = Column(Numeric(10, 2), nullable=False)
     vat_rate = Column(Numeric(5, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        # ✅ CSV import upsert: ON CONFLICT (merchant_id, code)
+        Index("uq_products_merchant_code", "merchant_id", "code", unique=True),
+        # ✅ list order + name prefix search (app.core.search)
+        Index("ix_products_merchant_name_key", merchant_id, func.lower(name).collate("C"), id),
+        # ✅ contains search (pg_trgm)
+        Index("ix_products_name_trgm", func.lower(name).label("lower_name"),
+              postgresql_using="gin", postgresql_ops={"lower_name": "gin_trgm_ops"}),
+        Index("ix_products_code_trgm", func.lower(code).label("lower_code"),
+              postgresql_using="gin", postgresql_ops={"lower_code": "gin_trgm_ops"}),
+    )
@@ -0,0 +1,38 @@
+from datetime import date
+
+from sqlalchemy import Integer, Date, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ProductSalesMonthly(Base):
+    """
+    Per-merchant, per-product monthly sales from invoice items with a product_id.
+
+    - month is the first day of the issue month
+    - issued invoices add their lines; voiding an issued invoice removes them,
+      credit notes remove them in the credit note's month (quantities included)
+    - net_total / vat_total are line amounts after the invoice discount
+    Drafts are never recorded. Maintained by app.core.product_sales.
+    """
+    __tablename__ = "product_sales_monthly"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    merchant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("merchants.id", ondelete="CASCADE"), nullable=False
+    )
+    product_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    month: Mapped[date] = mapped_column(Date, nullable=False)
+
+    line_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    quantity: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    net_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    vat_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("merchant_id", "month", "product_id", name="uq_product_sales_monthly"),
+    )
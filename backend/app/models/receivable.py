@@ -0,0 +1,47 @@
+from datetime import date
+
+from sqlalchemy import Integer, Date, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ClientReceivable(Base):
+    """
+    Per-client receivables ledger, one row per (merchant, client).
+
+    - invoice_count / invoiced_total: issued + paid invoices (void ones are removed)
+    - credited_total: issued credit notes, as a positive amount
+    - open_balance: what is still owed on issued (unpaid) invoices, net of their
+      credit notes; split by days past due (due date, else issue date) into the
+      aging_* buckets, not-yet-due amounts count as 0-30
+    - aged_on: day the buckets were last recomputed (nightly, scripts/age_receivables.py)
+    Invoices without a client are not tracked. Maintained by app.core.receivables.
+    """
+    __tablename__ = "client_receivables"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    merchant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("merchants.id", ondelete="CASCADE"), nullable=False
+    )
+    client_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+
+    invoice_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    invoiced_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    credited_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    open_balance: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    aging_0_30: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    aging_31_60: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    aging_61_90: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    aging_90_plus: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    last_invoice_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    aged_on: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("merchant_id", "client_id", name="uq_client_receivable"),
+    )
@@ -0,0 +1,38 @@
+from datetime import date
+
+from sqlalchemy import String, Integer, Date, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class InvoiceDailyRollup(Base):
+    """
+    Per-merchant daily totals for issued documents, keyed by (merchant, day, status).
+
+    - invoice_count / net_total / vat_total / gross_total are bucketed by issue_date
+    - due_count / due_gross are bucketed by due_date (so "overdue" = status issued + day < today)
+    - status "credited" holds issued credit notes (negative amounts)
+    Drafts are never recorded. Maintained by app.core.report_rollups.
+    """
+    __tablename__ = "invoice_daily_rollups"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    merchant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("merchants.id", ondelete="CASCADE"), nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+
+    invoice_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    net_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    vat_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    gross_total: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    due_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    due_gross: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("merchant_id", "day", "status", name="uq_invoice_daily_rollup"),
+    )
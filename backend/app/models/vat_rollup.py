@@ -0,0 +1,36 @@
+from datetime import date
+
+from sqlalchemy import Integer, Date, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class VatRateMonthly(Base):
+    """
+    Per-merchant monthly VAT grid, keyed by (merchant, month, rate).
+
+    - rate_bp: VAT rate in basis points (21 % -> 2100), as in app.core.money
+    - invoice_*: issued / paid invoices by issue month (voiding an issued one removes it)
+    - credit_*: issued credit notes by issue month (negative amounts, as stored)
+    Filled from the documents' stored vat_breakdown; drafts are never recorded.
+    Maintained by app.core.vat_return.
+    """
+    __tablename__ = "vat_rate_monthly"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    merchant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("merchants.id", ondelete="CASCADE"), nullable=False
+    )
+    month: Mapped[date] = mapped_column(Date, nullable=False)
+    rate_bp: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    invoice_base: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    invoice_vat: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    credit_base: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    credit_vat: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("merchant_id", "month", "rate_bp", name="uq_vat_rate_monthly"),
+    )
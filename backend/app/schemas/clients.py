@@ -19,3 +19,12 @@ class ClientOut(ClientBase):
 
     class Config:
         from_attributes = True
+
+class ClientLookupOut(BaseModel):
+    id: int
+    name: str
+    email: Optional[str] = None
+    tax_id: Optional[str] = None
+
+    class Config:
+        from_attributes = True
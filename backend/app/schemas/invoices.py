@@ -54,6 +54,11 @@ class InvoiceCreateIn(BaseModel):
     issue_now: bool = True
 
 
+class InvoiceBatchIn(BaseModel):
+    # ✅ import POS / integrări: multe facturi într-un singur apel
+    invoices: List[InvoiceCreateIn] = Field(..., min_length=1, max_length=500)
+
+
 class VatBreakdownRow(BaseModel):
     base: float
     vat: float
@@ -0,0 +1,24 @@
+"""
+Standalone outbound email worker (drains email_outbox).
+
+    python -m app.scripts.email_worker
+
+Set EMAIL_QUEUE_EMBEDDED_WORKER=false on the API when running this separately.
+"""
+import logging
+import signal
+import threading
+
+from app.core.email_queue import EmailQueueWorker
+
+
+def run():
+    logging.basicConfig(level=logging.INFO)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    EmailQueueWorker().run_forever(stop)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,12 +1,32 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api import api_router
+from app.db.session import engine, async_engine
+from app.core.pdf_assets import register_fonts
+from app.core.pdf_export import shutdown_pool
+from app.core.email_queue import start_embedded_worker, stop_embedded_worker
+from app.core import metrics, profiling, query_counter
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # parse the PDF fonts once, not on every render
+    register_fonts()
+    start_embedded_worker()
+    yield
+    stop_embedded_worker()
+    shutdown_pool()
+    # close pooled connections on shutdown
+    await async_engine.dispose()
+    engine.dispose()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="ACONT API", version="0.1.0")
+    app = FastAPI(title="ACONT API", version="0.1.0", lifespan=lifespan)
 
     # ✅ Static mount ( "static" folder  in backend root)
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -17,8 +37,24 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", query_counter.HEADER],
     )
 
+    if settings.METRICS_ENABLED or settings.DEBUG_QUERY_COUNT:
+        query_counter.install(engine, async_engine.sync_engine)
+
+    # ✅ debug: SQL statements per request in a response header (spot N+1 queries)
+    if settings.DEBUG_QUERY_COUNT:
+        app.add_middleware(query_counter.QueryCountMiddleware)
+
+    # ✅ Prometheus metrics (latency per route, in-flight, DB per request) -> GET /metrics
+    if settings.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    # ✅ request context (route / merchant) for the slow-query log and the admin profiler
+    if settings.DB_SLOW_QUERY_MS > 0 or settings.PROFILING_ENABLED:
+        app.add_middleware(profiling.ProfilingMiddleware)
+
     app.include_router(api_router)
     return app
 
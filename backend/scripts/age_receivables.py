@@ -0,0 +1,48 @@
+"""
+Nightly aging of the client receivables ledger (app.core.receivables.reage).
+
+Moves open balances between the 0-30 / 31-60 / 61-90 / 90+ buckets as days pass
+(and corrects any drift of open_balance), one merchant per transaction.
+Run once a day after midnight UTC, e.g. from cron:
+
+    5 0 * * *  cd /app/backend && python -m scripts.age_receivables
+
+    python -m scripts.age_receivables --merchant 42 --date 2026-10-17
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import select
+
+from app.core import receivables
+from app.db.session import SessionLocal
+from app.models.receivable import ClientReceivable
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--merchant", type=int, help="only this merchant")
+    ap.add_argument("--date", type=date.fromisoformat, help="age as of this day (default: today, UTC)")
+    args = ap.parse_args()
+
+    with SessionLocal() as db:
+        if args.merchant:
+            merchant_ids = [args.merchant]
+        else:
+            merchant_ids = db.execute(
+                select(ClientReceivable.merchant_id).distinct().order_by(ClientReceivable.merchant_id)
+            ).scalars().all()
+
+    started = time.perf_counter()
+    changed = 0
+    for merchant_id in merchant_ids:
+        with SessionLocal() as db:
+            changed += receivables.reage(db, merchant_id, today=args.date)
+            db.commit()
+
+    print(f"aged {len(merchant_ids)} merchants, {changed} client rows changed in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency check for the client typeahead (/clients/lookup, app.core.search).
+
+Copies the clients table definition with its indexes into a temporary table,
+seeds --clients rows for one merchant (plus --others rows spread over other
+merchants), then times search.lookup() for a mix of short prefixes, longer
+prefixes and contains-terms (email domain part, tax id digits).
+
+Nothing is written to the real tables (temporary table, rolled back at the end).
+Exits with status 1 when the p95 is above --max-ms.
+
+    python -m scripts.bench_client_lookup --clients 100000 --max-ms 10
+"""
+import argparse
+import random
+import sys
+import time
+
+from sqlalchemy import column, select, table, text
+
+from app.core import search
+from app.db.session import SessionLocal
+
+MERCHANT_ID = 1
+_TERMS = ("a", "ma", "mar", "marti", "srl", "gmail", "be0", "4567", "zzzq", "vande")
+
+
+def _seed(db, clients: int, others: int) -> None:
+    db.execute(text("CREATE TEMP TABLE bench_clients (LIKE clients INCLUDING DEFAULTS INCLUDING INDEXES)"))
+    db.execute(
+        text(
+            """
+            INSERT INTO bench_clients (id, merchant_id, name, email, tax_id)
+            SELECT g,
+                   CASE WHEN g <= :clients THEN :m ELSE 2 + g % 500 END,
+                   (ARRAY['Martin', 'Maes', 'Peeters', 'Janssens', 'Vandenberghe', 'Dubois', 'Lambert'])[1 + g % 7]
+                       || ' ' || (ARRAY['SRL', 'BV', 'NV', 'SA', 'Consulting', 'Bouw'])[1 + (g / 7) % 6] || ' ' || g,
+                   'contact' || g || (ARRAY['@gmail.com', '@proximus.be', '@telenet.be'])[1 + g % 3],
+                   'BE0' || lpad((g * 7919 % 1000000000)::text, 9, '0')
+            FROM generate_series(1, :clients + :others) AS g
+            """
+        ),
+        {"clients": clients, "others": others, "m": MERCHANT_ID},
+    )
+    db.execute(text("ANALYZE bench_clients"))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--clients", type=int, default=100_000)
+    ap.add_argument("--others", type=int, default=400_000, help="rows of other merchants")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--max-ms", type=float, default=10.0)
+    args = ap.parse_args()
+
+    t = table("bench_clients", column("id"), column("merchant_id"), column("name"), column("email"), column("tax_id"))
+    searched = (t.c.name, t.c.email, t.c.tax_id)
+    stmt = select(t.c.id, t.c.name, t.c.email, t.c.tax_id).where(t.c.merchant_id == MERCHANT_ID)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        _seed(db, args.clients, args.others)
+        print(f"seeded {args.clients + args.others} rows in {time.perf_counter() - started:.1f}s")
+
+        rnd = random.Random(0)
+        timings: dict[str, list[float]] = {term: [] for term in _TERMS}
+        for _ in range(args.rounds):
+            for term in rnd.sample(_TERMS, len(_TERMS)):
+                started = time.perf_counter()
+                rows = search.lookup(db, stmt, t.c.name, t.c.id, searched, term)
+                timings[term].append((time.perf_counter() - started) * 1000)
+                assert len(rows) <= search.LOOKUP_LIMIT
+
+        every = sorted(ms for values in timings.values() for ms in values)
+        for term, values in timings.items():
+            values.sort()
+            print(f"{term!r:>10}  p50={values[len(values) // 2]:.2f}ms  max={values[-1]:.2f}ms")
+        p95 = every[int(len(every) * 0.95)]
+        print(f"all terms  p50={every[len(every) // 2]:.2f}ms  p95={p95:.2f}ms")
+    finally:
+        db.rollback()
+        db.close()
+
+    if p95 > args.max_ms:
+        print(f"p95 {p95:.2f}ms > {args.max_ms}ms", file=sys.stderr)
+        raise SystemExit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Concurrency stress benchmark for document numbering (app.core.numbering).
+
+Runs N concurrent "issuance" transactions for one merchant against the real
+database, in two modes:
+
+  locked  the old flow: SELECT ... FOR UPDATE on the sequence first, then the
+          rest of the request (simulated with --work-ms), then the rollup
+          upsert, then commit
+  upsert  the current flow: the rest of the request first (unlocked), then the
+          hot rows as issuance takes them: the daily rollup upsert, then one
+          INSERT ... ON CONFLICT DO UPDATE ... RETURNING on the sequence, then commit
+
+Both modes lock the same invoice_daily_rollups row the real path does (one
+merchant, one day), so the benchmark shows the contention of every hot row,
+not only the sequence. A share of the transactions rolls back (--rollback),
+and the script checks that the committed numbers are exactly 1..N without gaps
+or duplicates. Uses year 9999 rows of an existing merchant in invoice_sequences
+and invoice_daily_rollups (removed afterwards).
+
+    python -m scripts.bench_numbering --merchant-id 1 --workers 16 --docs 400 --work-ms 20
+"""
+import argparse
+import random
+import threading
+import time
+
+from datetime import date
+
+from sqlalchemy import delete
+
+from app.core import numbering
+from app.core.report_rollups import apply_rollup_deltas, invoice_deltas
+from app.db.session import SessionLocal
+from app.models.invoice_sequence import InvoiceSequence
+from app.models.report_rollup import InvoiceDailyRollup
+
+MERCHANT_ID = 0  # set from --merchant-id (rollup rows need an existing merchant)
+YEAR = 9999
+DAY = date(YEAR, 12, 31)
+
+
+def _record_rollup(db, doc_type: str, count: int) -> None:
+    # same upsert as issuance: locks the merchant's (day, status) rollup row until commit
+    apply_rollup_deltas(db, [
+        d
+        for _ in range(count)
+        for d in invoice_deltas(
+            merchant_id=MERCHANT_ID, status=doc_type, issue_date=DAY, due_date=None,
+            net=100, vat=21, gross=121,
+        )
+    ])
+
+
+def _locked(db, doc_type: str, count: int, work: float) -> int:
+    seq = (
+        db.query(InvoiceSequence)
+        .filter(
+            InvoiceSequence.merchant_id == MERCHANT_ID,
+            InvoiceSequence.year == YEAR,
+            InvoiceSequence.doc_type == doc_type,
+        )
+        .with_for_update()
+        .one()
+    )
+    first = int(seq.next_number)
+    seq.next_number = first + count
+    db.flush()
+    time.sleep(work)  # items, usage ... while the row is locked
+    _record_rollup(db, doc_type, count)
+    return first
+
+
+def _upsert(db, doc_type: str, count: int, work: float) -> int:
+    time.sleep(work)  # items ... before any hot row is touched
+    _record_rollup(db, doc_type, count)
+    return numbering.allocate_numbers(db, MERCHANT_ID, YEAR, doc_type, count=count)
+
+
+def _reset(doc_type: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(InvoiceSequence).where(
+            InvoiceSequence.merchant_id == MERCHANT_ID, InvoiceSequence.year == YEAR,
+            InvoiceSequence.doc_type == doc_type,
+        ))
+        db.execute(delete(InvoiceDailyRollup).where(
+            InvoiceDailyRollup.merchant_id == MERCHANT_ID, InvoiceDailyRollup.day == DAY,
+            InvoiceDailyRollup.status == doc_type,
+        ))
+        db.commit()
+
+
+def run(mode: str, workers: int, docs: int, work_ms: float, rollback: float, max_range: int) -> dict:
+    doc_type = f"bench_{mode}"
+    _reset(doc_type)
+    if mode == "locked":
+        # the old flow needs the row to exist
+        with SessionLocal() as db:
+            db.add(InvoiceSequence(merchant_id=MERCHANT_ID, year=YEAR, doc_type=doc_type, next_number=1))
+            db.commit()
+
+    allocate = _locked if mode == "locked" else _upsert
+    committed: list[int] = []
+    latencies: list[float] = []
+    lock = threading.Lock()
+    remaining = [docs]
+
+    def worker(seed: int) -> None:
+        rnd = random.Random(seed)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                count = min(remaining[0], rnd.randint(1, max_range))
+                remaining[0] -= count
+            started = time.perf_counter()
+            with SessionLocal() as db:
+                first = allocate(db, doc_type, count, work_ms / 1000)
+                if rnd.random() < rollback:
+                    db.rollback()
+                    with lock:
+                        remaining[0] += count  # retried by someone later
+                    continue
+                db.commit()
+            with lock:
+                committed.extend(range(first, first + count))
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    _reset(doc_type)
+
+    latencies.sort()
+    gapless = sorted(committed) == list(range(1, docs + 1))
+    return {
+        "mode": mode,
+        "docs": docs,
+        "seconds": round(elapsed, 2),
+        "docs_per_s": round(docs / elapsed, 1),
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+        "p95_ms": round(1000 * latencies[int(len(latencies) * 0.95)], 1),
+        "gapless": gapless,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--merchant-id", type=int, required=True, help="existing merchant (rows are removed afterwards)")
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--work-ms", type=float, default=20, help="simulated request work inside the transaction")
+    ap.add_argument("--rollback", type=float, default=0.1, help="share of transactions that roll back")
+    ap.add_argument("--max-range", type=int, default=1, help="> 1 reserves ranges as batch issuance does")
+    ap.add_argument("--mode", choices=("locked", "upsert", "both"), default="both")
+    args = ap.parse_args()
+    global MERCHANT_ID
+    MERCHANT_ID = args.merchant_id
+
+    modes = ("locked", "upsert") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        res = run(mode, args.workers, args.docs, args.work_ms, args.rollback, args.max_range)
+        print("  ".join(f"{k}={v}" for k, v in res.items()))
+        if not res["gapless"]:
+            raise SystemExit(f"{mode}: committed numbers are not 1..{args.docs}")
+
+
+if __name__ == "__main__":
+    main()
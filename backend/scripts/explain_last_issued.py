@@ -0,0 +1,138 @@
+"""
+Query-plan regression check for the "last issued document" lookups.
+
+Copies the invoices / credit_notes table definitions with their indexes into
+temporary tables, seeds them with --rows documents spread over --merchants
+merchants, and checks with EXPLAIN (FORMAT JSON) that
+
+  WHERE merchant_id = ? AND status = ? ORDER BY issue_date DESC, id DESC LIMIT 1
+
+is answered by the (merchant_id, status, issue_date DESC, id DESC) index
+without a Sort or a Seq Scan. The chronology check itself reads
+invoice_sequences.last_issued_date (kept during issuance); its plan is printed.
+
+Nothing is written to the real tables (temporary tables, rolled back at the end).
+Exits with status 1 when a plan regressed.
+
+    python -m scripts.explain_last_issued --rows 3000000 --merchants 3000
+"""
+import argparse
+import json
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+_FILLED = ("id", "merchant_id", "status", "issue_date", "year", "number")
+
+_CHECKS = (
+    ("invoices", "invoice_status", "issued"),
+    ("credit_notes", "credit_note_status", "issued"),
+)
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _seed(conn, table: str, enum_type: str, rows: int, merchants: int) -> str:
+    tmp = f"explain_{table}"
+    conn.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {table} INCLUDING DEFAULTS INCLUDING INDEXES)"))
+    # only the columns the lookups touch are filled
+    nullable = conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = :t AND is_nullable = 'NO' AND column_default IS NULL"
+        ),
+        {"t": table},
+    ).scalars().all()
+    for col in nullable:
+        if col not in _FILLED:
+            conn.execute(text(f'ALTER TABLE {tmp} ALTER COLUMN "{col}" DROP NOT NULL'))
+
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {tmp} (id, merchant_id, status, issue_date, year, number)
+            SELECT g,
+                   1 + g % :merchants,
+                   (CASE g % 10 WHEN 0 THEN 'draft' WHEN 1 THEN 'void' ELSE 'issued' END)::{enum_type},
+                   date '2019-01-01' + (g / :merchants) % 2500,
+                   2019 + ((g / :merchants) % 2500) / 365,
+                   g / :merchants
+            FROM generate_series(1, :rows) AS g
+            """
+        ),
+        {"rows": rows, "merchants": merchants},
+    )
+    conn.execute(text(f"ANALYZE {tmp}"))
+    return tmp
+
+
+def _composite_index(conn, tmp: str) -> str:
+    for name, definition in conn.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :t"), {"t": tmp}
+    ):
+        if "merchant_id, status, issue_date DESC, id DESC" in definition:
+            return name
+    return ""
+
+
+def _explain(conn, sql: str, params: dict) -> dict:
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    return (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--merchants", type=int, default=2_000)
+    args = ap.parse_args()
+
+    failures = []
+    with engine.connect() as conn:
+        try:
+            for table, enum_type, status in _CHECKS:
+                started = time.perf_counter()
+                tmp = _seed(conn, table, enum_type, args.rows, args.merchants)
+                print(f"{table}: seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+                index = _composite_index(conn, tmp)
+                if not index:
+                    failures.append(f"{table}: no (merchant_id, status, issue_date DESC, id DESC) index")
+                    continue
+
+                plan = _explain(
+                    conn,
+                    f"SELECT issue_date FROM {tmp} WHERE merchant_id = :m AND status = :s "
+                    f"ORDER BY issue_date DESC, id DESC LIMIT 1",
+                    {"m": args.merchants // 2, "s": status},
+                )
+                nodes = list(_nodes(plan))
+                print(json.dumps(plan, indent=2))
+                if any(n["Node Type"] in ("Sort", "Seq Scan") for n in nodes):
+                    failures.append(f"{table}: plan sorts or scans the table")
+                if not any(n.get("Index Name") == index for n in nodes):
+                    failures.append(f"{table}: plan does not use {index}")
+
+            plan = _explain(
+                conn,
+                "SELECT max(last_issued_date) FROM invoice_sequences WHERE merchant_id = :m AND doc_type = 'invoice'",
+                {"m": args.merchants // 2},
+            )
+            print("invoice_sequences:", json.dumps(plan, indent=2))
+        finally:
+            conn.rollback()
+
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        raise SystemExit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,7 @@ try:
         user.is_email_verified = True
 
     db.commit()
+    # API workers cache principals per email: role / active change applies within AUTH_CACHE_TTL_SECONDS (max 60 s)
     print(f"OK: {ADMIN_EMAIL} este platform_admin")
 finally:
     db.close()
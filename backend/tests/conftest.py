@@ -0,0 +1,86 @@
+"""
+Shared fixtures: an in-memory SQLite database with the full schema and one merchant.
+
+Route functions are called directly with a session on `engine` and the merchant's
+`principal`, so these tests need neither a running server nor Postgres. Tests that
+check Postgres query plans use `pg_conn` (TEST_DATABASE_URL, migrated schema) and
+are skipped without it.
+"""
+import os
+
+# the app's engines are created at import time but never connect here
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/test")
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import main  # noqa: F401,E402  (registers every model and route)
+from app.api.routes.deps import Principal
+from app.core import query_counter
+from app.db.base import Base
+from app.models.merchant import Merchant
+from app.models.user import User, UserRole
+
+
+@pytest.fixture
+def engine():
+    eng = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    @event.listens_for(eng, "connect")
+    def _collation(dbapi_conn, _):
+        # name keys are lower(name) COLLATE "C" (app.core.search)
+        dbapi_conn.create_collation("C", lambda a, b: (a > b) - (a < b))
+
+    Base.metadata.create_all(eng)
+    query_counter.install(eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def merchant(engine) -> Merchant:
+    with Session(engine, expire_on_commit=False) as db:
+        user = User(email="owner@example.com", password_hash="x", role=UserRole.merchant_admin, is_active=True)
+        db.add(user)
+        db.flush()
+        m = Merchant(owner_user_id=user.id, company_name="Test SRL", country_code="BE")
+        db.add(m)
+        db.commit()
+        return m
+
+
+@pytest.fixture
+def principal(merchant) -> Principal:
+    return Principal(
+        user_id=merchant.owner_user_id,
+        email="owner@example.com",
+        role=UserRole.merchant_admin,
+        merchant_id=merchant.id,
+    )
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set (Postgres with the migrated schema)")
+    eng = create_engine(url)
+    try:
+        with eng.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Postgres not available: {e}")
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def pg_conn(pg_engine):
+    """Connection in a transaction that is always rolled back (temporary tables only)."""
+    with pg_engine.connect() as conn:
+        try:
+            yield conn
+        finally:
+            conn.rollback()
@@ -0,0 +1,102 @@
+"""
+Query-plan regression tests (Postgres only; skipped without TEST_DATABASE_URL).
+
+The lookups are run against temporary copies of the tables (same indexes) and
+their EXPLAIN plans must use:
+
+- (merchant_id, status, issue_date DESC, id DESC) for status-filtered, newest-first
+  invoice / credit note lists, without a Sort
+- the pg_trgm GIN indexes for contains-search on clients and products
+  (app.core.search.contains_match)
+
+scripts/explain_last_issued.py runs the same composite-index check on millions of rows.
+"""
+import pytest
+from sqlalchemy import MetaData, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.core import search
+from app.models.client import Client
+from app.models.credit_note import CreditNote
+from app.models.invoice import Invoice
+from app.models.product import Product
+from scripts.explain_last_issued import _composite_index, _explain, _nodes, _seed
+
+MERCHANT_ID = 1
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _plan(conn, stmt) -> list[dict]:
+    return list(_nodes(_explain(conn, _sql(stmt), {})))
+
+
+def _copy(model, name: str):
+    """The model's table under the temporary table's name (for building the app's expressions)."""
+    return model.__table__.to_metadata(MetaData(), name=name)
+
+
+def _trgm_indexes(conn, tmp: str) -> set[str]:
+    return set(conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :t AND indexdef LIKE '%gin_trgm_ops%'"),
+        {"t": tmp},
+    ).scalars())
+
+
+@pytest.mark.parametrize("model, enum_type", [(Invoice, "invoice_status"), (CreditNote, "credit_note_status")])
+def test_status_list_uses_composite_index(pg_conn, model, enum_type):
+    table = model.__tablename__
+    tmp = _seed(pg_conn, table, enum_type, rows=50_000, merchants=50)
+    index = _composite_index(pg_conn, tmp)
+    assert index, f"{table}: no (merchant_id, status, issue_date DESC, id DESC) index"
+
+    t = _copy(model, tmp)
+    nodes = _plan(pg_conn, (
+        select(t.c.id, t.c.issue_date)
+        .where(t.c.merchant_id == MERCHANT_ID, t.c.status == "issued")
+        .order_by(t.c.issue_date.desc(), t.c.id.desc())
+        .limit(50)
+    ))
+    assert any(n.get("Index Name") == index for n in nodes), f"{table}: plan does not use {index}"
+    assert not any(n["Node Type"] in ("Sort", "Seq Scan") for n in nodes), f"{table}: plan sorts or scans"
+
+
+@pytest.mark.parametrize("model, columns", [
+    (Client, ("name", "email", "tax_id")),
+    (Product, ("name", "code")),
+])
+def test_contains_search_uses_trigram_indexes(pg_conn, model, columns):
+    table = model.__tablename__
+    tmp = f"explain_{table}"
+    pg_conn.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {table} INCLUDING DEFAULTS INCLUDING INDEXES)"))
+    filled = ("id", "merchant_id", *columns)
+    for col in pg_conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = :t AND is_nullable = 'NO' AND column_default IS NULL"
+        ),
+        {"t": table},
+    ).scalars():
+        if col not in filled:
+            pg_conn.execute(text(f'ALTER TABLE {tmp} ALTER COLUMN "{col}" DROP NOT NULL'))
+    # one large merchant: the merchant filter alone does not narrow the search
+    values = ", ".join(f"'{c} ' || md5(g::text)" for c in columns)
+    pg_conn.execute(text(
+        f"INSERT INTO {tmp} (id, merchant_id, {', '.join(columns)}) "
+        f"SELECT g, {MERCHANT_ID}, {values} FROM generate_series(1, 20000) AS g"
+    ))
+    pg_conn.execute(text(f"ANALYZE {tmp}"))
+
+    indexes = _trgm_indexes(pg_conn, tmp)
+    assert len(indexes) == len(columns), f"{table}: expected one trigram index per searched column"
+
+    t = _copy(model, tmp)
+    nodes = _plan(pg_conn, (
+        select(t.c.id)
+        .where(t.c.merchant_id == MERCHANT_ID, search.contains_match([t.c[c] for c in columns], "zzqx"))
+    ))
+    used = {n.get("Index Name") for n in nodes}
+    assert indexes <= used, f"{table}: plan uses {used - {None}}, expected {indexes}"
+    assert not any(n["Node Type"] == "Seq Scan" for n in nodes), f"{table}: plan scans the table"
@@ -0,0 +1,37 @@
+from app.core.money import compute_totals
+
+
+def _line_vats(totals):
+    return [line.vat for line in totals.lines]
+
+
+def test_mixed_sign_bucket_keeps_line_signs():
+    # 27.00 sale + 1.80 discount line, both at 21 %
+    totals = compute_totals([(27, 1, 21), (-1.80, 1, 21)])
+
+    assert totals.breakdown == {2100: (2520, 529)}
+    assert _line_vats(totals) == [567, -38]
+    assert sum(_line_vats(totals)) == totals.vat_total
+    assert [line.gross for line in totals.lines] == [3267, -218]
+
+
+def test_cancelling_lines_keep_their_vat():
+    totals = compute_totals([(10, 1, 21), (-10, 1, 21)])
+
+    assert totals.breakdown == {2100: (0, 0)}
+    assert _line_vats(totals) == [210, -210]
+
+
+def test_rounding_difference_goes_to_largest_remainder():
+    # 3 x 0.07 at 21 %: each line rounds 1.47 -> 1 cent, the bucket 4.41 -> 4 cents
+    totals = compute_totals([(0.07, 1, 21)] * 3 + [(-0.07, 1, 21)] * 3 + [(0.07, 3, 21)])
+
+    assert totals.breakdown == {2100: (21, 4)}
+    assert _line_vats(totals) == [1, 1, 1, -1, -1, -1, 4]
+
+    totals = compute_totals([(0.07, 1, 21)] * 3)
+    assert totals.breakdown == {2100: (21, 4)}
+    assert _line_vats(totals) == [2, 1, 1]
+
+    totals = compute_totals([(-0.07, 1, 21)] * 3)
+    assert _line_vats(totals) == [-2, -1, -1]
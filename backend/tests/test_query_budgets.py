@@ -0,0 +1,133 @@
+"""
+Per-endpoint SQL statement budgets (app.core.query_counter.count_queries).
+
+Each hot endpoint is called on a small and on a larger data set: the statement
+count must not grow with the number of rows (no N+1) and must stay within budget.
+"""
+import inspect
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi import Request, Response, params
+from sqlalchemy.orm import Session
+
+from app.api.routes import calendar, clients, credit_notes, invoices, products
+from app.core.query_counter import count_queries
+from app.models.calendar_event import CalendarEvent, EventType
+from app.models.client import Client
+from app.models.credit_note import CreditNote, CreditNoteStatus
+from app.models.credit_note_item import CreditNoteItem
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.invoice_item import InvoiceItem
+from app.models.product import Product
+
+
+def call(route, **kwargs):
+    """Call a route function directly; Query(...) defaults become their values."""
+    for name, p in inspect.signature(route).parameters.items():
+        if name not in kwargs and isinstance(p.default, params.Param):
+            kwargs[name] = p.default.default
+    return route(**kwargs)
+
+
+def measure(engine, route, **kwargs) -> int:
+    # fresh session: nothing answered from the identity map of an earlier call
+    with Session(engine) as db, count_queries() as counter:
+        call(route, db=db, **kwargs)
+    return counter.count
+
+
+def request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+def seed(engine, merchant_id: int, n: int, items: int = 3) -> list[int]:
+    """n clients, products, issued invoices (with items), credit notes and calendar events."""
+    with Session(engine) as db:
+        start = db.query(Client).filter(Client.merchant_id == merchant_id).count()
+        ids = []
+        for i in range(start, start + n):
+            client = Client(merchant_id=merchant_id, name=f"Client {i:03d}", email=f"c{i}@example.com")
+            db.add(client)
+            db.add(Product(merchant_id=merchant_id, name=f"Product {i:03d}", code=f"P{i:03d}", unit_price=10))
+            db.flush()
+
+            inv = Invoice(
+                merchant_id=merchant_id, client_id=client.id, status=InvoiceStatus.issued,
+                year=2026, number=i + 1, invoice_no=f"{i + 1:06d}",
+                issue_date=date(2026, 1, 1) + timedelta(days=i), due_date=date(2026, 2, 1) + timedelta(days=i),
+                client_name=client.name, client_email=client.email,
+                subtotal_net=Decimal("30.00"), vat_total=Decimal("6.30"), total_gross=Decimal("36.30"),
+                total_due=Decimal("36.30"), vat_breakdown={"21": {"base": 30.0, "vat": 6.3}},
+            )
+            db.add(inv)
+            db.flush()
+            for k in range(items):
+                db.add(InvoiceItem(
+                    invoice_id=inv.id, item_code=f"P{i:03d}", description=f"Line {k}",
+                    unit_price=10, quantity=1, vat_rate=21, line_net=10, line_vat=Decimal("2.10"), line_gross=Decimal("12.10"),
+                ))
+
+            cn = CreditNote(
+                merchant_id=merchant_id, invoice_id=inv.id, client_id=client.id, status=CreditNoteStatus.issued,
+                year=2026, number=i + 1, credit_note_no=f"{i + 1:06d}", issue_date=inv.issue_date,
+                client_name=client.name, subtotal_net=Decimal("-10.00"), vat_total=Decimal("-2.10"),
+                total_gross=Decimal("-12.10"), vat_breakdown={"21": {"base": -10.0, "vat": -2.1}},
+            )
+            db.add(cn)
+            db.flush()
+            db.add(CreditNoteItem(
+                credit_note_id=cn.id, description="Line 0", unit_price=10, quantity=1, vat_rate=21,
+                line_net=-10, line_vat=Decimal("-2.10"), line_gross=Decimal("-12.10"),
+            ))
+
+            db.add(CalendarEvent(
+                merchant_id=merchant_id, client_id=client.id, invoice_id=inv.id, title=f"Due {i}",
+                event_type=EventType.invoice_due, start_datetime=datetime(2026, 2, 1) + timedelta(days=i),
+                created_at=datetime(2026, 1, 1),
+            ))
+            ids.append(inv.id)
+        db.commit()
+        return ids
+
+
+def assert_budget(engine, merchant, budget: int, route, **kwargs) -> None:
+    seed(engine, merchant.id, 2)
+    few = measure(engine, route, **kwargs)
+    seed(engine, merchant.id, 20)
+    many = measure(engine, route, **kwargs)
+    assert many == few, f"{route.__name__}: {few} statements for 2 rows, {many} for 22 (N+1)"
+    assert many <= budget, f"{route.__name__}: {many} statements, budget {budget}"
+
+
+def test_list_invoices(engine, merchant, principal):
+    assert_budget(engine, merchant, 2, invoices.list_invoices, response=Response(), principal=principal)
+
+
+def test_get_invoice(engine, merchant, principal):
+    first = seed(engine, merchant.id, 1, items=1)[0]
+    few = measure(engine, invoices.get_invoice, invoice_id=first, principal=principal)
+    many_items = seed(engine, merchant.id, 1, items=25)[0]
+    many = measure(engine, invoices.get_invoice, invoice_id=many_items, principal=principal)
+    assert many == few <= 3
+
+
+def test_download_invoice_pdf(engine, merchant, principal):
+    inv_id = seed(engine, merchant.id, 1, items=25)[0]
+    assert measure(engine, invoices.download_invoice_pdf, invoice_id=inv_id, request=request(), principal=principal) <= 3
+
+
+def test_list_credit_notes(engine, merchant, principal):
+    assert_budget(engine, merchant, 2, credit_notes.list_credit_notes, principal=principal)
+
+
+def test_calendar_events(engine, merchant):
+    assert_budget(engine, merchant, 1, calendar.get_calendar_events, merchant_id=merchant.id)
+
+
+def test_list_clients(engine, merchant):
+    assert_budget(engine, merchant, 1, clients.list_clients, response=Response(), merchant_id=merchant.id)
+
+
+def test_list_products(engine, merchant):
+    assert_budget(engine, merchant, 1, products.list_products, response=Response(), merchant_id=merchant.id)